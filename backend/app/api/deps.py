@@ -0,0 +1,15 @@
+from app.data.db import get_async_sessionmaker
+from app.infrastructure.async_repository import AsyncRepository
+from app.infrastructure.database_repository import Repository
+
+
+def get_repo():
+    """FastAPI dependency for sync handlers: a Repository scoped to the request."""
+    with Repository() as repo:
+        yield repo
+
+
+async def get_async_repo():
+    """FastAPI dependency: one AsyncSession per request, closed when it ends."""
+    async with get_async_sessionmaker()() as session:
+        yield AsyncRepository(session)
@@ -1,25 +1,129 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from pydantic import BaseModel
+from typing import List, Optional
+from app.api.deps import get_async_repo, get_repo
+from app.api.pagination import FORMAT_PATTERN, decode_cursor, page_response, stream_all
+from app.infrastructure.async_repository import AsyncRepository
 from app.infrastructure.database_repository import Repository
 from app.services.keyword_research_service import KeywordResearchService
+from app.services.keyword_expansion_service import is_expansion_running, pause_expansion, start_expansion
+from app.infrastructure.scraper_google import suggest_cache
 
 router = APIRouter()
-repo = Repository()
-service = KeywordResearchService(repo)
 
 class SuggestRequest(BaseModel):
     seed: str
     limit: int = 10
 
+# Sync handler on purpose: the autosuggest call is blocking I/O, so it runs in
+# FastAPI's threadpool instead of on the event loop.
 @router.post("/suggest")
-def suggest(req: SuggestRequest):
+def suggest(req: SuggestRequest, repo: Repository = Depends(get_repo)):
     if not req.seed or len(req.seed.strip()) == 0:
         raise HTTPException(status_code=400, detail="seed required")
+    service = KeywordResearchService(repo)
     res = service.suggest_keywords(req.seed, limit=req.limit)
     # convert dataclass to dicts
     return [r.__dict__ for r in res]
 
+BATCH_MAX_SEEDS = 50
+
+class SuggestBatchRequest(BaseModel):
+    seeds: List[str]
+    limit: int = 10
+
+@router.post("/suggest/batch")
+def suggest_batch(req: SuggestBatchRequest, repo: Repository = Depends(get_repo)):
+    seeds = [s.strip() for s in req.seeds if s and s.strip()]
+    if not seeds:
+        raise HTTPException(status_code=400, detail="seeds required")
+    if len(seeds) > BATCH_MAX_SEEDS:
+        raise HTTPException(status_code=400, detail=f"at most {BATCH_MAX_SEEDS} seeds per request")
+    results = KeywordResearchService(repo).suggest_many(seeds, limit=req.limit)
+    return [{"seed": seed, "suggestions": [r.__dict__ for r in results[seed]]} for seed in results]
+
+@router.post("/rescore")
+def rescore_keywords(repo: Repository = Depends(get_repo)):
+    """Recompute stored volume/difficulty after the heuristics change."""
+    return KeywordResearchService(repo).rescore_all()
+
+EXPAND_MAX_DEPTH = 4
+EXPAND_MAX_BUDGET = 20000
+
+class ExpandRequest(BaseModel):
+    seed: str
+    depth: int = 2
+    budget: int = 500
+
+def _job_dict(job):
+    return {"id": job.id, "seed": job.seed, "depth": job.max_depth, "budget": job.budget, "status": job.status,
+            "running": is_expansion_running(job.id), "calls_made": job.calls_made,
+            "keywords_found": job.keywords_found, "frontier_size": job.frontier_size,
+            "failed_calls": job.failed_calls, "error": job.error,
+            "created_at": job.created_at, "updated_at": job.updated_at}
+
+def _get_job(repo: Repository, job_id: int):
+    job = repo.get_expansion_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="expansion job not found")
+    return job
+
+@router.post("/expand", status_code=202)
+def expand(req: ExpandRequest, repo: Repository = Depends(get_repo)):
+    """Start a background autosuggest crawl from `seed`; poll GET /expand/{id} for progress."""
+    if not req.seed or not req.seed.strip():
+        raise HTTPException(status_code=400, detail="seed required")
+    if not 1 <= req.depth <= EXPAND_MAX_DEPTH:
+        raise HTTPException(status_code=400, detail=f"depth must be between 1 and {EXPAND_MAX_DEPTH}")
+    if not 1 <= req.budget <= EXPAND_MAX_BUDGET:
+        raise HTTPException(status_code=400, detail=f"budget must be between 1 and {EXPAND_MAX_BUDGET}")
+    job = repo.create_expansion_job(req.seed.strip(), req.depth, req.budget)
+    start_expansion(job.id)
+    return _job_dict(job)
+
+@router.get("/expand/{job_id}")
+def expansion_status(job_id: int, repo: Repository = Depends(get_repo)):
+    return _job_dict(_get_job(repo, job_id))
+
+@router.post("/expand/{job_id}/pause")
+def pause_expand(job_id: int, repo: Repository = Depends(get_repo)):
+    """Stops after the current chunk, which is checkpointed first."""
+    job = _get_job(repo, job_id)
+    if not pause_expansion(job_id):
+        raise HTTPException(status_code=409, detail="job is not running")
+    return _job_dict(job)
+
+@router.post("/expand/{job_id}/resume", status_code=202)
+def resume_expand(job_id: int, budget: Optional[int] = Query(None, ge=1, le=EXPAND_MAX_BUDGET),
+                  repo: Repository = Depends(get_repo)):
+    """Continue from the checkpoint (also after a restart); `budget` raises the total call budget."""
+    job = _get_job(repo, job_id)
+    if is_expansion_running(job_id):
+        raise HTTPException(status_code=409, detail="job is already running")
+    if job.status == "done" and budget is None:
+        raise HTTPException(status_code=409, detail="job is done; pass a larger budget to continue")
+    if budget is not None:
+        if budget <= job.calls_made:
+            raise HTTPException(status_code=400, detail=f"budget must exceed calls already made ({job.calls_made})")
+        repo.update_expansion_job(job_id, budget=budget)
+    start_expansion(job_id)
+    return _job_dict(_get_job(repo, job_id))
+
+@router.get("/suggest-cache")
+def suggest_cache_stats():
+    return suggest_cache.stats()
+
 @router.get("/list")
-def list_keywords():
-    kws = repo.list_keywords(limit=200)
-    return [{"text": k.text, "estimated_volume": k.estimated_volume, "difficulty": k.difficulty, "created_at": k.created_at} for k in kws]
+async def list_keywords(limit: Optional[int] = Query(None, ge=1, le=5000), cursor: Optional[str] = None,
+                        fmt: str = Query("json", alias="format", pattern=FORMAT_PATTERN),
+                        repo: AsyncRepository = Depends(get_async_repo)):
+    """Newest first, 200 per page by default (X-Next-Cursor); format=ndjson without `limit` streams them all."""
+    async def fetch(repo, cur, n):
+        kws = await repo.list_keywords(limit=n, before_id=cur[0] if cur else None)
+        items = [{"text": k.text, "estimated_volume": k.estimated_volume, "difficulty": k.difficulty, "created_at": k.created_at} for k in kws]
+        return items, ([kws[-1].id] if len(kws) == n else None)
+
+    cur = decode_cursor(cursor, (int,))
+    if limit is None and fmt == "ndjson":
+        return stream_all(fetch, cur, fmt)
+    return page_response(*await fetch(repo, cur, limit or 200), fmt)
@@ -0,0 +1,99 @@
+"""
+Keyset pagination and streaming helpers for the list endpoints.
+
+Each listing is ordered by a unique key (an id, or (timestamp, id)) and the
+cursor is the key of the last row served, so every page is one index range
+scan however deep the client pages, unlike OFFSET. Cursors are opaque to
+clients: base64 of the JSON key.
+
+Full exports are streamed page by page from their own session, so memory per
+request stays at one page regardless of table size.
+"""
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import AsyncIterator, Awaitable, Callable, List, Optional, Tuple
+
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response, StreamingResponse
+
+from app.data.db import get_async_sessionmaker
+from app.infrastructure.async_repository import AsyncRepository
+
+STREAM_PAGE_SIZE = 1000
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+FORMAT_PATTERN = "^(json|ndjson)$"
+
+# fetch(repo, cursor, limit) -> (items, next cursor or None when exhausted)
+PageFetcher = Callable[[AsyncRepository, Optional[list], int], Awaitable[Tuple[List[dict], Optional[list]]]]
+
+
+def _json_default(value):
+    # Items are plain dicts whose only non-JSON values are datetimes; this is
+    # what jsonable_encoder would produce, without its per-value overhead
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return jsonable_encoder(value)
+
+
+def dumps(value) -> str:
+    return json.dumps(value, default=_json_default, ensure_ascii=False, separators=(",", ":"))
+
+
+def encode_cursor(values: list) -> str:
+    raw = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str], types: tuple) -> Optional[list]:
+    """Cursor key as typed values, e.g. types=(datetime, int); 400 if it was tampered with."""
+    if not cursor:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if not isinstance(values, list) or len(values) != len(types):
+            raise ValueError(cursor)
+        return [datetime.fromisoformat(v) if t is datetime else t(v) for v, t in zip(values, types)]
+    except (ValueError, TypeError, binascii.Error):
+        raise HTTPException(status_code=400, detail="invalid cursor")
+
+
+def page_response(items: List[dict], key: Optional[list], fmt: str = "json") -> Response:
+    """One page, with X-Next-Cursor set when there may be more."""
+    headers = {"X-Next-Cursor": encode_cursor(key)} if key else {}
+    if fmt == "ndjson":
+        return Response("".join(dumps(item) + "\n" for item in items), media_type=NDJSON_MEDIA_TYPE, headers=headers)
+    return Response(dumps(items), media_type="application/json", headers=headers)
+
+
+async def _pages(fetch: PageFetcher, cursor: Optional[list]) -> AsyncIterator[List[dict]]:
+    # The request-scoped session may be gone by the time the body streams
+    async with get_async_sessionmaker()() as session:
+        repo = AsyncRepository(session)
+        while True:
+            items, cursor = await fetch(repo, cursor, STREAM_PAGE_SIZE)
+            session.expunge_all()
+            if items:
+                yield items
+            if cursor is None:
+                return
+
+
+def stream_all(fetch: PageFetcher, cursor: Optional[list] = None, fmt: str = "json") -> StreamingResponse:
+    """Every row from `cursor` on, as NDJSON or as one JSON array written incrementally."""
+    async def ndjson():
+        async for items in _pages(fetch, cursor):
+            yield "".join(dumps(item) + "\n" for item in items)
+
+    async def json_array():
+        first = True
+        async for items in _pages(fetch, cursor):
+            yield ("[" if first else ",") + ",".join(dumps(item) for item in items)
+            first = False
+        yield "[]" if first else "]"
+
+    if fmt == "ndjson":
+        return StreamingResponse(ndjson(), media_type=NDJSON_MEDIA_TYPE)
+    return StreamingResponse(json_array(), media_type="application/json")
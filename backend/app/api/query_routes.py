@@ -1,53 +1,32 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from pydantic import BaseModel
-from app.infrastructure.database_repository import Repository
-import datetime
+from app.api.deps import get_async_repo
+from app.infrastructure.async_repository import AsyncRepository
+from app.infrastructure.recent_queries import recent_queries
 
 router = APIRouter()
-repo = Repository()
+
+OWNER_MAX_LENGTH = 128
 
 class AddQueryRequest(BaseModel):
     query: str
     location: str = "Global"
     results_count: str = "0"
 
+def _owner(request: Request) -> str:
+    # Recent queries are kept per user/session when the client sends an id; shared otherwise
+    owner = request.headers.get("x-session-id") or request.cookies.get("session_id") or ""
+    return owner[:OWNER_MAX_LENGTH]
+
 @router.post("/add")
-def add_query(req: AddQueryRequest):
+async def add_query(req: AddQueryRequest, request: Request, repo: AsyncRepository = Depends(get_async_repo)):
     if not req.query:
         raise HTTPException(status_code=400, detail="query required")
     # For now, default location/results logic is handled by client or here
-    rq = repo.add_recent_query(req.query, req.location, req.results_count)
-    return {"id": rq.id, "query": rq.query}
+    entry = await recent_queries.add(repo, _owner(request), req.query, req.location, req.results_count)
+    return {"id": entry["id"], "query": entry["query"]}
 
 @router.get("/recent")
-def get_recent():
-    queries = repo.get_recent_queries(limit=5)
-    
-    
-    # helper to format "X min ago"
-    def format_time(dt):
-        if dt.tzinfo is None:
-            # If naive, assume UTC because that's what we likely stored
-            dt = dt.replace(tzinfo=datetime.timezone.utc)
-        
-        now = datetime.datetime.now(datetime.timezone.utc)
-        diff = now - dt
-        minutes = int(diff.total_seconds() / 60)
-        
-        if minutes < 1:
-            return "Just now"
-        if minutes < 60:
-            return f"{minutes} min ago"
-        hours = int(minutes / 60)
-        if hours < 24:
-            return f"{hours}h ago"
-        days = int(hours / 24)
-        return f"{days}d ago"
-
-    return [{
-        "id": q.id,
-        "query": q.query,
-        "location": q.location,
-        "time": format_time(q.created_at),
-        "results": q.results_count
-    } for q in queries]
+async def get_recent(request: Request, repo: AsyncRepository = Depends(get_async_repo)):
+    """Last searches, newest first; served from memory (see app/infrastructure/recent_queries.py)."""
+    return Response(await recent_queries.recent_json(repo, _owner(request)), media_type="application/json")
@@ -1,52 +1,429 @@
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, ConfigDict, Field
+from starlette.concurrency import run_in_threadpool
+from app.api.deps import get_async_repo, get_repo
+from app.api.pagination import FORMAT_PATTERN, decode_cursor, dumps, page_response, stream_all
+from app.data.db import get_async_sessionmaker
+from app.infrastructure import event_feed
+from app.infrastructure.async_repository import AsyncRepository
 from app.infrastructure.database_repository import Repository
-from app.services.rank_tracker_service import RankTrackerService
+from app.infrastructure.scheduler import notify_tracking_changed, notify_tracking_removed, notify_trackings_bulk_added
+from app.infrastructure.work_queue import RANK_CHECK_MODE
+from app.infrastructure.quota import PROVIDERS, get_quota
+import csv
+import json
+import time
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+from app.core.rank import FREQUENCY_INTERVALS, HISTORY_GRANULARITIES, as_utc, pick_granularity, utcnow
+from app.services.rank_tracker_service import RAW_RETENTION_DAYS, RankTrackerService
+from app.infrastructure.profiler import PROFILER_ENABLED, SamplingProfiler
+from app.infrastructure.scraper_google import aget_serpapi_positions_multi, serp_cache
+from app.infrastructure.http_client import get_http_client
 
 router = APIRouter()
-repo = Repository()
-service = RankTrackerService(repo)
 
 class TrackRequest(BaseModel):
     domain: str
     keyword: str
     frequency: str = "daily"
+    priority: Optional[int] = None  # higher is checked first when the provider quota runs short
 
 @router.post("/track")
-def add_tracking(req: TrackRequest):
+async def add_tracking(req: TrackRequest, repo: AsyncRepository = Depends(get_async_repo)):
     if not req.domain or not req.keyword:
         raise HTTPException(status_code=400, detail="domain and keyword required")
-    tk = service.add_tracking(req.domain, req.keyword, req.frequency)
-    # Trigger initial check immediately
-    try:
-        service.check_rank_once(tk)
-    except Exception as e:
-        print(f"Initial check failed: {e}")
-    return {"id": tk.id, "domain": tk.domain, "keyword": tk.keyword, "frequency": tk.frequency}
+    tk = await repo.add_tracking_keyword(req.domain, req.keyword, req.frequency, req.priority or 0)
+    # New rows are due immediately; the scheduler runs the initial check off the request path
+    notify_tracking_changed(tk.id, tk.next_due_at)
+    return {"id": tk.id, "domain": tk.domain, "keyword": tk.keyword, "frequency": tk.frequency, "priority": tk.priority}
+
+BULK_CHUNK_SIZE = 1000
+
+async def _iter_lines(request: Request):
+    buf = b""
+    async for data in request.stream():
+        buf += data
+        *lines, buf = buf.split(b"\n")
+        for line in lines:
+            yield line.decode("utf-8").strip()
+    if buf:
+        yield buf.decode("utf-8").strip()
+
+async def _iter_track_rows(request: Request):
+    """
+    Yields raw row dicts from a JSON array, NDJSON or CSV body.
+    NDJSON and CSV are parsed line by line as the body streams in; a JSON
+    body is checked as a whole before the first row is yielded.
+    Raises ValueError on anything that isn't a list of objects.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    if content_type in ("application/x-ndjson", "application/ndjson", "application/jsonl"):
+        async for line in _iter_lines(request):
+            if line:
+                row = json.loads(line)
+                if not isinstance(row, dict):
+                    raise ValueError("each NDJSON line must be an object")
+                yield row
+    elif content_type in ("text/csv", "application/csv"):
+        header = None
+        async for line in _iter_lines(request):
+            if not line:
+                continue
+            values = [v.strip() for v in next(csv.reader([line]))]
+            if header is None and {"domain", "keyword"} <= {v.lower() for v in values}:
+                header = [v.lower() for v in values]
+                continue
+            yield dict(zip(header or ["domain", "keyword", "frequency"], values))
+    else:
+        payload = json.loads(await request.body())
+        if isinstance(payload, dict):
+            payload = payload.get("items", [])
+        if not isinstance(payload, list) or not all(isinstance(row, dict) for row in payload):
+            raise ValueError('expected a JSON array of objects or {"items": [...]}')
+        for row in payload:
+            yield row
+
+def _str_field(row, name: str, default: str = "") -> Optional[str]:
+    """Stripped string value of `row[name]`; None when it is present but not a string."""
+    value = row.get(name)
+    if value is None or value == "":
+        return default
+    return value.strip() if isinstance(value, str) else None
+
+@router.post("/track/bulk")
+async def bulk_add_tracking(request: Request):
+    """
+    Import many trackings at once (JSON array, NDJSON or CSV with
+    domain,keyword[,frequency]). Rows are inserted in chunks, deduplicated on
+    (domain, keyword); rows without a domain/keyword or with an unknown
+    frequency are counted as invalid. Initial checks are left to the
+    scheduler rather than run during the request.
+
+    Each chunk is committed on its own so a slow upload doesn't hold the write
+    lock. A JSON body is validated before anything is inserted, but an NDJSON
+    or CSV stream that turns malformed partway keeps the chunks committed
+    before it: the 400 detail reports them as `inserted`, and since
+    duplicates are skipped the fixed file can simply be sent again.
+    """
+    received = invalid = inserted = 0
+    chunk = []
+
+    async def flush():
+        nonlocal inserted, chunk
+        inserted += await run_in_threadpool(import_repo.bulk_add_tracking, chunk)
+        chunk = []
+
+    with Repository() as import_repo:
+        try:
+            async for row in _iter_track_rows(request):
+                received += 1
+                domain, keyword = _str_field(row, "domain"), _str_field(row, "keyword")
+                frequency = _str_field(row, "frequency", "daily")
+                frequency = frequency.lower() if frequency else None
+                if not domain or not keyword or frequency not in FREQUENCY_INTERVALS:
+                    invalid += 1
+                    continue
+                chunk.append({"domain": domain, "keyword": keyword, "frequency": frequency})
+                if len(chunk) >= BULK_CHUNK_SIZE:
+                    await flush()
+            if chunk:
+                await flush()
+        except (ValueError, csv.Error) as e:
+            await run_in_threadpool(import_repo.rollback)
+            raise HTTPException(status_code=400, detail={"error": f"invalid payload: {e}", "received": received,
+                                                         "inserted": inserted})
+
+    notify_trackings_bulk_added()
+    return {"received": received, "inserted": inserted, "duplicates": received - invalid - inserted, "invalid": invalid}
+
+def _tracking_row(tk):
+    return {"id": tk.id, "domain": tk.domain, "keyword": tk.keyword, "frequency": tk.frequency,
+            "priority": tk.priority, "last_position": tk.last_position, "created_at": tk.created_at}
 
 @router.get("/list")
-def list_tracking():
-    trackings = repo.list_tracking()
-    return [{"id": tk.id, "domain": tk.domain, "keyword": tk.keyword, "frequency": tk.frequency, "created_at": tk.created_at} for tk in trackings]
+async def list_tracking(limit: Optional[int] = Query(None, ge=1, le=5000), cursor: Optional[str] = None,
+                        fmt: str = Query("json", alias="format", pattern=FORMAT_PATTERN),
+                        repo: AsyncRepository = Depends(get_async_repo)):
+    """
+    Trackings by id. With `limit`, one page plus X-Next-Cursor; without it the
+    whole list is streamed page by page (same JSON array as before, or NDJSON).
+    """
+    async def fetch(repo, cur, n):
+        rows = await repo.list_tracking(after_id=cur[0] if cur else 0, limit=n)
+        return [_tracking_row(tk) for tk in rows], ([rows[-1].id] if len(rows) == n else None)
+
+    cur = decode_cursor(cursor, (int,))
+    if limit is None:
+        return stream_all(fetch, cur, fmt)
+    return page_response(*await fetch(repo, cur, limit), fmt)
+
+HISTORY_FIELDS = ("id", "position", "checked_at", "serp_snapshot")
+
+def _check_granularity(granularity: str) -> str:
+    if granularity != "auto" and granularity not in HISTORY_GRANULARITIES:
+        raise HTTPException(status_code=400, detail=f"granularity must be auto or one of {', '.join(HISTORY_GRANULARITIES)}")
+    return granularity
+
+def _to_utc(dt: Optional[datetime]) -> Optional[datetime]:
+    return as_utc(dt).astimezone(timezone.utc) if dt else None
+
+def _resolve_granularity(start: datetime, end: Optional[datetime]) -> str:
+    return pick_granularity(start, end or utcnow(), utcnow() - timedelta(days=RAW_RETENTION_DAYS))
+
+def _rollup_row(b):
+    avg = b.sum_position / b.found if b.found else None
+    return {
+        # position/checked_at keep the raw row shape so charts work with any granularity
+        "position": round(avg) if avg is not None else None,
+        "checked_at": b.bucket_start,
+        "avg_position": round(avg, 2) if avg is not None else None,
+        "min_position": b.min_position,
+        "max_position": b.max_position,
+        "last_position": b.last_position,
+        "found_ratio": round(b.found / b.checks, 3) if b.checks else None,
+        "checks": b.checks,
+    }
 
 @router.get("/history/{tracking_id}")
-def history(tracking_id: int):
-    tk = repo.get_tracking_by_id(tracking_id)
+async def history(tracking_id: int,
+                  start: Optional[datetime] = Query(None, alias="from"),
+                  end: Optional[datetime] = Query(None, alias="to"),
+                  granularity: str = "auto",
+                  limit: Optional[int] = Query(None, ge=1, le=5000),
+                  cursor: Optional[str] = None,
+                  fields: str = ",".join(HISTORY_FIELDS),
+                  fmt: str = Query("json", alias="format", pattern=FORMAT_PATTERN),
+                  repo: AsyncRepository = Depends(get_async_repo)):
+    """
+    Newest first, 200 points per page by default; follow X-Next-Cursor for the
+    next. format=ndjson without `limit` streams the whole range instead.
+    `fields` picks the raw-row columns (id, position, checked_at,
+    serp_snapshot; all of them by default, as before). Snapshots are only
+    read when asked for, so e.g. fields=position,checked_at skips them.
+    With `from`/`to`, granularity=auto picks raw, daily or weekly points from
+    the span (see pick_granularity); the choice is echoed in X-History-Granularity.
+    """
+    granularity = _check_granularity(granularity)
+    wanted = [f.strip() for f in fields.split(",") if f.strip()]
+    if not wanted or any(f not in HISTORY_FIELDS for f in wanted):
+        raise HTTPException(status_code=400, detail=f"fields must be a subset of {', '.join(HISTORY_FIELDS)}")
+    tk = await repo.get_tracking_by_id(tracking_id)
     if not tk:
         raise HTTPException(status_code=404, detail="tracking not found")
-    histories = repo.get_rank_history_for(tracking_id, limit=200)
-    return [{"position": h.position, "checked_at": h.checked_at, "serp_snapshot": h.serp_snapshot} for h in histories]
+    start, end = _to_utc(start), _to_utc(end)
+    if granularity == "auto":
+        # No range: the latest raw checks, as before
+        granularity = _resolve_granularity(start, end) if start else "raw"
+
+    if granularity == "raw":
+        with_snapshot = "serp_snapshot" in wanted
+        cur = decode_cursor(cursor, (datetime, int))
+
+        async def fetch(repo, cur, n):
+            rows = await repo.get_rank_history_for(tracking_id, n, start, end, before=cur, with_snapshot=with_snapshot)
+            snapshots = await repo.get_snapshots(rows) if with_snapshot else {}
+            items = [{f: snapshots[h.id] if f == "serp_snapshot" else getattr(h, f) for f in wanted} for h in rows]
+            return items, ([rows[-1].checked_at, rows[-1].id] if len(rows) == n else None)
+    else:
+        cur = decode_cursor(cursor, (datetime,))
+
+        async def fetch(repo, cur, n):
+            rows = await repo.get_rollups(tracking_id, granularity, start, end, limit=n, before=cur[0] if cur else None)
+            return [_rollup_row(b) for b in rows], ([rows[-1].bucket_start] if len(rows) == n else None)
+
+    if limit is None and fmt == "ndjson":
+        resp = stream_all(fetch, cur, fmt)
+    else:
+        resp = page_response(*await fetch(repo, cur, limit or 200), fmt)
+    resp.headers["X-History-Granularity"] = granularity
+    return resp
+
+BATCH_MAX_TRACKINGS = 2000
+BATCH_DEFAULT_DAYS = 30
+
+class HistoryBatchRequest(BaseModel):
+    model_config = ConfigDict(populate_by_name=True)
+
+    tracking_ids: Optional[List[int]] = None
+    domain: Optional[str] = None
+    start: Optional[datetime] = Field(None, alias="from")
+    end: Optional[datetime] = Field(None, alias="to")
+    granularity: str = "auto"
+
+@router.post("/history/batch")
+async def history_batch(req: HistoryBatchRequest, repo: AsyncRepository = Depends(get_async_repo)):
+    """
+    Positions of many trackings (by id and/or domain) over one window, for
+    dashboards: one query for the points instead of one request per tracking.
+    Columnar layout: `points` holds parallel arrays sorted by tracking then
+    time, with checked_at as epoch seconds; rollup points carry the average.
+    The window defaults to the last 30 days.
+    """
+    granularity = _check_granularity(req.granularity)
+    if not req.tracking_ids and not req.domain:
+        raise HTTPException(status_code=400, detail="tracking_ids or domain required")
+    if req.tracking_ids and len(req.tracking_ids) > BATCH_MAX_TRACKINGS:
+        raise HTTPException(status_code=400, detail=f"at most {BATCH_MAX_TRACKINGS} tracking_ids per request")
+    end = _to_utc(req.end) or utcnow()
+    start = _to_utc(req.start) or end - timedelta(days=BATCH_DEFAULT_DAYS)
+    if granularity == "auto":
+        granularity = _resolve_granularity(start, end)
+
+    trackings = await repo.find_trackings(req.tracking_ids, req.domain, limit=BATCH_MAX_TRACKINGS)
+    ids = [tk.id for tk in trackings]
+    tracking_col, time_col, position_col = [], [], []
+    for tracking_id, checked_at, position in await repo.get_history_points(ids, granularity, start, end):
+        tracking_col.append(tracking_id)
+        time_col.append(int(as_utc(checked_at).timestamp()))
+        position_col.append(position)
+    # Already plain ints/strings: skip jsonable_encoder, which dominates at this size
+    return JSONResponse({
+        "granularity": granularity,
+        "from": start.isoformat(),
+        "to": end.isoformat(),
+        "trackings": {
+            "id": ids,
+            "domain": [tk.domain for tk in trackings],
+            "keyword": [tk.keyword for tk in trackings],
+        },
+        "points": {"tracking_id": tracking_col, "checked_at": time_col, "position": position_col},
+    })
+
+EVENTS_MAX_WAIT = 60
+EVENTS_HEARTBEAT_SECONDS = 15
+EVENT_FIELDS = ("id", "tracking_id", "domain", "keyword", "kind", "old_position", "new_position", "checked_at")
+
+async def _read_events(after: int, tracking_ids, domain, limit: int) -> List[dict]:
+    # A fresh session per read: waiting readers hold no connection, and each read sees new commits
+    async with get_async_sessionmaker()() as session:
+        rows = await AsyncRepository(session).get_rank_events(after, tracking_ids, domain, limit)
+    return [dict(zip(EVENT_FIELDS, row)) for row in rows]
+
+async def _wait_for_events(after: int, tracking_ids, domain, limit: int, timeout: float) -> List[dict]:
+    deadline = time.monotonic() + timeout
+    while True:
+        events = await _read_events(after, tracking_ids, domain, limit)
+        remaining = deadline - time.monotonic()
+        if events or remaining <= 0:
+            return events
+        await event_feed.wait(min(remaining, event_feed.POLL_SECONDS))
+
+def _jsonable_events(events: List[dict]) -> List[dict]:
+    return [dict(e, checked_at=as_utc(e["checked_at"]).isoformat()) for e in events]
+
+@router.get("/events")
+async def rank_events(after: int = Query(0, ge=0), tracking_id: Optional[List[int]] = Query(None),
+                      domain: Optional[str] = None, limit: int = Query(500, ge=1, le=5000),
+                      wait: float = Query(0, ge=0, le=EVENTS_MAX_WAIT)):
+    """
+    Rank changes (entered, dropped, moved, serp_changed; see app/core/rank_events.py)
+    with id > `after`, oldest first. With `wait`, long-polls up to that many
+    seconds for the first new event. Pass the returned `next` as `after` to
+    continue; it stays put when nothing came.
+    """
+    events = await _wait_for_events(after, tracking_id, domain, limit, wait)
+    return JSONResponse({"events": _jsonable_events(events), "next": events[-1]["id"] if events else after})
+
+@router.get("/events/stream")
+async def rank_events_stream(request: Request, after: Optional[int] = Query(None, ge=0),
+                             tracking_id: Optional[List[int]] = Query(None), domain: Optional[str] = None):
+    """
+    Server-sent events: one `rank_change` message per event, with the event id
+    as the SSE id, so a reconnecting EventSource resumes from Last-Event-ID.
+    Without `after` or Last-Event-ID the stream starts at new events only.
+    """
+    last_id = request.headers.get("last-event-id")
+    if last_id and last_id.isdigit():
+        after = int(last_id)
+    if after is None:
+        async with get_async_sessionmaker()() as session:
+            after = await AsyncRepository(session).last_rank_event_id()
+
+    async def stream(after: int):
+        yield "retry: 5000\n\n"
+        while not await request.is_disconnected():
+            events = await _wait_for_events(after, tracking_id, domain, 500, EVENTS_HEARTBEAT_SECONDS)
+            if not events:
+                yield ": keep-alive\n\n"
+                continue
+            for e in _jsonable_events(events):
+                yield f"id: {e['id']}\nevent: rank_change\ndata: {dumps(e)}\n\n"
+            after = events[-1]["id"]
+
+    return StreamingResponse(stream(after), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 @router.delete("/track/{tracking_id}")
-def delete_tracking(tracking_id: int):
-    success = service.delete_tracking(tracking_id)
+async def delete_tracking(tracking_id: int, repo: AsyncRepository = Depends(get_async_repo)):
+    success = await repo.delete_tracking(tracking_id)
     if not success:
         raise HTTPException(status_code=404, detail="tracking not found")
+    notify_tracking_removed(tracking_id)
     return {"message": "deleted"}
 
 @router.put("/track/{tracking_id}")
-def update_tracking(tracking_id: int, req: TrackRequest):
-    tk = service.update_tracking(tracking_id, req.domain, req.keyword, req.frequency)
+async def update_tracking(tracking_id: int, req: TrackRequest, repo: AsyncRepository = Depends(get_async_repo)):
+    tk = await repo.update_tracking(tracking_id, req.domain, req.keyword, req.frequency, req.priority)
     if not tk:
         raise HTTPException(status_code=404, detail="tracking not found")
-    return {"id": tk.id, "domain": tk.domain, "keyword": tk.keyword, "frequency": tk.frequency}
+    notify_tracking_changed(tk.id, tk.next_due_at)
+    return {"id": tk.id, "domain": tk.domain, "keyword": tk.keyword, "frequency": tk.frequency, "priority": tk.priority}
+
+@router.get("/serp-cache")
+def serp_cache_stats():
+    return serp_cache.stats()
+
+@router.get("/http-stats")
+def http_stats():
+    return get_http_client().stats.snapshot()
+
+@router.get("/queue")
+def queue_stats(repo: Repository = Depends(get_repo)):
+    """Depth of the rank check queue (RANK_CHECK_MODE=queue)."""
+    return {"mode": RANK_CHECK_MODE, **repo.queue_stats()}
+
+@router.get("/quota")
+def quota_stats():
+    """Provider calls used and still available today (quotas from e.g. SERPAPI_DAILY_QUOTA / SERPAPI_MONTHLY_QUOTA)."""
+    return [get_quota(p).stats() for p in PROVIDERS]
+
+# Sync on purpose: the check runs on this thread so the profiler sees all of it
+@router.post("/track/{tracking_id}/profile")
+def profile_tracking(tracking_id: int, interval_ms: float = Query(5, ge=1, le=100), top: int = Query(30, ge=1, le=200),
+                     repo: Repository = Depends(get_repo)):
+    """
+    Run one rank check for a tracking now, under the sampling profiler (see
+    app/infrastructure/profiler.py), and return where the time went. The check
+    is recorded like a scheduled one. Needs ENABLE_PROFILER=1.
+    """
+    if not PROFILER_ENABLED:
+        raise HTTPException(status_code=404, detail="profiler disabled (set ENABLE_PROFILER=1)")
+    tk = repo.get_tracking_by_id(tracking_id)
+    if not tk:
+        raise HTTPException(status_code=404, detail="tracking not found")
+    service = RankTrackerService(repo)
+    with SamplingProfiler(interval=interval_ms / 1000) as profiler:
+        service.check_many([tk])
+    return {"tracking_id": tracking_id, "position": tk.last_position, **profiler.report(top)}
+
+COMPARE_MAX_DOMAINS = 50
+
+class CompareRequest(BaseModel):
+    keyword: str
+    domains: List[str]
+
+@router.post("/compare")
+async def compare_domains(req: CompareRequest):
+    """Positions of a domain and its competitors for one keyword, from a single SERP fetch."""
+    domains = list(dict.fromkeys(d.strip() for d in req.domains if d and d.strip()))
+    if not req.keyword.strip() or not domains:
+        raise HTTPException(status_code=400, detail="keyword and domains required")
+    if len(domains) > COMPARE_MAX_DOMAINS:
+        raise HTTPException(status_code=400, detail=f"at most {COMPARE_MAX_DOMAINS} domains per request")
+    # Awaited on the event loop through the async HTTP client, not parked on a threadpool thread
+    res = await aget_serpapi_positions_multi(req.keyword, domains)
+    if "error" in res:
+        raise HTTPException(status_code=502, detail=res["error"])
+    return {"keyword": req.keyword, "positions": {d: res["positions"].get(d) for d in domains}}
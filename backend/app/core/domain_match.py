@@ -0,0 +1,94 @@
+"""
+Match SERP result URLs against a set of domains in one pass.
+
+Tracked domains are normalized to bare hostnames ("https://www.Example.com/x"
+-> "example.com"). A result matches a domain when its hostname is that domain
+or a subdomain of it: "blog.example.com" counts for "example.com", but
+"notexample.com" and "example.com.evil.net" do not. Lookup walks the label
+suffixes of each result hostname through a dict, so the cost per result does
+not grow with the number of domains.
+"""
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import parse_qs, urlsplit
+
+
+def normalize_domain(value: str) -> str:
+    """Bare lowercase hostname of a domain or URL as users enter it, without "www."."""
+    value = (value or "").strip().lower()
+    if "://" not in value:
+        value = "//" + value
+    host = urlsplit(value).hostname or ""
+    host = host.rstrip(".")
+    return host[4:] if host.startswith("www.") else host
+
+
+@lru_cache(maxsize=65536)
+def result_host(href: str) -> Optional[str]:
+    """Hostname of a result link; Google's "/url?q=<target>" redirects are unwrapped."""
+    if not href:
+        return None
+    if href.startswith("/url?"):
+        target = parse_qs(urlsplit(href).query).get("q")
+        if not target:
+            return None
+        href = target[0]
+    scheme_end = href.find("://")
+    rest = href[scheme_end + 3:] if scheme_end >= 0 else href.lstrip("/")
+    for sep in "/?#":
+        cut = rest.find(sep)
+        if cut >= 0:
+            rest = rest[:cut]
+    if "@" in rest or rest.startswith("["):
+        # Userinfo or IPv6 literal: leave it to urlsplit
+        try:
+            host = urlsplit("//" + rest).hostname
+        except ValueError:
+            return None
+    else:
+        host = rest.split(":", 1)[0].lower()
+    return host.rstrip(".") or None
+
+
+class DomainMatcher:
+    def __init__(self, domains: Iterable[str]):
+        # normalized domain -> the domain strings as given (several spellings can share one)
+        self._lookup: Dict[str, List[str]] = {}
+        for d in domains:
+            key = normalize_domain(d)
+            if key:
+                self._lookup.setdefault(key, [])
+                if d not in self._lookup[key]:
+                    self._lookup[key].append(d)
+        self.domains = [d for given in self._lookup.values() for d in given]
+
+    def match(self, href: str) -> List[str]:
+        """Domains (as given) that the result at `href` belongs to; at most one per suffix length."""
+        host = result_host(href)
+        if not host:
+            return []
+        found = []
+        labels = host.split(".")
+        for i in range(len(labels) - 1):
+            given = self._lookup.get(".".join(labels[i:]))
+            if given:
+                found.extend(given)
+        return found
+
+    def positions(self, items: List[Dict], found: Optional[Dict[str, int]] = None) -> Dict[str, int]:
+        """
+        First position of each domain in `items`, added to `found` (pass the
+        previous result to continue over the next page). Stops scanning once
+        every domain has a position.
+        """
+        found = {} if found is None else found
+        for item in items:
+            if len(found) == len(self.domains):
+                break
+            for d in self.match(item.get("href") or ""):
+                if d not in found:
+                    found[d] = item.get("position")
+        return found
+
+    def complete(self, found: Dict[str, int]) -> bool:
+        return len(found) >= len(self.domains)
@@ -0,0 +1,127 @@
+"""
+Keyword volume / difficulty / opportunity heuristics.
+
+`score_keyword` scores one keyword; `score_keywords` scores whole arrays with
+NumPy and returns exactly the same numbers (same float64 operations in the
+same order, and the MD5 variation reduced mod 100 without Python big ints).
+Both read the constants below, so tune them here.
+"""
+import hashlib
+from typing import Optional, Sequence, Tuple
+
+BASE_VOLUME = 50000
+MIN_VOLUME = 100
+MAX_VOLUME = 500000
+BASE_DIFFICULTY = 70
+MIN_DIFFICULTY = 10
+MAX_DIFFICULTY = 100
+
+
+def _variation(keyword: str) -> float:
+    # Use hash for consistent pseudo-random variation
+    hash_val = int(hashlib.md5(keyword.encode()).hexdigest(), 16)
+    return (hash_val % 100) / 100.0  # 0.0 to 1.0
+
+
+def score_keyword(keyword: str, position: int) -> Tuple[int, int]:
+    """
+    Calculate estimated volume and difficulty based on keyword characteristics.
+    Uses heuristics instead of unreliable web scraping.
+    """
+    # Base metrics on keyword characteristics
+    word_count = len(keyword.split())
+    variation = _variation(keyword)
+
+    # Volume estimation (monthly searches)
+    # Shorter, more generic keywords = higher volume
+    # Position in autocomplete also matters (higher = less popular)
+
+    # Adjust by word count (more words = more specific = lower volume)
+    word_count_factor = 1.0 / (word_count ** 1.5)
+
+    # Adjust by position (lower position = more popular)
+    position_factor = 1.0 / (1 + position * 0.3)
+
+    # Add variation for realism
+    volume_variation = 0.5 + variation
+
+    estimated_volume = int(BASE_VOLUME * word_count_factor * position_factor * volume_variation)
+
+    # Ensure reasonable bounds
+    estimated_volume = max(MIN_VOLUME, min(MAX_VOLUME, estimated_volume))
+
+    # Difficulty calculation (0-100)
+    # Shorter keywords = higher difficulty (more competition)
+    # Longer, specific keywords = lower difficulty
+
+    # Adjust by word count (more words = easier to rank)
+    word_difficulty_factor = max(0.3, 1.0 - (word_count - 1) * 0.15)
+
+    # Adjust by estimated volume (higher volume = higher difficulty)
+    volume_difficulty_factor = 0.5 + (estimated_volume / 100000) * 0.5
+
+    # Add variation
+    difficulty_variation = 0.7 + (variation * 0.6)
+
+    difficulty = int(BASE_DIFFICULTY * word_difficulty_factor * volume_difficulty_factor * difficulty_variation)
+
+    # Ensure bounds
+    difficulty = max(MIN_DIFFICULTY, min(MAX_DIFFICULTY, difficulty))
+
+    return estimated_volume, difficulty
+
+
+def opportunity(estimated_volume: int, difficulty: int) -> str:
+    if estimated_volume > 10000 and difficulty < 40:
+        return "high"
+    elif estimated_volume > 2000 and difficulty < 60:
+        return "medium"
+    return "low"
+
+
+def score_keywords(keywords: Sequence[str], positions: Optional[Sequence[int]] = None):
+    """
+    Batch version of score_keyword + opportunity: (volumes, difficulties,
+    opportunities) for `keywords`, positions defaulting to 0. NumPy arrays
+    when NumPy is installed, plain lists otherwise.
+    """
+    if positions is None:
+        positions = [0] * len(keywords)
+    try:
+        import numpy as np
+    except ImportError:
+        volumes, difficulties = zip(*(score_keyword(k, p) for k, p in zip(keywords, positions))) if keywords else ((), ())
+        return list(volumes), list(difficulties), [opportunity(v, d) for v, d in zip(volumes, difficulties)]
+
+    n = len(keywords)
+    word_count = np.fromiter((len(k.split()) for k in keywords), dtype=np.int64, count=n)
+    if n and not word_count.all():
+        raise ZeroDivisionError("cannot score a keyword with no words")
+    position = np.asarray(positions, dtype=np.int64)
+
+    # md5 digests as an (n, 16) byte matrix; Horner's rule over the bytes gives
+    # int(hexdigest, 16) % 100 exactly while staying in small integers
+    digests = np.frombuffer(b"".join(hashlib.md5(k.encode()).digest() for k in keywords), dtype=np.uint8).reshape(n, 16)
+    rem = np.zeros(n, dtype=np.int64)
+    for col in range(16):
+        rem = (rem * 256 + digests[:, col]) % 100
+    variation = rem / 100.0
+
+    word_count_factor = 1.0 / (word_count ** 1.5)
+    position_factor = 1.0 / (1 + position * 0.3)
+    volume_variation = 0.5 + variation
+    volume = (BASE_VOLUME * word_count_factor * position_factor * volume_variation).astype(np.int64)
+    volume = np.clip(volume, MIN_VOLUME, MAX_VOLUME)
+
+    word_difficulty_factor = np.maximum(0.3, 1.0 - (word_count - 1) * 0.15)
+    volume_difficulty_factor = 0.5 + (volume / 100000) * 0.5
+    difficulty_variation = 0.7 + (variation * 0.6)
+    difficulty = (BASE_DIFFICULTY * word_difficulty_factor * volume_difficulty_factor * difficulty_variation).astype(np.int64)
+    difficulty = np.clip(difficulty, MIN_DIFFICULTY, MAX_DIFFICULTY)
+
+    opportunities = np.select(
+        [(volume > 10000) & (difficulty < 40), (volume > 2000) & (difficulty < 60)],
+        ["high", "medium"],
+        "low",
+    )
+    return volume, difficulty, opportunities
@@ -1,4 +1,5 @@
 from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
 from typing import Optional, List, Dict
 
 @dataclass
@@ -7,3 +8,89 @@ class RankResult:
     domain: str
     position: Optional[int]  # None if not found
     serp_snippets: Optional[List[Dict]] = None  # optional parsed SERP items
+
+# How often a tracking is re-checked, by its `frequency` value
+FREQUENCY_INTERVALS = {
+    "minutely": timedelta(minutes=1),
+    "hourly": timedelta(hours=1),
+    "daily": timedelta(days=1),
+    "weekly": timedelta(weeks=1),
+    "monthly": timedelta(days=30),
+}
+
+def frequency_interval(frequency: Optional[str]) -> timedelta:
+    # Unknown values default to daily
+    return FREQUENCY_INTERVALS.get((frequency or "daily").lower(), FREQUENCY_INTERVALS["daily"])
+
+# Spread the first re-check of each tracking over a window, so a batch of
+# trackings created together does not come due in the same instant forever after
+SPREAD_FRACTION = 0.1
+MAX_SPREAD = timedelta(hours=1)
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+def as_utc(dt: datetime) -> datetime:
+    # SQLite hands back naive datetimes; everything we store is UTC
+    return dt.replace(tzinfo=timezone.utc) if dt.tzinfo is None else dt
+
+def spread_offset(tracking_id: Optional[int], interval: timedelta) -> timedelta:
+    if not tracking_id:
+        return timedelta(0)
+    window = min(interval * SPREAD_FRACTION, MAX_SPREAD)
+    # Multiplicative hash -> stable fraction in [0, 1) per tracking
+    frac = ((tracking_id * 2654435761) % 2**32) / 2**32
+    return window * frac
+
+def compute_next_due(last_checked: Optional[datetime], frequency: Optional[str],
+                     tracking_id: Optional[int] = None, previous_due: Optional[datetime] = None) -> datetime:
+    """
+    Next time a tracking should be checked.
+    Without `previous_due` this is last check + interval + a per-tracking offset.
+    With it, the schedule stays anchored to the previous slot so check latency
+    does not drift the phase; slots missed while the process was down are skipped.
+    """
+    if last_checked is None:
+        return utcnow()
+    last_checked = as_utc(last_checked)
+    interval = frequency_interval(frequency)
+    if previous_due is None:
+        return last_checked + interval + spread_offset(tracking_id, interval)
+    previous_due = as_utc(previous_due)
+    if previous_due > last_checked:
+        # Checked ahead of schedule (manual run): keep the existing slot
+        return previous_due
+    missed = (last_checked - previous_due) // interval
+    return previous_due + interval * (missed + 1)
+
+def schedule_after_check(tracking, checked_at: datetime) -> datetime:
+    """Next due time for a tracking (anything with id/frequency/next_due_at/last_checked_at) checked at `checked_at`."""
+    # The first check after creation gets a spread offset; later ones stay on their slot
+    previous_due = tracking.next_due_at if tracking.last_checked_at else None
+    return compute_next_due(checked_at, tracking.frequency, tracking.id, previous_due)
+
+# History granularities, finest first. Raw rows are only kept for a few days;
+# older data lives in the daily/weekly rollup tables.
+HISTORY_GRANULARITIES = ("raw", "daily", "weekly")
+RAW_MAX_SPAN = timedelta(days=7)
+DAILY_MAX_SPAN = timedelta(days=180)
+
+def bucket_start(dt: datetime, granularity: str) -> datetime:
+    """Start of the UTC day ("daily") or ISO week ("weekly") containing `dt`."""
+    day = as_utc(dt).replace(hour=0, minute=0, second=0, microsecond=0)
+    if granularity == "weekly":
+        return day - timedelta(days=day.weekday())
+    return day
+
+def pick_granularity(start: datetime, end: datetime, raw_since: Optional[datetime] = None) -> str:
+    """
+    Finest granularity that keeps [start, end] to a chartable number of points:
+    raw rows for short ranges they still cover (`raw_since` = retention cutoff
+    of raw rows), daily buckets up to ~6 months, weekly beyond that.
+    """
+    span = as_utc(end) - as_utc(start)
+    if span <= RAW_MAX_SPAN and (raw_since is None or as_utc(start) >= as_utc(raw_since)):
+        return "raw"
+    if span <= DAILY_MAX_SPAN:
+        return "daily"
+    return "weekly"
@@ -0,0 +1,51 @@
+"""
+Rank change detection, done as each check is recorded.
+
+The new result is compared with what the tracking row already caches (its
+last position and a fingerprint of the SERP's top results), so no history
+is read. A change becomes one `rank_events` row:
+
+- entered:      the domain was not ranking and now is
+- dropped:      it was ranking and is no longer found
+- moved:        its position changed by at least RANK_EVENT_MIN_DELTA
+- serp_changed: its position is unchanged but the hosts in the top
+                SERP_FINGERPRINT_TOP_N results changed (new competitors, reshuffle)
+
+The first check of a tracking only sets the baseline. Failed checks produce
+no events and leave the cached state alone.
+"""
+import hashlib
+import os
+from typing import Dict, List, Optional
+
+from app.core.domain_match import normalize_domain, result_host
+
+MIN_DELTA = int(os.getenv("RANK_EVENT_MIN_DELTA", "1"))
+FINGERPRINT_TOP_N = int(os.getenv("SERP_FINGERPRINT_TOP_N", "10"))
+
+EVENT_KINDS = ("entered", "dropped", "moved", "serp_changed")
+
+
+def serp_fingerprint(items: List[Dict], top_n: int = FINGERPRINT_TOP_N) -> Optional[str]:
+    """Short hash of the ordered hosts of the top `top_n` results; None for an empty SERP."""
+    hosts = [normalize_domain(result_host(item.get("href") or "") or "")
+             for item in sorted(items, key=lambda i: i.get("position") or 0)[:top_n]]
+    if not hosts:
+        return None
+    return hashlib.sha1("|".join(hosts).encode()).hexdigest()[:16]
+
+
+def detect_change(old_position: Optional[int], new_position: Optional[int],
+                  old_fingerprint: Optional[str], new_fingerprint: Optional[str],
+                  min_delta: int = MIN_DELTA) -> Optional[str]:
+    """Event kind for a check, or None when nothing worth reporting changed."""
+    if old_position is None and new_position is not None:
+        return "entered"
+    if old_position is not None and new_position is None:
+        return "dropped"
+    if old_position is not None and new_position != old_position:
+        # Small moves are noise at this threshold, not a SERP change either
+        return "moved" if abs(new_position - old_position) >= min_delta else None
+    if old_fingerprint and new_fingerprint and old_fingerprint != new_fingerprint:
+        return "serp_changed"
+    return None
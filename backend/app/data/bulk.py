@@ -0,0 +1,102 @@
+"""
+Dialect-aware bulk helpers shared by the repositories and migrations.
+
+SQLite and Postgres get one executemany INSERT ... ON CONFLICT. Other
+dialects fall back to a portable row-by-row UPDATE / INSERT, with each INSERT
+in a savepoint so a unique-constraint hit doesn't abort the transaction.
+"""
+from typing import Callable, Iterable, List, Sequence
+
+from sqlalchemy import and_, insert as generic_insert, update
+from sqlalchemy.exc import IntegrityError
+
+
+def _dialect_insert(conn):
+    """The dialect's insert() with ON CONFLICT support, or None for the generic fallback."""
+    bind = conn.get_bind() if hasattr(conn, "get_bind") else conn
+    dialect = bind.dialect.name
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        return None
+    return insert
+
+
+def _where_key(table, row: dict, conflict_cols: Sequence[str]):
+    return and_(*(table.c[c] == row[c] for c in conflict_cols))
+
+
+def _insert_row(conn, table, row: dict) -> bool:
+    # False when the row hit a unique constraint
+    try:
+        with conn.begin_nested():
+            conn.execute(generic_insert(table), [row])
+        return True
+    except IntegrityError:
+        return False
+
+
+def _update_or_insert(conn, table, rows: List[dict], conflict_cols: Sequence[str], values: Callable[[dict], dict]):
+    # Generic fallback for insert_or_increment/upsert. The second UPDATE covers
+    # a row inserted by someone else between our UPDATE and INSERT.
+    for row in rows:
+        stmt = update(table).where(_where_key(table, row, conflict_cols)).values(values(row))
+        if conn.execute(stmt).rowcount:
+            continue
+        if not _insert_row(conn, table, row):
+            conn.execute(stmt)
+
+
+def insert_ignore(conn, table, rows: List[dict], conflict_cols: Sequence[str]):
+    """
+    executemany INSERT that skips rows hitting a unique constraint on
+    `conflict_cols` (INSERT ... ON CONFLICT DO NOTHING on SQLite/Postgres).
+    `conn` can be a Connection or a Session.
+    """
+    if not rows:
+        return
+    insert = _dialect_insert(conn)
+    if insert is None:
+        for row in rows:
+            _insert_row(conn, table, row)
+        return
+    conn.execute(insert(table).on_conflict_do_nothing(index_elements=list(conflict_cols)), rows)
+
+
+def insert_or_increment(conn, table, rows: List[dict], conflict_cols: Sequence[str], column: str):
+    """
+    executemany upsert that adds each row's `column` value to the existing
+    row's on a conflict on `conflict_cols` (a counter that needs no read first).
+    """
+    if not rows:
+        return
+    insert = _dialect_insert(conn)
+    if insert is None:
+        _update_or_insert(conn, table, rows, conflict_cols, lambda row: {column: table.c[column] + row[column]})
+        return
+    stmt = insert(table)
+    stmt = stmt.on_conflict_do_update(index_elements=list(conflict_cols),
+                                      set_={column: table.c[column] + stmt.excluded[column]})
+    conn.execute(stmt, rows)
+
+
+def upsert(conn, table, rows: List[dict], conflict_cols: Sequence[str]):
+    """executemany INSERT that overwrites the other columns of a row conflicting on `conflict_cols`."""
+    if not rows:
+        return
+    insert = _dialect_insert(conn)
+    if insert is None:
+        _update_or_insert(conn, table, rows, conflict_cols,
+                          lambda row: {c: v for c, v in row.items() if c not in conflict_cols})
+        return
+    stmt = insert(table)
+    stmt = stmt.on_conflict_do_update(index_elements=list(conflict_cols),
+                                      set_={c: stmt.excluded[c] for c in rows[0] if c not in conflict_cols})
+    conn.execute(stmt, rows)
+
+
+def chunked(seq: Sequence, size: int) -> Iterable[Sequence]:
+    for i in range(0, len(seq), size):
+        yield seq[i:i + size]
@@ -1,19 +1,142 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker, declarative_base
 import os
+import threading
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./app_data.db")
 
-engine = create_engine(
-    DATABASE_URL, connect_args={"check_same_thread": False}
-)
+# Pool/connection tuning, all overridable from the environment
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # seconds; -1 disables
+POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_WAL = os.getenv("SQLITE_WAL", "true").lower() in ("1", "true", "yes")
+# Run create_all + migrations when the API/worker starts. Set to false where the
+# schema is migrated as a deploy step instead (`python manage.py migrate`).
+AUTO_MIGRATE = os.getenv("DB_AUTO_MIGRATE", "true").lower() in ("1", "true", "yes")
+
+
+def _is_sqlite(url: str) -> bool:
+    return url.startswith("sqlite")
+
+
+def _is_memory_sqlite(url: str) -> bool:
+    return _is_sqlite(url) and (":memory:" in url or url.rstrip("/").endswith(":"))
+
+
+def engine_options(url: str) -> dict:
+    if _is_memory_sqlite(url):
+        return {"connect_args": {"check_same_thread": False}}
+    opts = {
+        "pool_size": POOL_SIZE,
+        "max_overflow": MAX_OVERFLOW,
+        "pool_timeout": POOL_TIMEOUT,
+        "pool_recycle": POOL_RECYCLE,
+        "pool_pre_ping": POOL_PRE_PING,
+    }
+    if _is_sqlite(url):
+        # check_same_thread is a sqlite3-only argument; other drivers reject it
+        opts["connect_args"] = {"check_same_thread": False}
+    return opts
+
+
+def _configure_sqlite(dbapi_conn, _record):
+    # WAL lets readers keep going while the scheduler/workers write, and the
+    # busy timeout makes concurrent writers wait instead of failing fast.
+    cur = dbapi_conn.cursor()
+    cur.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    if SQLITE_WAL:
+        cur.execute("PRAGMA journal_mode=WAL")
+        cur.execute("PRAGMA synchronous=NORMAL")
+    cur.close()
+
+
+def create_configured_engine(url: str = DATABASE_URL):
+    eng = create_engine(url, **engine_options(url))
+    if _is_sqlite(url) and not _is_memory_sqlite(url):
+        event.listen(eng, "connect", _configure_sqlite)
+    return eng
+
+
+# The sync engine and its sessionmaker are also created on first use, so
+# importing the app doesn't set up a pool it may never need. `engine` and
+# `SessionLocal` still work as module attributes.
+_engine = None
+_sessionmaker = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = create_configured_engine()
+        return _engine
+
+
+def get_sessionmaker():
+    global _sessionmaker
+    if _sessionmaker is None:
+        engine = get_engine()
+        with _engine_lock:
+            if _sessionmaker is None:
+                _sessionmaker = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    return _sessionmaker
+
+
+def __getattr__(name):
+    if name == "engine":
+        return get_engine()
+    if name == "SessionLocal":
+        return get_sessionmaker()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
+# Async engine for the API's request path. Same database, async driver:
+# sqlite -> aiosqlite, postgresql -> asyncpg. Created on first use so
+# processes that never serve requests (workers, scripts) don't need the drivers.
+_ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgres": "postgresql+asyncpg",
+}
+
+_async_engine = None
+_async_sessionmaker = None
+
+
+def async_database_url(url: str = DATABASE_URL) -> str:
+    scheme, rest = url.split("://", 1)
+    if "+" in scheme:
+        base, driver = scheme.split("+", 1)
+        if driver in ("aiosqlite", "asyncpg"):
+            return url
+        scheme = base
+    return f"{_ASYNC_DRIVERS.get(scheme, scheme)}://{rest}"
+
+
+def get_async_sessionmaker():
+    global _async_engine, _async_sessionmaker
+    if _async_sessionmaker is None:
+        from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+        url = async_database_url()
+        opts = engine_options(DATABASE_URL)
+        opts.pop("connect_args", None)  # aiosqlite runs each connection on its own thread
+        _async_engine = create_async_engine(url, **opts)
+        if _is_sqlite(url) and not _is_memory_sqlite(url):
+            event.listen(_async_engine.sync_engine, "connect", _configure_sqlite)
+        _async_sessionmaker = async_sessionmaker(_async_engine, autoflush=False, expire_on_commit=False)
+    return _async_sessionmaker
+
 
 def init_db():
     # Import models so they are registered on metadata
     from app.data import models  # noqa: F401
+    from app.data.migrations import run_migrations
+    engine = get_engine()
     Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
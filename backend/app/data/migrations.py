@@ -0,0 +1,185 @@
+"""
+Minimal schema migrations. create_all() only creates missing tables, so
+column additions and backfills for existing databases live here.
+Each migration runs once, in order, and is recorded in `schema_version`.
+"""
+from sqlalchemy import MetaData, Table, bindparam, false, inspect, text, select, func
+
+
+def _add_column(conn, column):
+    table = column.table.name
+    existing = {c["name"] for c in inspect(conn).get_columns(table)}
+    if column.name in existing:
+        return
+    col_type = column.type.compile(dialect=conn.dialect)
+    conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column.name} {col_type}"))
+
+
+def _create_indexes(conn, table):
+    existing = {c["name"] for c in inspect(conn).get_columns(table.name)}
+    for index in table.indexes:
+        # Indexes on columns a later migration adds are created by that migration
+        if all(c.name in existing for c in index.columns):
+            index.create(conn, checkfirst=True)
+
+
+def _m001_tracking_due_times(conn):
+    from app.data import models
+    from app.core.rank import compute_next_due
+
+    tk_table = models.TrackingKeyword.__table__
+    _add_column(conn, tk_table.c.last_checked_at)
+    _add_column(conn, tk_table.c.next_due_at)
+    _create_indexes(conn, tk_table)
+    _create_indexes(conn, models.RankHistory.__table__)
+
+    # Backfill from the latest history row of each tracking
+    rh = models.RankHistory.__table__
+    last_checks = dict(conn.execute(
+        select(rh.c.tracking_id, func.max(rh.c.checked_at)).group_by(rh.c.tracking_id)
+    ).all())
+    rows = conn.execute(select(tk_table.c.id, tk_table.c.frequency).where(tk_table.c.next_due_at.is_(None))).all()
+    for tracking_id, frequency in rows:
+        last = last_checks.get(tracking_id)
+        conn.execute(
+            tk_table.update().where(tk_table.c.id == tracking_id).values(
+                last_checked_at=last, next_due_at=compute_next_due(last, frequency)
+            )
+        )
+
+
+def _m002_intern_serp_snapshots(conn):
+    """Move JSON snapshots into serp_results + packed refs, in id-ordered batches."""
+    import json
+    from app.data import models
+    from app.infrastructure.snapshot_store import SNAPSHOT_ITEMS, intern_items
+
+    rh = models.RankHistory.__table__
+    _add_column(conn, rh.c.snapshot_refs)
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            select(rh.c.id, rh.c.serp_snapshot)
+            .where(rh.c.id > last_id, rh.c.serp_snapshot.is_not(None), rh.c.snapshot_refs.is_(None))
+            .order_by(rh.c.id).limit(1000)
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        convertible = []
+        for rid, raw in rows:
+            try:
+                items = json.loads(raw)
+            except ValueError:
+                continue
+            if isinstance(items, list):  # error payloads are dicts and stay as text
+                convertible.append((rid, items[:SNAPSHOT_ITEMS]))
+        if not convertible:
+            continue
+        refs = intern_items(conn, [items for _, items in convertible])
+        conn.execute(
+            rh.update().where(rh.c.id == bindparam("rid")).values(snapshot_refs=bindparam("refs"), serp_snapshot=None),
+            [{"rid": rid, "refs": blob} for (rid, _), blob in zip(convertible, refs)],
+        )
+
+
+def _m003_history_rolled_up_flag(conn):
+    """rank_history.rolled_up marks rows already folded into the daily/weekly rollups (those tables are new)."""
+    from app.data import models
+
+    if "rolled_up" not in {c["name"] for c in inspect(conn).get_columns("rank_history")}:
+        default = false().compile(dialect=conn.dialect)
+        conn.execute(text(f"ALTER TABLE rank_history ADD COLUMN rolled_up BOOLEAN NOT NULL DEFAULT {default}"))
+    _create_indexes(conn, models.RankHistory.__table__)
+
+
+def _m004_sqlite_checked_at_format(conn):
+    """
+    Rows written by the CURRENT_TIMESTAMP server default are stored as
+    'YYYY-MM-DD HH:MM:SS' while SQLAlchemy writes '... HH:MM:SS.ffffff'.
+    SQLite compares them as text, which breaks (checked_at, id) keyset cursors
+    on the older rows; pad them to the same format.
+    """
+    if conn.dialect.name != "sqlite":
+        return
+    conn.execute(text(
+        "UPDATE rank_history SET checked_at = checked_at || '.000000' "
+        "WHERE typeof(checked_at) = 'text' AND length(checked_at) = 19"
+    ))
+
+
+def _m005_keyword_suggest_position(conn):
+    from app.data import models
+
+    _add_column(conn, models.Keyword.__table__.c.suggest_position)
+
+
+def _m006_tracking_position_priority(conn):
+    from app.data import models
+
+    tk_table = models.TrackingKeyword.__table__
+    _add_column(conn, tk_table.c.last_position)
+    _add_column(conn, tk_table.c.priority)
+    conn.execute(tk_table.update().where(tk_table.c.priority.is_(None)).values(priority=0))
+
+    # Backfill the last known position from the newest history row of each tracking
+    rh = models.RankHistory.__table__
+    latest = select(func.max(rh.c.id)).group_by(rh.c.tracking_id)
+    rows = conn.execute(select(rh.c.tracking_id, rh.c.position).where(rh.c.id.in_(latest), rh.c.position.is_not(None))).all()
+    if rows:
+        conn.execute(
+            tk_table.update().where(tk_table.c.id == bindparam("tid")).values(last_position=bindparam("pos")),
+            [{"tid": tid, "pos": pos} for tid, pos in rows],
+        )
+
+
+def _m007_tracking_serp_fingerprint(conn):
+    # rank_events itself is new and made by create_all
+    from app.data import models
+
+    _add_column(conn, models.TrackingKeyword.__table__.c.serp_fingerprint)
+
+
+def _m008_recent_query_slots(conn):
+    """Move the last recent_queries rows into the anonymous ring (recent_query_slots), then drop the old table."""
+    from app.data import models
+    from app.infrastructure.recent_queries import RING_SIZE
+
+    if "recent_queries" not in inspect(conn).get_table_names():
+        return
+    # Reflected, so created_at comes back as a datetime on SQLite too
+    old = Table("recent_queries", MetaData(), autoload_with=conn)
+    rows = conn.execute(select(old.c.query, old.c.location, old.c.results_count, old.c.created_at)
+                        .order_by(old.c.created_at.desc(), old.c.id.desc()).limit(RING_SIZE)).all()
+    # Oldest gets seq 1, so the newest has the highest seq
+    slots = [{"owner": "", "slot": seq % RING_SIZE, "seq": seq, "query": q or "", "location": loc,
+              "results_count": count, "created_at": created}
+             for seq, (q, loc, count, created) in enumerate(reversed(rows), start=1)]
+    if slots:
+        conn.execute(models.RecentQuerySlot.__table__.insert(), slots)
+    conn.execute(text("DROP TABLE recent_queries"))
+
+
+MIGRATIONS = [
+    (1, _m001_tracking_due_times),
+    (2, _m002_intern_serp_snapshots),
+    (3, _m003_history_rolled_up_flag),
+    (4, _m004_sqlite_checked_at_format),
+    (5, _m005_keyword_suggest_position),
+    (6, _m006_tracking_position_priority),
+    (7, _m007_tracking_serp_fingerprint),
+    (8, _m008_recent_query_slots),
+]
+
+
+def run_migrations(engine):
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)"))
+        current = conn.execute(text("SELECT MAX(version) FROM schema_version")).scalar() or 0
+
+    for version, migrate in MIGRATIONS:
+        if version <= current:
+            continue
+        with engine.begin() as conn:
+            migrate(conn)
+            conn.execute(text("INSERT INTO schema_version (version) VALUES (:v)"), {"v": version})
@@ -1,5 +1,5 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey
-from sqlalchemy.sql import func
+from sqlalchemy import Boolean, Column, Integer, String, DateTime, Text, ForeignKey, Index, LargeBinary
+from sqlalchemy.sql import false, func
 from sqlalchemy.orm import relationship
 from app.data.db import Base
 
@@ -9,8 +9,32 @@ class Keyword(Base):
     text = Column(String, unique=True, index=True, nullable=False)
     estimated_volume = Column(Integer, nullable=True)  # optional estimate
     difficulty = Column(Integer, nullable=True)        # difficulty bucket 1-100
+    suggest_position = Column(Integer, nullable=True)  # index in the autosuggest list it came from; input to rescoring
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+class ExpansionJob(Base):
+    """A keyword expansion crawl (see KeywordExpansionService) and its resumable state."""
+    __tablename__ = "expansion_jobs"
+    id = Column(Integer, primary_key=True)
+    seed = Column(String, nullable=False)
+    max_depth = Column(Integer, nullable=False, default=2)
+    budget = Column(Integer, nullable=False, default=500)  # max upstream autosuggest calls
+    status = Column(String, nullable=False, default="pending")  # pending/running/paused/done/failed
+    calls_made = Column(Integer, nullable=False, default=0)
+    keywords_found = Column(Integer, nullable=False, default=0)  # new rows added to keywords
+    frontier_size = Column(Integer, nullable=False, default=0)
+    failed_calls = Column(Integer, nullable=False, default=0)  # queries skipped after a network error
+    checkpoint = Column(Text, nullable=True)  # JSON: {"frontier": [[query, level], ...]}; visited queries in expansion_visited
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class ExpansionVisited(Base):
+    """Every query an expansion job has queued: its dedupe set, appended to chunk by chunk."""
+    __tablename__ = "expansion_visited"
+    job_id = Column(Integer, ForeignKey("expansion_jobs.id"), primary_key=True)
+    query = Column(String, primary_key=True)
+
 class TrackingKeyword(Base):
     __tablename__ = "tracking_keywords"
     id = Column(Integer, primary_key=True, index=True)
@@ -18,6 +42,11 @@ class TrackingKeyword(Base):
     keyword = Column(String, index=True, nullable=False)
     frequency = Column(String, default="daily")  # daily/weekly
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    last_checked_at = Column(DateTime(timezone=True), nullable=True)
+    next_due_at = Column(DateTime(timezone=True), index=True, nullable=True)  # set on insert and after every check
+    last_position = Column(Integer, nullable=True)  # from the latest check; picks the SERP depth of the next one
+    priority = Column(Integer, nullable=True, default=0)  # higher is checked first when the provider quota is short
+    serp_fingerprint = Column(String(16), nullable=True)  # hash of the top results' hosts at the latest check (app.core.rank_events)
 
     histories = relationship("RankHistory", back_populates="tracking", cascade="all, delete-orphan")
 
@@ -26,15 +55,106 @@ class RankHistory(Base):
     id = Column(Integer, primary_key=True, index=True)
     tracking_id = Column(Integer, ForeignKey("tracking_keywords.id"))
     position = Column(Integer, nullable=True)  # None if not found
-    serp_snapshot = Column(Text, nullable=True)  # raw snippet or JSON
+    serp_snapshot = Column(Text, nullable=True)  # legacy JSON, or {"error": ...} for failed checks
+    snapshot_refs = Column(LargeBinary, nullable=True)  # packed (position, serp_results.id) pairs
     checked_at = Column(DateTime(timezone=True), server_default=func.now())
+    rolled_up = Column(Boolean, nullable=False, default=False, server_default=false())  # folded into the daily/weekly rollups
 
     tracking = relationship("TrackingKeyword", back_populates="histories")
 
-class RecentQuery(Base):
-    __tablename__ = "recent_queries"
-    id = Column(Integer, primary_key=True, index=True)
-    query = Column(String, index=True)
+    __table_args__ = (
+        Index("ix_rank_history_tracking_checked", "tracking_id", "checked_at"),
+        Index("ix_rank_history_rolled_up", "rolled_up", "id"),
+    )
+
+class RankEvent(Base):
+    """A rank change found while recording a check (see app.core.rank_events); `id` is the feed cursor."""
+    __tablename__ = "rank_events"
+    id = Column(Integer, primary_key=True)
+    tracking_id = Column(Integer, ForeignKey("tracking_keywords.id"), nullable=False)
+    kind = Column(String(16), nullable=False)  # entered/dropped/moved/serp_changed
+    old_position = Column(Integer, nullable=True)
+    new_position = Column(Integer, nullable=True)
+    checked_at = Column(DateTime(timezone=True), nullable=False)
+
+    __table_args__ = (
+        Index("ix_rank_events_tracking", "tracking_id", "id"),
+        Index("ix_rank_events_checked_at", "checked_at"),
+    )
+
+class SerpResult(Base):
+    """One distinct SERP entry, shared by every history row that saw it."""
+    __tablename__ = "serp_results"
+    id = Column(Integer, primary_key=True)
+    key = Column(String(40), unique=True, nullable=False)  # sha1 of (href, title, snippet)
+    href = Column(Text, nullable=True)
+    title = Column(Text, nullable=True)
+    snippet = Column(Text, nullable=True)
+
+class _RankRollup:
+    """Aggregated checks of one tracking over one bucket (see Repository.rollup_history)."""
+    tracking_id = Column(Integer, ForeignKey("tracking_keywords.id"), primary_key=True)
+    bucket_start = Column(DateTime(timezone=True), primary_key=True)  # UTC midnight / Monday midnight
+    checks = Column(Integer, nullable=False, default=0)
+    found = Column(Integer, nullable=False, default=0)  # checks where the domain ranked
+    min_position = Column(Integer, nullable=True)
+    max_position = Column(Integer, nullable=True)
+    sum_position = Column(Integer, nullable=False, default=0)  # over found checks; avg = sum / found
+    last_position = Column(Integer, nullable=True)
+    last_checked_at = Column(DateTime(timezone=True), nullable=True)
+
+class RankDaily(_RankRollup, Base):
+    __tablename__ = "rank_history_daily"
+
+class RankWeekly(_RankRollup, Base):
+    __tablename__ = "rank_history_weekly"
+
+class ProviderUsage(Base):
+    """Provider calls made per UTC day ("day", "2026-01-31") and month ("month", "2026-01"); see app.infrastructure.quota."""
+    __tablename__ = "provider_usage"
+    provider = Column(String, primary_key=True)
+    period = Column(String, primary_key=True)
+    bucket = Column(String, primary_key=True)
+    used = Column(Integer, nullable=False, default=0)
+
+class RankCheckJob(Base):
+    """
+    A due rank check waiting in the work queue (see app.infrastructure.work_queue).
+    At most one row per tracking; the worker that completes it deletes it in the
+    same transaction as the history row.
+    """
+    __tablename__ = "rank_check_queue"
+    id = Column(Integer, primary_key=True)
+    tracking_id = Column(Integer, ForeignKey("tracking_keywords.id"), unique=True, nullable=False)
+    due_at = Column(DateTime(timezone=True), nullable=False)
+    enqueued_at = Column(DateTime(timezone=True), nullable=False)
+    lease_token = Column(String(32), nullable=True)  # claim that currently owns the job
+    leased_by = Column(String, nullable=True)  # worker name, for diagnostics
+    lease_expires_at = Column(DateTime(timezone=True), nullable=False)  # claimable from this time on
+    attempts = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        Index("ix_rank_check_queue_claim", "lease_expires_at", "due_at"),
+    )
+
+class Lease(Base):
+    """Named lease held by one process at a time, e.g. the queue producer."""
+    __tablename__ = "leases"
+    name = Column(String, primary_key=True)
+    holder = Column(String, nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+
+class RecentQuerySlot(Base):
+    """
+    Recent searches as a fixed ring of RECENT_QUERIES_SIZE slots per owner (a
+    user/session id, "" when anonymous). Each write overwrites slot seq % size
+    with one upsert; see app.infrastructure.recent_queries.
+    """
+    __tablename__ = "recent_query_slots"
+    owner = Column(String, primary_key=True)
+    slot = Column(Integer, primary_key=True)
+    seq = Column(Integer, nullable=False)  # per-owner write counter; newest first = highest seq
+    query = Column(String, nullable=False)
     location = Column(String, default="Unknown")
     results_count = Column(String, default="0")
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), nullable=False)
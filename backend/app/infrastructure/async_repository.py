@@ -0,0 +1,184 @@
+from app.data import models
+from app.core.rank import bucket_start, compute_next_due, utcnow
+from app.data.bulk import upsert
+from app.infrastructure.database_repository import ROLLUP_MODELS
+from app.infrastructure.snapshot_store import load_results, snapshot_json
+from sqlalchemy import Float, Integer, case, cast, delete, func, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+
+
+class AsyncRepository:
+    """
+    Async counterpart of Repository for the API request path. Wraps one
+    AsyncSession that lives for a single request (see app.api.deps).
+    """
+
+    def __init__(self, session: AsyncSession):
+        self._session = session
+
+    # --- Keywords ---
+    async def list_keywords(self, limit: int=100, before_id: Optional[int]=None) -> List[models.Keyword]:
+        """Newest first; pass the last id of a page as `before_id` for the next one."""
+        stmt = select(models.Keyword)
+        if before_id is not None:
+            stmt = stmt.where(models.Keyword.id < before_id)
+        res = await self._session.execute(stmt.order_by(models.Keyword.id.desc()).limit(limit))
+        return list(res.scalars())
+
+    # --- Tracking ---
+    async def add_tracking_keyword(self, domain: str, keyword: str, frequency: str="daily", priority: int=0) -> models.TrackingKeyword:
+        tk = models.TrackingKeyword(domain=domain, keyword=keyword, frequency=frequency, priority=priority, next_due_at=utcnow())
+        self._session.add(tk)
+        await self._session.commit()
+        await self._session.refresh(tk)
+        return tk
+
+    async def list_tracking(self, after_id: int=0, limit: Optional[int]=None) -> List[models.TrackingKeyword]:
+        stmt = select(models.TrackingKeyword).where(models.TrackingKeyword.id > after_id).order_by(models.TrackingKeyword.id)
+        if limit is not None:
+            stmt = stmt.limit(limit)
+        res = await self._session.execute(stmt)
+        return list(res.scalars())
+
+    async def find_trackings(self, tracking_ids: Optional[List[int]]=None, domain: Optional[str]=None,
+                             limit: int=2000) -> List[models.TrackingKeyword]:
+        """Trackings with the given ids and/or domain (both given: must match both), by id."""
+        tk = models.TrackingKeyword
+        stmt = select(tk)
+        if tracking_ids:
+            stmt = stmt.where(tk.id.in_(tracking_ids))
+        if domain:
+            stmt = stmt.where(tk.domain == domain)
+        res = await self._session.execute(stmt.order_by(tk.id).limit(limit))
+        return list(res.scalars())
+
+    async def get_tracking_by_id(self, tracking_id: int) -> Optional[models.TrackingKeyword]:
+        return await self._session.get(models.TrackingKeyword, tracking_id)
+
+    async def update_tracking(self, tracking_id: int, domain: str, keyword: str, frequency: str,
+                              priority: Optional[int]=None) -> Optional[models.TrackingKeyword]:
+        tk = await self.get_tracking_by_id(tracking_id)
+        if not tk:
+            return None
+        if (tk.domain, tk.keyword) != (domain, keyword):
+            # Another site or SERP: the cached state no longer applies, and the next
+            # check only sets the baseline (no event is detected without last_checked_at)
+            tk.last_position = tk.serp_fingerprint = tk.last_checked_at = None
+        tk.domain = domain
+        tk.keyword = keyword
+        if priority is not None:
+            tk.priority = priority
+        if tk.frequency != frequency:
+            tk.next_due_at = compute_next_due(tk.last_checked_at, frequency, tk.id)
+        tk.frequency = frequency
+        await self._session.commit()
+        return tk
+
+    async def delete_tracking(self, tracking_id: int) -> bool:
+        tk = await self.get_tracking_by_id(tracking_id)
+        if not tk:
+            return False
+        # Delete history in SQL rather than loading it for the ORM cascade
+        for model in (models.RankHistory, *ROLLUP_MODELS.values(), models.RankCheckJob, models.RankEvent):
+            await self._session.execute(
+                delete(model).where(model.tracking_id == tracking_id),
+                execution_options={"synchronize_session": False},
+            )
+        await self._session.delete(tk)
+        await self._session.commit()
+        return True
+
+    # --- Rank history ---
+    async def get_rank_history_for(self, tracking_id: int, limit: int=100, start=None, end=None,
+                                   before=None, with_snapshot: bool=False):
+        """
+        Newest first, as lightweight rows (id, position, checked_at), plus the
+        snapshot columns only when `with_snapshot`. `before` is the
+        (checked_at, id) of the last row of the previous page.
+        """
+        rh = models.RankHistory
+        cols = [rh.id, rh.position, rh.checked_at]
+        if with_snapshot:
+            cols += [rh.serp_snapshot, rh.snapshot_refs]
+        stmt = select(*cols).where(rh.tracking_id == tracking_id)
+        if start is not None:
+            stmt = stmt.where(rh.checked_at >= start)
+        if end is not None:
+            stmt = stmt.where(rh.checked_at <= end)
+        if before is not None:
+            stmt = stmt.where(tuple_(rh.checked_at, rh.id) < tuple_(*before))
+        res = await self._session.execute(stmt.order_by(rh.checked_at.desc(), rh.id.desc()).limit(limit))
+        return res.all()
+
+    async def get_rollups(self, tracking_id: int, granularity: str, start=None, end=None, limit: int=1000, before=None):
+        model = ROLLUP_MODELS[granularity]
+        stmt = select(model).where(model.tracking_id == tracking_id)
+        if start is not None:
+            stmt = stmt.where(model.bucket_start >= bucket_start(start, granularity))
+        if end is not None:
+            stmt = stmt.where(model.bucket_start <= end)
+        if before is not None:
+            stmt = stmt.where(model.bucket_start < before)
+        res = await self._session.execute(stmt.order_by(model.bucket_start.desc()).limit(limit))
+        return list(res.scalars())
+
+    async def get_history_points(self, tracking_ids: List[int], granularity: str, start, end):
+        """
+        (tracking_id, checked_at, position) for many trackings in one query,
+        ordered by tracking then time. Rollup points use the rounded average.
+        """
+        if not tracking_ids:
+            return []
+        if granularity == "raw":
+            rh = models.RankHistory
+            stmt = select(rh.tracking_id, rh.checked_at, rh.position)\
+                .where(rh.tracking_id.in_(tracking_ids), rh.checked_at >= start, rh.checked_at <= end)\
+                .order_by(rh.tracking_id, rh.checked_at)
+        else:
+            model = ROLLUP_MODELS[granularity]
+            avg = case((model.found > 0, cast(func.round(cast(model.sum_position, Float) / model.found), Integer)), else_=None)
+            stmt = select(model.tracking_id, model.bucket_start, avg)\
+                .where(model.tracking_id.in_(tracking_ids),
+                       model.bucket_start >= bucket_start(start, granularity), model.bucket_start <= end)\
+                .order_by(model.tracking_id, model.bucket_start)
+        res = await self._session.execute(stmt)
+        return res.all()
+
+    async def get_snapshots(self, histories) -> dict:
+        """history id -> snapshot JSON string, resolving interned results in one query."""
+        blobs = [h.snapshot_refs for h in histories]
+        results = await self._session.run_sync(lambda s: load_results(s, blobs))
+        return {h.id: snapshot_json(h.snapshot_refs, h.serp_snapshot, results) for h in histories}
+
+    # --- Rank events ---
+    async def get_rank_events(self, after_id: int=0, tracking_ids: Optional[List[int]]=None,
+                              domain: Optional[str]=None, limit: int=500):
+        """Event rows (plain columns plus the tracking's domain and keyword) with id > after_id, oldest first."""
+        ev, tk = models.RankEvent, models.TrackingKeyword
+        stmt = select(ev.id, ev.tracking_id, tk.domain, tk.keyword, ev.kind, ev.old_position, ev.new_position,
+                      ev.checked_at)\
+            .join(tk, tk.id == ev.tracking_id).where(ev.id > after_id)
+        if tracking_ids:
+            stmt = stmt.where(ev.tracking_id.in_(tracking_ids))
+        if domain:
+            stmt = stmt.where(tk.domain == domain)
+        res = await self._session.execute(stmt.order_by(ev.id).limit(limit))
+        return res.all()
+
+    async def last_rank_event_id(self) -> int:
+        res = await self._session.execute(select(func.max(models.RankEvent.id)))
+        return res.scalar() or 0
+
+    # --- Recent Queries ---
+    async def put_recent_query_slot(self, row: dict):
+        """Overwrite one (owner, slot) of the recent-queries ring: a single upsert, no read."""
+        await self._session.run_sync(lambda s: upsert(s, models.RecentQuerySlot.__table__, [row], ("owner", "slot")))
+        await self._session.commit()
+
+    async def get_recent_query_slots(self, owner: str) -> List[models.RecentQuerySlot]:
+        res = await self._session.execute(
+            select(models.RecentQuerySlot).where(models.RecentQuerySlot.owner == owner)
+            .order_by(models.RecentQuerySlot.seq.desc())
+        )
+        return list(res.scalars())
@@ -1,11 +1,37 @@
-from app.data.db import SessionLocal
+from app.data.db import get_sessionmaker
 from app.data import models
+from app.data.bulk import chunked, insert_ignore, insert_or_increment
+from app.core.rank import as_utc, bucket_start, compute_next_due, schedule_after_check, utcnow
+from app.infrastructure.snapshot_store import SNAPSHOT_ITEMS, intern_items, load_results, snapshot_json
+from sqlalchemy import bindparam, delete, exists, false, func, insert, or_, select, true, tuple_, update
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from datetime import timedelta
+from typing import List, Optional, Tuple
+import time
+import uuid
+
+ROLLUP_MODELS = {"daily": models.RankDaily, "weekly": models.RankWeekly}
 
 class Repository:
-    def __init__(self):
-        self._session: Session = SessionLocal()
+    """
+    One repository = one unit of work on its own Session. Use it as a context
+    manager so the session is rolled back on error and always closed:
+
+        with Repository() as repo:
+            ...
+    """
+
+    def __init__(self, session: Optional[Session] = None):
+        self._session: Session = session or get_sessionmaker()()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self._session.rollback()
+        self._session.close()
+        return False
 
     # --- Keywords ---
     def create_keyword(self, text: str, estimated_volume: Optional[int], difficulty: Optional[int]) -> models.Keyword:
@@ -18,37 +44,230 @@ class Repository:
     def get_keyword(self, text: str) -> Optional[models.Keyword]:
         return self._session.query(models.Keyword).filter_by(text=text).first()
 
+    def bulk_add_keywords(self, rows: List[dict]) -> int:
+        """
+        Store keywords (dicts with text, estimated_volume, difficulty) that are
+        not in the table yet: one IN lookup, then one INSERT that ignores
+        conflicts in case another request stored the same text meanwhile.
+        Returns how many were new.
+        """
+        by_text = {r["text"]: r for r in rows}
+        existing = set()
+        for part in chunked(list(by_text), 500):
+            existing.update(t for (t,) in self._session.query(models.Keyword.text).filter(models.Keyword.text.in_(part)))
+        new = [r for t, r in by_text.items() if t not in existing]
+        insert_ignore(self._session, models.Keyword.__table__, new, ["text"])
+        self._session.commit()
+        return len(new)
+
+    def keyword_scoring_batch(self, after_id: int, limit: int):
+        """(id, text, suggest_position, estimated_volume, difficulty) of rescorable keywords, by id."""
+        kw = models.Keyword
+        return self._session.query(kw.id, kw.text, kw.suggest_position, kw.estimated_volume, kw.difficulty)\
+            .filter(kw.id > after_id, kw.suggest_position.is_not(None))\
+            .order_by(kw.id).limit(limit).all()
+
+    def update_keyword_metrics(self, rows: List[dict]) -> int:
+        """executemany UPDATE by id; rows are {kid, estimated_volume, difficulty}."""
+        if rows:
+            kw = models.Keyword.__table__
+            # Core statement: the ORM bulk-update path costs several times more per row
+            self._session.execute(
+                kw.update().where(kw.c.id == bindparam("kid"))
+                .values(estimated_volume=bindparam("estimated_volume"), difficulty=bindparam("difficulty")),
+                rows,
+            )
+        self._session.commit()
+        return len(rows)
+
+    # --- Keyword expansion ---
+    def create_expansion_job(self, seed: str, max_depth: int, budget: int) -> models.ExpansionJob:
+        job = models.ExpansionJob(seed=seed, max_depth=max_depth, budget=budget, status="pending")
+        self._session.add(job)
+        self._session.commit()
+        self._session.refresh(job)
+        return job
+
+    def get_expansion_job(self, job_id: int) -> Optional[models.ExpansionJob]:
+        return self._session.get(models.ExpansionJob, job_id)
+
+    def update_expansion_job(self, job_id: int, visited: Optional[List[str]] = None, **values):
+        """Update the job row, adding `visited` queries to its dedupe set in the same transaction."""
+        if visited:
+            insert_ignore(self._session, models.ExpansionVisited.__table__,
+                          [{"job_id": job_id, "query": q} for q in visited], ["job_id", "query"])
+        self._session.execute(update(models.ExpansionJob).where(models.ExpansionJob.id == job_id).values(**values))
+        self._session.commit()
+
+    def get_expansion_visited(self, job_id: int) -> set:
+        return {q for (q,) in self._session.query(models.ExpansionVisited.query)
+                .filter(models.ExpansionVisited.job_id == job_id)}
+
     def list_keywords(self, limit:int=100) -> List[models.Keyword]:
         return self._session.query(models.Keyword).limit(limit).all()
 
     # --- Tracking ---
     def add_tracking_keyword(self, domain: str, keyword: str, frequency: str="daily") -> models.TrackingKeyword:
-        tk = models.TrackingKeyword(domain=domain, keyword=keyword, frequency=frequency)
+        tk = models.TrackingKeyword(domain=domain, keyword=keyword, frequency=frequency, next_due_at=utcnow())
         self._session.add(tk)
         self._session.commit()
         self._session.refresh(tk)
         return tk
 
+    def bulk_add_tracking(self, rows: List[dict], commit: bool=True) -> int:
+        """
+        Insert many trackings with one executemany, skipping (domain, keyword)
+        pairs that already exist or repeat within `rows`. Pass commit=False to
+        keep several chunks in one transaction. Returns the number inserted.
+        """
+        unique = {}
+        for r in rows:
+            unique.setdefault((r["domain"], r["keyword"]), r)
+        if not unique:
+            return 0
+        existing = self._session.query(models.TrackingKeyword.domain, models.TrackingKeyword.keyword)\
+            .filter(tuple_(models.TrackingKeyword.domain, models.TrackingKeyword.keyword).in_(list(unique)))\
+            .all()
+        for pair in existing:
+            unique.pop(tuple(pair), None)
+        if not unique:
+            return 0
+        now = utcnow()
+        self._session.execute(
+            insert(models.TrackingKeyword),
+            [{"domain": d, "keyword": k, "frequency": r.get("frequency") or "daily", "next_due_at": now}
+             for (d, k), r in unique.items()],
+        )
+        if commit:
+            self._session.commit()
+        return len(unique)
+
+    def commit(self):
+        self._session.commit()
+
+    def rollback(self):
+        self._session.rollback()
+
+    def close(self):
+        self._session.close()
+
     def list_tracking(self) -> List[models.TrackingKeyword]:
         return self._session.query(models.TrackingKeyword).all()
 
+    def list_due_tracking(self, now=None, limit: Optional[int]=None) -> List[models.TrackingKeyword]:
+        """Trackings whose next_due_at has passed, as one index range scan."""
+        now = now or utcnow()
+        q = self._session.query(models.TrackingKeyword)\
+            .filter(models.TrackingKeyword.next_due_at <= now)\
+            .order_by(models.TrackingKeyword.next_due_at)
+        if limit:
+            q = q.limit(limit)
+        return q.all()
+
+    def list_tracking_schedule(self):
+        """(id, next_due_at) for every tracking; used to build the scheduler heap."""
+        return self._session.query(models.TrackingKeyword.id, models.TrackingKeyword.next_due_at).all()
+
+    def get_trackings_by_ids(self, tracking_ids: List[int]) -> List[models.TrackingKeyword]:
+        if not tracking_ids:
+            return []
+        return self._session.query(models.TrackingKeyword).filter(models.TrackingKeyword.id.in_(tracking_ids)).all()
+
     def get_tracking_by_id(self, tracking_id: int) -> Optional[models.TrackingKeyword]:
         return self._session.query(models.TrackingKeyword).filter_by(id=tracking_id).first()
 
     # --- Rank history ---
-    def add_rank_history(self, tracking_id: int, position: Optional[int], serp_snapshot: Optional[str]) -> models.RankHistory:
-        rh = models.RankHistory(tracking_id=tracking_id, position=position, serp_snapshot=serp_snapshot)
+    def add_rank_history(self, tracking_id: int, position: Optional[int], serp_snapshot: Optional[str]=None,
+                         items: Optional[List[dict]]=None, fingerprint: Optional[str]=None,
+                         event: Optional[dict]=None) -> models.RankHistory:
+        """
+        Pass SERP `items` to store them deduplicated; `serp_snapshot` is for error
+        payloads. `event` ({kind, old_position, new_position}) is stored in rank_events.
+        """
+        checked_at = utcnow()
+        refs = intern_items(self._session, [items[:SNAPSHOT_ITEMS]])[0] if items is not None else None
+        rh = models.RankHistory(tracking_id=tracking_id, position=position, serp_snapshot=serp_snapshot,
+                                snapshot_refs=refs, checked_at=checked_at)
         self._session.add(rh)
+        # Keep the denormalized due time in step with the history, same transaction
+        tk = self.get_tracking_by_id(tracking_id)
+        if tk:
+            tk.next_due_at = schedule_after_check(tk, checked_at)
+            tk.last_checked_at = checked_at
+            # A failed check says nothing about the position
+            if serp_snapshot is None:
+                tk.last_position = position
+                tk.serp_fingerprint = fingerprint
+            if event:
+                self._session.add(models.RankEvent(tracking_id=tracking_id, checked_at=checked_at, **event))
         self._session.commit()
         self._session.refresh(rh)
         return rh
 
-    def get_rank_history_for(self, tracking_id: int, limit: int=100):
-        return self._session.query(models.RankHistory).filter_by(tracking_id=tracking_id).order_by(models.RankHistory.checked_at.desc()).limit(limit).all()
+    def bulk_add_rank_history(self, rows: List[dict], commit: bool=True) -> int:
+        """
+        Insert many history rows and advance their trackings' schedule in one
+        transaction, without refreshing anything. Each row needs tracking_id,
+        position, serp_snapshot, checked_at and next_due_at, plus optional SERP
+        `items`, `fingerprint` and `event` (see add_rank_history). Rows of
+        trackings that no longer exist are skipped; returns rows written.
+        Pass commit=False to make it part of a larger transaction.
+        """
+        if not rows:
+            return 0
+        # A tracking deleted while its rows were buffered: drop them rather than orphan them (or break the FK)
+        existing = {tid for (tid,) in self._session.query(models.TrackingKeyword.id)
+                    .filter(models.TrackingKeyword.id.in_({r["tracking_id"] for r in rows}))}
+        rows = [r for r in rows if r["tracking_id"] in existing]
+        if not rows:
+            return 0
+        # Row index -> packed refs, for the rows that carry SERP items
+        with_items = [i for i, r in enumerate(rows) if r.get("items") is not None]
+        refs = dict(zip(with_items, intern_items(self._session, [rows[i]["items"][:SNAPSHOT_ITEMS] for i in with_items])))
+        self._session.execute(insert(models.RankHistory), [
+            {"tracking_id": r["tracking_id"], "position": r["position"],
+             "serp_snapshot": r["serp_snapshot"], "snapshot_refs": refs.get(i), "checked_at": r["checked_at"]}
+            for i, r in enumerate(rows)
+        ])
+        # Last row per tracking wins if one was checked twice in a batch
+        schedule = {r["tracking_id"]: r for r in rows}
+        # Failed checks (error snapshot) only move the schedule
+        failed = [{"id": tid, "last_checked_at": r["checked_at"], "next_due_at": r["next_due_at"]}
+                  for tid, r in schedule.items() if r["serp_snapshot"] is not None]
+        checked = [{"id": tid, "last_checked_at": r["checked_at"], "next_due_at": r["next_due_at"],
+                    "last_position": r["position"], "serp_fingerprint": r.get("fingerprint")}
+                   for tid, r in schedule.items() if r["serp_snapshot"] is None]
+        for updates in (failed, checked):
+            if updates:
+                self._session.execute(update(models.TrackingKeyword), updates)
+        events = [{"tracking_id": r["tracking_id"], "checked_at": r["checked_at"], **r["event"]}
+                  for r in rows if r.get("event")]
+        if events:
+            self._session.execute(insert(models.RankEvent), events)
+        if commit:
+            self._session.commit()
+        return len(rows)
+
+    def get_rank_history_for(self, tracking_id: int, limit: int=100, start=None, end=None):
+        q = self._session.query(models.RankHistory).filter_by(tracking_id=tracking_id)
+        if start is not None:
+            q = q.filter(models.RankHistory.checked_at >= start)
+        if end is not None:
+            q = q.filter(models.RankHistory.checked_at <= end)
+        return q.order_by(models.RankHistory.checked_at.desc()).limit(limit).all()
+
+    def get_snapshots(self, histories) -> dict:
+        """history id -> snapshot JSON string, resolving interned results in one query."""
+        results = load_results(self._session, (h.snapshot_refs for h in histories))
+        return {h.id: snapshot_json(h.snapshot_refs, h.serp_snapshot, results) for h in histories}
 
     def delete_tracking(self, tracking_id: int) -> bool:
         tk = self.get_tracking_by_id(tracking_id)
         if tk:
+            # Delete history in SQL rather than loading it for the ORM cascade
+            for model in (models.RankHistory, *ROLLUP_MODELS.values(), models.RankCheckJob, models.RankEvent):
+                self._session.execute(delete(model).where(model.tracking_id == tracking_id),
+                                      execution_options={"synchronize_session": False})
             self._session.delete(tk)
             self._session.commit()
             return True
@@ -57,50 +276,242 @@ class Repository:
     def update_tracking(self, tracking_id: int, domain: str, keyword: str, frequency: str) -> Optional[models.TrackingKeyword]:
         tk = self.get_tracking_by_id(tracking_id)
         if tk:
+            if (tk.domain, tk.keyword) != (domain, keyword):
+                # Another site or SERP: the cached state no longer applies, and the next
+                # check only sets the baseline (no event is detected without last_checked_at)
+                tk.last_position = tk.serp_fingerprint = tk.last_checked_at = None
             tk.domain = domain
             tk.keyword = keyword
+            if tk.frequency != frequency:
+                tk.next_due_at = compute_next_due(tk.last_checked_at, frequency, tk.id)
             tk.frequency = frequency
             self._session.commit()
             self._session.refresh(tk)
             return tk
         return None
 
-    def delete_old_history(self, days: int = 7) -> int:
-        from datetime import datetime, timedelta
-        cutoff_date = datetime.now() - timedelta(days=days)
-        deleted_count = self._session.query(models.RankHistory).filter(models.RankHistory.checked_at < cutoff_date).delete()
-        self._session.commit()
-        return deleted_count
-
-    # --- Recent Queries ---
-    def add_recent_query(self, query: str, location: str="Global", results_count: str="0"):
-        # Auto cleanup: ensure we only keep the latest 5 (actually 4 before adding new one, or 5 after)
-        # Strategy: Add new one, then keep top 5
-        rq = models.RecentQuery(query=query, location=location, results_count=results_count)
-        self._session.add(rq)
-        self._session.commit()
-        self._session.refresh(rq)
-        
-        # Cleanup older than 5
-        self.cleanup_recent_queries()
-        
-        return rq
-
-    def get_recent_queries(self, limit: int=5):
-        return self._session.query(models.RecentQuery).order_by(models.RecentQuery.created_at.desc()).limit(limit).all()
-
-    def cleanup_recent_queries(self, keep_limit: int=5):
-        # Find the ID of the 5th most recent item
-        subquery = self._session.query(models.RecentQuery.id)\
-            .order_by(models.RecentQuery.created_at.desc())\
-            .limit(keep_limit).all()
-        
-        if len(subquery) < keep_limit:
+    # --- Rank check queue ---
+    def list_due_unqueued(self, now=None, limit: int=5000) -> List[models.TrackingKeyword]:
+        """Due trackings that have no queued job yet, oldest due first."""
+        now = now or utcnow()
+        tk, job = models.TrackingKeyword, models.RankCheckJob
+        return self._session.query(tk)\
+            .filter(tk.next_due_at <= now, ~exists().where(job.tracking_id == tk.id))\
+            .order_by(tk.next_due_at).limit(limit).all()
+
+    def enqueue_checks(self, trackings: List[models.TrackingKeyword], now=None) -> int:
+        """Queue a job per tracking (already queued ones are skipped). Returns how many were passed."""
+        now = now or utcnow()
+        insert_ignore(self._session, models.RankCheckJob.__table__, [
+            {"tracking_id": t.id, "due_at": t.next_due_at, "enqueued_at": now, "lease_expires_at": now, "attempts": 0}
+            for t in trackings
+        ], ["tracking_id"])
+        self._session.commit()
+        return len(trackings)
+
+    def defer_trackings(self, until: dict):
+        """Move next_due_at of trackings that were due but not admitted ({tracking_id: datetime})."""
+        if until:
+            self._session.execute(update(models.TrackingKeyword),
+                                  [{"id": tid, "next_due_at": due} for tid, due in until.items()])
+            self._session.commit()
+
+    def claim_checks(self, worker: str, limit: int, lease_seconds: float, now=None) -> Tuple[str, List[tuple]]:
+        """
+        Lease up to `limit` claimable jobs (never claimed, or whose lease ran
+        out) to `worker` in one UPDATE; FOR UPDATE SKIP LOCKED on Postgres,
+        SQLite's single writer does the same job there. Returns the claim token
+        and (tracking, attempts) pairs. The trackings are detached so in-memory
+        schedule updates by the caller are not flushed.
+        """
+        now = now or utcnow()
+        job = models.RankCheckJob
+        token = uuid.uuid4().hex
+        claimable = select(job.id).where(job.lease_expires_at <= now)\
+            .order_by(job.lease_expires_at).limit(limit).with_for_update(skip_locked=True)
+        self._session.execute(
+            update(job).where(job.id.in_(claimable))
+            .values(lease_token=token, leased_by=worker, lease_expires_at=now + timedelta(seconds=lease_seconds),
+                    attempts=job.attempts + 1)
+            .execution_options(synchronize_session=False)
+        )
+        self._session.commit()
+        rows = self._session.query(models.TrackingKeyword, job.attempts)\
+            .join(job, job.tracking_id == models.TrackingKeyword.id)\
+            .filter(job.lease_token == token).all()
+        self._session.expunge_all()
+        return token, [tuple(r) for r in rows]
+
+    def complete_checks(self, token: str, rows: List[dict]) -> int:
+        """
+        Delete the jobs of claim `token` and record their results (rows as for
+        bulk_add_rank_history) in one transaction. Jobs whose lease expired and
+        went to another worker are no longer ours, so their results are
+        dropped: each queued check is recorded once. Returns rows recorded.
+        """
+        job = models.RankCheckJob
+        owned = set(self._session.execute(
+            delete(job).where(job.lease_token == token).returning(job.tracking_id)
+        ).scalars())
+        n = self.bulk_add_rank_history([r for r in rows if r["tracking_id"] in owned], commit=False)
+        self._session.commit()
+        return n
+
+    def queue_stats(self, now=None) -> dict:
+        now = now or utcnow()
+        job = models.RankCheckJob
+        queued, leased, oldest = self._session.query(
+            func.count(job.id),
+            func.count(job.id).filter(job.lease_token.is_not(None), job.lease_expires_at > now),
+            func.min(job.due_at),
+        ).one()
+        return {"queued": queued, "leased": leased,
+                "oldest_due_seconds": round((now - as_utc(oldest)).total_seconds(), 1) if oldest else 0}
+
+    def acquire_lease(self, name: str, holder: str, seconds: float, now=None) -> bool:
+        """Take or renew lease `name` for `holder`; False while someone else holds a live one."""
+        now = now or utcnow()
+        expires = now + timedelta(seconds=seconds)
+        lease = models.Lease
+        insert_ignore(self._session, lease.__table__, [{"name": name, "holder": holder, "expires_at": expires}], ["name"])
+        res = self._session.execute(
+            update(lease).where(lease.name == name, or_(lease.holder == holder, lease.expires_at <= now))
+            .values(holder=holder, expires_at=expires)
+        )
+        self._session.commit()
+        return res.rowcount == 1
+
+    def release_lease(self, name: str, holder: str):
+        self._session.execute(delete(models.Lease).where(models.Lease.name == name, models.Lease.holder == holder))
+        self._session.commit()
+
+    # --- Provider quota ---
+    def add_provider_usage(self, provider: str, buckets: List[Tuple[str, str]], calls: int):
+        """Add `calls` to each (period, bucket) counter of `provider`."""
+        insert_or_increment(self._session, models.ProviderUsage.__table__, [
+            {"provider": provider, "period": period, "bucket": bucket, "used": calls} for period, bucket in buckets
+        ], ["provider", "period", "bucket"], "used")
+        self._session.commit()
+
+    def get_provider_usage(self, provider: str, buckets: List[Tuple[str, str]]) -> dict:
+        """(period, bucket) -> calls made, for the given counters of `provider`."""
+        pu = models.ProviderUsage
+        rows = self._session.query(pu.period, pu.bucket, pu.used)\
+            .filter(pu.provider == provider, tuple_(pu.period, pu.bucket).in_(buckets)).all()
+        return {(period, bucket): used for period, bucket, used in rows}
+
+    # --- History rollups ---
+    def rollup_history(self, batch_size: int=5000) -> int:
+        """
+        Fold the next `batch_size` rank_history rows not yet rolled up into the
+        daily and weekly rollups. Buckets are merged, not rebuilt, so late rows
+        (buffered writes land out of checked_at order) are handled. Rows are
+        flagged `rolled_up` in the same transaction; a per-row flag rather than
+        an id watermark, since ids can commit out of order on Postgres.
+        Returns rows processed.
+        """
+        rh = models.RankHistory
+        rows = self._session.query(rh.id, rh.tracking_id, rh.position, rh.checked_at)\
+            .filter(rh.rolled_up == false())\
+            .order_by(rh.id).limit(batch_size).all()
+        if not rows:
+            return 0
+        checks = [(r.tracking_id, r.position, as_utc(r.checked_at)) for r in rows if r.checked_at is not None]
+        for granularity, model in ROLLUP_MODELS.items():
+            self._merge_rollups(model, granularity, checks)
+        # Only flips rows still unflagged, so two concurrent runs can't count the same rows twice
+        flagged = 0
+        for part in chunked([r.id for r in rows], 500):
+            flagged += self._session.execute(
+                update(rh).where(rh.id.in_(part), rh.rolled_up == false()).values(rolled_up=True),
+                execution_options={"synchronize_session": False},
+            ).rowcount
+        if flagged != len(rows):
+            self._session.rollback()
             return 0
-            
-        recent_ids = [r.id for r in subquery]
-        
-        # Delete everything NOT in the recent_ids list
-        deleted = self._session.query(models.RecentQuery).filter(models.RecentQuery.id.notin_(recent_ids)).delete(synchronize_session=False)
         self._session.commit()
+        return len(rows)
+
+    def _merge_rollups(self, model, granularity: str, checks):
+        """Merge (tracking_id, position, checked_at UTC) tuples into `model`'s buckets."""
+        # Aggregate the batch per bucket first, then touch each ORM row once
+        agg = {}
+        starts = {}  # date -> bucket start, computed once per day seen
+        for tracking_id, position, checked_at in checks:
+            day = checked_at.date()
+            start = starts.get(day)
+            if start is None:
+                start = starts[day] = bucket_start(checked_at, granularity)
+            key = (tracking_id, start)
+            a = agg.get(key)
+            if a is None:
+                a = agg[key] = {"checks": 0, "found": 0, "min": None, "max": None, "sum": 0, "last_at": None, "last": None}
+            a["checks"] += 1
+            if position is not None:
+                a["found"] += 1
+                a["sum"] += position
+                a["min"] = position if a["min"] is None else min(a["min"], position)
+                a["max"] = position if a["max"] is None else max(a["max"], position)
+            if a["last_at"] is None or checked_at >= a["last_at"]:
+                a["last_at"], a["last"] = checked_at, position
+
+        existing = {}
+        for part in chunked(list(agg), 500):
+            for b in self._session.query(model).filter(tuple_(model.tracking_id, model.bucket_start).in_(part)):
+                existing[(b.tracking_id, as_utc(b.bucket_start))] = b
+        for key, a in agg.items():
+            b = existing.get(key)
+            if b is None:
+                self._session.add(model(
+                    tracking_id=key[0], bucket_start=key[1], checks=a["checks"], found=a["found"],
+                    min_position=a["min"], max_position=a["max"], sum_position=a["sum"],
+                    last_position=a["last"], last_checked_at=a["last_at"],
+                ))
+                continue
+            b.checks += a["checks"]
+            b.found += a["found"]
+            b.sum_position += a["sum"]
+            if a["min"] is not None:
+                b.min_position = a["min"] if b.min_position is None else min(b.min_position, a["min"])
+                b.max_position = a["max"] if b.max_position is None else max(b.max_position, a["max"])
+            if b.last_checked_at is None or a["last_at"] >= as_utc(b.last_checked_at):
+                b.last_checked_at, b.last_position = a["last_at"], a["last"]
+
+    def get_rollups(self, tracking_id: int, granularity: str, start=None, end=None, limit: int=1000):
+        model = ROLLUP_MODELS[granularity]
+        q = self._session.query(model).filter(model.tracking_id == tracking_id)
+        if start is not None:
+            q = q.filter(model.bucket_start >= bucket_start(start, granularity))
+        if end is not None:
+            q = q.filter(model.bucket_start <= end)
+        return q.order_by(model.bucket_start.desc()).limit(limit).all()
+
+    def delete_rank_events(self, before) -> int:
+        """Drop change events older than `before`."""
+        result = self._session.execute(delete(models.RankEvent).where(models.RankEvent.checked_at < before))
+        self._session.commit()
+        return result.rowcount
+
+    def delete_rolled_up_history(self, before, chunk_size: int=1000, max_seconds: float=30.0, pause: float=0.05) -> int:
+        """
+        Delete raw history older than `before`, but only rows the rollups already
+        cover. Works in small id-ordered chunks, committing after each so the
+        write lock is only held briefly, and stops after `max_seconds` (the next
+        run picks up the rest).
+        """
+        rh = models.RankHistory
+        deadline = time.monotonic() + max_seconds
+        deleted = 0
+        while True:
+            ids = [i for (i,) in self._session.query(rh.id)
+                   .filter(rh.rolled_up == true(), rh.checked_at < before)
+                   .order_by(rh.id).limit(chunk_size)]
+            if not ids:
+                break
+            self._session.execute(delete(rh).where(rh.id.in_(ids)), execution_options={"synchronize_session": False})
+            self._session.commit()
+            deleted += len(ids)
+            if time.monotonic() >= deadline:
+                break
+            time.sleep(pause)
         return deleted
@@ -0,0 +1,40 @@
+"""
+Wakes /rank/events long-poll and SSE readers when this process records rank
+events, so they answer right away instead of on their next poll. Events
+written by other processes (worker.py in queue mode) are picked up by the
+readers' periodic DB poll every POLL_SECONDS.
+"""
+import asyncio
+import os
+import threading
+
+POLL_SECONDS = float(os.getenv("RANK_EVENTS_POLL_SECONDS", "2"))
+
+_lock = threading.Lock()
+_waiters = set()  # (event loop, asyncio.Event) per waiting reader
+
+
+def notify():
+    """Called from any thread after new events are committed."""
+    with _lock:
+        waiters = list(_waiters)
+    for loop, event in waiters:
+        try:
+            loop.call_soon_threadsafe(event.set)
+        except RuntimeError:
+            pass  # loop already closed
+
+
+async def wait(timeout: float) -> bool:
+    """Until notify() or `timeout` seconds; True if notified."""
+    entry = (asyncio.get_running_loop(), asyncio.Event())
+    with _lock:
+        _waiters.add(entry)
+    try:
+        await asyncio.wait_for(entry[1].wait(), timeout)
+        return True
+    except asyncio.TimeoutError:
+        return False
+    finally:
+        with _lock:
+            _waiters.discard(entry)
@@ -0,0 +1,143 @@
+import atexit
+import logging
+import os
+import threading
+import time
+from typing import List, Optional
+
+from app.infrastructure import event_feed, metrics
+from app.infrastructure.database_repository import Repository
+
+logger = logging.getLogger(__name__)
+
+FLUSH_ROWS = int(os.getenv("HISTORY_FLUSH_ROWS", "500"))
+FLUSH_SECONDS = float(os.getenv("HISTORY_FLUSH_SECONDS", "2"))
+# Failed flushes a row is retried in before it is logged and dropped
+MAX_ATTEMPTS = int(os.getenv("HISTORY_FLUSH_ATTEMPTS", "5"))
+
+
+class HistoryWriter:
+    """
+    Buffers RankHistory rows from tracking runs and writes them in bulk:
+    one transaction (one fsync on SQLite) per flush instead of per check.
+    Flushes when `max_rows` are buffered or `max_interval` seconds after the
+    oldest buffered row, and on close()/interpreter exit. A failed flush is
+    retried with the next one; rows still failing after `max_attempts` flushes
+    are logged and dropped so they can't hold up everything buffered after them.
+    """
+
+    def __init__(self, repo_factory=Repository, max_rows: int = FLUSH_ROWS, max_interval: float = FLUSH_SECONDS,
+                 max_attempts: int = MAX_ATTEMPTS):
+        self._repo_factory = repo_factory
+        self.max_rows = max_rows
+        self.max_interval = max_interval
+        self.max_attempts = max_attempts
+        self._rows: List[dict] = []
+        self._oldest: Optional[float] = None
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._closed = False
+        self.rows_written = 0
+        self.rows_dropped = 0
+        self.flushes = 0
+        self._thread = threading.Thread(target=self._run, name="history-writer", daemon=True)
+        self._thread.start()
+
+    def add(self, tracking_id: int, position: Optional[int], serp_snapshot: Optional[str], checked_at, next_due_at,
+            items: Optional[List[dict]] = None, fingerprint: Optional[str] = None, event: Optional[dict] = None):
+        with self._cond:
+            self._rows.append({
+                "tracking_id": tracking_id,
+                "position": position,
+                "serp_snapshot": serp_snapshot,
+                "items": items,
+                "checked_at": checked_at,
+                "next_due_at": next_due_at,
+                "fingerprint": fingerprint,
+                "event": event,
+                "attempts": 0,
+            })
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            full = len(self._rows) >= self.max_rows
+            self._cond.notify()
+        if full:
+            self.flush()
+
+    def flush(self) -> int:
+        with self._flush_lock:
+            with self._cond:
+                rows, self._rows = self._rows, []
+                self._oldest = None
+            if not rows:
+                return 0
+            try:
+                with metrics.history_write_seconds.time(path="bulk"), self._repo_factory() as repo:
+                    written = repo.bulk_add_rank_history(rows)
+            except Exception as e:
+                logger.exception("History flush of %d rows failed: %s", len(rows), e)
+                for r in rows:
+                    r["attempts"] += 1
+                retry = [r for r in rows if r["attempts"] < self.max_attempts]
+                dropped = len(rows) - len(retry)
+                if dropped:
+                    self.rows_dropped += dropped
+                    logger.error("Dropping %d history rows after %d failed flushes (trackings %s)", dropped,
+                                 self.max_attempts, sorted({r["tracking_id"] for r in rows if r["attempts"] >= self.max_attempts}))
+                # Put the rest back in front so the next flush retries them
+                with self._cond:
+                    self._rows = retry + self._rows
+                    if self._oldest is None and self._rows:
+                        self._oldest = time.monotonic()
+                return 0
+            metrics.history_rows_written.inc(written, path="bulk")
+            if any(r["event"] for r in rows):
+                event_feed.notify()
+            self.rows_written += written
+            self.flushes += 1
+            return written
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._closed and self._oldest is None:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                wait = self._oldest + self.max_interval - time.monotonic()
+                if wait > 0:
+                    self._cond.wait(timeout=wait)
+                    continue
+            self.flush()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+_writer: Optional[HistoryWriter] = None
+_writer_lock = threading.Lock()
+
+
+def get_history_writer() -> HistoryWriter:
+    """Process-wide writer, flushed automatically at interpreter exit."""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = HistoryWriter()
+            atexit.register(_writer.close)
+        return _writer
+
+
+def flush_history_writer():
+    if _writer:
+        _writer.flush()
@@ -0,0 +1,210 @@
+"""
+Shared outbound HTTP layer for the scrapers.
+
+One pooled `requests.Session` (keep-alive, so repeat calls to the same host
+skip the TCP+TLS handshake), retries with exponential backoff and jitter on
+429/5xx, and a per-host concurrency cap. `AsyncHttpClient` is the httpx
+equivalent for async callers (e.g. POST /rank/compare), one per event loop.
+"""
+import asyncio
+import os
+import random
+import threading
+import time
+import weakref
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "20"))
+PER_HOST_CONCURRENCY = int(os.getenv("HTTP_PER_HOST_CONCURRENCY", "8"))
+MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "3"))
+BACKOFF_BASE = float(os.getenv("HTTP_BACKOFF_BASE", "0.5"))
+BACKOFF_MAX = float(os.getenv("HTTP_BACKOFF_MAX", "10"))
+DEFAULT_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "10"))
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+def backoff_delay(attempt: int, retry_after: Optional[str] = None) -> float:
+    """Full-jitter exponential backoff; honours a numeric Retry-After header."""
+    if retry_after:
+        try:
+            return min(BACKOFF_MAX, float(retry_after))
+        except ValueError:
+            pass
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+
+
+class HttpStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+        self.new_connections = 0
+        self.new_conn_seconds = 0.0
+        self.reused_seconds = 0.0
+
+    def record(self, seconds: float, new_connection: bool):
+        with self._lock:
+            self.requests += 1
+            if new_connection:
+                self.new_connections += 1
+                self.new_conn_seconds += seconds
+            else:
+                self.reused_seconds += seconds
+
+    def incr(self, field: str):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            reused = self.requests - self.new_connections
+            return {
+                "requests": self.requests,
+                "retries": self.retries,
+                "failures": self.failures,
+                "new_connections": self.new_connections,
+                "reused_connections": reused,
+                # The gap between these two is roughly the handshake cost saved per reused call
+                "avg_ms_new_connection": round(self.new_conn_seconds / self.new_connections * 1000, 1) if self.new_connections else None,
+                "avg_ms_reused_connection": round(self.reused_seconds / reused * 1000, 1) if reused else None,
+            }
+
+
+class HttpClient:
+    def __init__(self, pool_size: int = POOL_SIZE, per_host: int = PER_HOST_CONCURRENCY,
+                 max_retries: int = MAX_RETRIES):
+        # Imported here so processes that never scrape don't pay for requests at startup
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self._requests = requests
+        self.max_retries = max_retries
+        self.per_host = per_host
+        self.session = requests.Session()
+        self._adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", self._adapter)
+        self.session.mount("http://", self._adapter)
+        self._host_slots: Dict[str, threading.BoundedSemaphore] = {}
+        self._slots_lock = threading.Lock()
+        self.stats = HttpStats()
+
+    def _slot(self, host: str) -> threading.BoundedSemaphore:
+        with self._slots_lock:
+            sem = self._host_slots.get(host)
+            if sem is None:
+                sem = threading.BoundedSemaphore(self.per_host)
+                self._host_slots[host] = sem
+            return sem
+
+    def _pool_connections(self) -> int:
+        # Connections opened so far across all host pools. Comparing before/after
+        # a request tells whether it paid for a new TCP+TLS handshake (approximate
+        # under concurrency, which is fine for stats).
+        pools = self._adapter.poolmanager.pools
+        total = 0
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is not None:
+                total += pool.num_connections
+        return total
+
+    def get(self, url: str, params=None, headers=None, timeout: Optional[float] = None,
+            retry_statuses=RETRY_STATUSES) -> "requests.Response":
+        """GET with retries. Returns the last response (callers check status_code); raises if every attempt errored."""
+        host = urlsplit(url).netloc
+        attempt = 0
+        while True:
+            with self._slot(host):
+                before = self._pool_connections()
+                start = time.perf_counter()
+                try:
+                    resp = self.session.get(url, params=params, headers=headers, timeout=timeout or DEFAULT_TIMEOUT)
+                except self._requests.RequestException:
+                    if attempt >= self.max_retries:
+                        self.stats.incr("failures")
+                        raise
+                    resp = None
+                else:
+                    self.stats.record(time.perf_counter() - start, self._pool_connections() > before)
+            if resp is not None and (resp.status_code not in retry_statuses or attempt >= self.max_retries):
+                return resp
+            self.stats.incr("retries")
+            time.sleep(backoff_delay(attempt, resp.headers.get("Retry-After") if resp is not None else None))
+            attempt += 1
+
+
+class AsyncHttpClient:
+    """httpx-based twin of HttpClient for use from asyncio code."""
+
+    def __init__(self, pool_size: int = POOL_SIZE, per_host: int = PER_HOST_CONCURRENCY,
+                 max_retries: int = MAX_RETRIES):
+        import httpx  # optional dependency, only needed by async callers
+
+        self._httpx = httpx
+        self.max_retries = max_retries
+        self.per_host = per_host
+        self.client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+            timeout=DEFAULT_TIMEOUT,
+        )
+        self._host_slots: Dict[str, asyncio.Semaphore] = {}
+        self.stats = HttpStats()
+
+    def _slot(self, host: str) -> asyncio.Semaphore:
+        sem = self._host_slots.get(host)
+        if sem is None:
+            sem = asyncio.Semaphore(self.per_host)
+            self._host_slots[host] = sem
+        return sem
+
+    async def get(self, url: str, params=None, headers=None, timeout: Optional[float] = None,
+                  retry_statuses=RETRY_STATUSES):
+        host = urlsplit(url).netloc
+        attempt = 0
+        while True:
+            async with self._slot(host):
+                start = time.perf_counter()
+                try:
+                    resp = await self.client.get(url, params=params, headers=headers, timeout=timeout or DEFAULT_TIMEOUT)
+                except self._httpx.HTTPError:
+                    if attempt >= self.max_retries:
+                        self.stats.incr("failures")
+                        raise
+                    resp = None
+                else:
+                    # httpx doesn't expose per-request connection reuse; count them all as pooled
+                    self.stats.record(time.perf_counter() - start, False)
+            if resp is not None and (resp.status_code not in retry_statuses or attempt >= self.max_retries):
+                return resp
+            self.stats.incr("retries")
+            await asyncio.sleep(backoff_delay(attempt, resp.headers.get("Retry-After") if resp is not None else None))
+            attempt += 1
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+_client: Optional[HttpClient] = None
+# httpx pools and asyncio semaphores belong to the loop that made them
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncHttpClient]" = weakref.WeakKeyDictionary()
+_client_lock = threading.Lock()
+
+
+def get_http_client() -> HttpClient:
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = HttpClient()
+        return _client
+
+
+def get_async_http_client() -> AsyncHttpClient:
+    """The client of the running event loop."""
+    loop = asyncio.get_running_loop()
+    with _client_lock:
+        client = _async_clients.get(loop)
+        if client is None:
+            client = _async_clients[loop] = AsyncHttpClient()
+        return client
@@ -0,0 +1,105 @@
+"""
+Opt-in sampling profiler for a single tracking run (POST /rank/track/{id}/profile,
+enabled with ENABLE_PROFILER=1).
+
+A background thread snapshots the stacks of the profiled threads every
+`interval` seconds through sys._current_frames(). That costs nothing between
+samples, unlike cProfile's per-call hooks, and it also catches time spent
+waiting on sockets, locks and the DB. Results come back as per-function
+self/total sample counts plus folded stacks ("a;b;c 12" lines, the input
+format of flamegraph.pl and speedscope).
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+
+PROFILER_ENABLED = os.getenv("ENABLE_PROFILER", "").lower() in ("1", "true", "yes")
+# Rank check pool threads are sampled along with the thread that started the profile
+THREAD_PREFIXES = ("rank-check", "history-writer")
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}"
+
+
+class SamplingProfiler:
+    def __init__(self, interval: float = 0.005, thread_prefixes=THREAD_PREFIXES, max_depth: int = 60):
+        self.interval = interval
+        self.thread_prefixes = tuple(thread_prefixes)
+        self.max_depth = max_depth
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.duration = 0.0
+        self._targets = set()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _target_idents(self) -> set:
+        idents = set(self._targets)
+        for t in threading.enumerate():
+            if t.name.startswith(self.thread_prefixes):
+                idents.add(t.ident)
+        return idents
+
+    def _sample(self):
+        frames = sys._current_frames()
+        for ident in self._target_idents():
+            frame = frames.get(ident)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None and len(stack) < self.max_depth:
+                stack.append(_frame_name(frame))
+                frame = frame.f_back
+            self.stacks[";".join(reversed(stack))] += 1
+        self.samples += 1
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self):
+        self._targets.add(threading.get_ident())
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        self.duration = time.perf_counter() - self._started
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+    def top(self, limit: int = 30) -> List[Dict]:
+        """Functions by samples on top of the stack (self) and anywhere in it (total)."""
+        own, total = Counter(), Counter()
+        for stack, n in self.stacks.items():
+            frames = [f.rsplit(":", 1)[0] for f in stack.split(";")]
+            own[frames[-1]] += n
+            for f in set(frames):
+                total[f] += n
+        return [{"function": f, "self": own[f], "total": n} for f, n in total.most_common(limit)]
+
+    def folded(self) -> str:
+        return "\n".join(f"{stack} {n}" for stack, n in self.stacks.most_common())
+
+    def report(self, limit: int = 30) -> Dict:
+        return {
+            "interval_ms": self.interval * 1000,
+            "duration_seconds": round(self.duration, 4),
+            "samples": self.samples,
+            "top": self.top(limit),
+            "folded": self.folded(),
+        }
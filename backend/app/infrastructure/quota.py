@@ -0,0 +1,225 @@
+"""
+Per-provider call budgets on top of the rate limiter.
+
+Each provider has a token bucket for calls/second (rate_limiter.py) plus
+optional daily and monthly quotas, e.g. SERPAPI_DAILY_QUOTA=300 and
+SERPAPI_MONTHLY_QUOTA=5000. Calls are counted in `provider_usage`, shared by
+every process, with writes batched every few calls/seconds. The monthly quota
+is paced evenly over the days left in the month, so an early burst cannot
+spend next week's budget. The scheduler asks `available()` how many calls it
+may still make today and admits the most important due checks first; a slice
+of the day's budget (`reserve()`) is held back for priority trackings and
+first checks.
+"""
+import asyncio
+import atexit
+import calendar
+import logging
+import math
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from app.core.rank import utcnow
+from app.infrastructure import metrics
+from app.infrastructure.database_repository import Repository
+from app.infrastructure.rate_limiter import get_rate_limiter
+
+logger = logging.getLogger(__name__)
+
+PROVIDERS = ("serpapi", "google")
+# Fraction of today's budget only priority > 0 trackings and first checks may use
+RESERVE_FRACTION = float(os.getenv("QUOTA_RESERVE_FRACTION", "0.1"))
+# Counters are written after this many calls or seconds, and re-read this often
+FLUSH_CALLS = int(os.getenv("QUOTA_FLUSH_CALLS", "20"))
+FLUSH_SECONDS = float(os.getenv("QUOTA_FLUSH_SECONDS", "5"))
+REFRESH_SECONDS = float(os.getenv("QUOTA_REFRESH_SECONDS", "5"))
+# Pause after a provider answers 429 without saying the quota is spent
+BACKOFF_SECONDS = float(os.getenv("QUOTA_BACKOFF_SECONDS", "300"))
+
+
+def _env_limit(name: str) -> Optional[int]:
+    value = os.getenv(name)
+    return int(value) if value else None
+
+
+def _buckets(now: datetime):
+    return {"day": now.strftime("%Y-%m-%d"), "month": now.strftime("%Y-%m")}
+
+
+def _next_day(now: datetime) -> datetime:
+    return now.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+
+
+def _next_month(now: datetime) -> datetime:
+    return _next_day(now.replace(day=calendar.monthrange(now.year, now.month)[1]))
+
+
+class ProviderQuota:
+    def __init__(self, provider: str, daily: Optional[int] = None, monthly: Optional[int] = None,
+                 repo_factory=Repository):
+        self.provider = provider
+        self.daily = daily
+        self.monthly = monthly
+        self.limiter = get_rate_limiter(provider)
+        self._repo_factory = repo_factory
+        self._lock = threading.Lock()
+        self._used: Dict[str, int] = {"day": 0, "month": 0}
+        self._buckets = _buckets(utcnow())
+        self._loaded_at = float("-inf")
+        self._pending = 0
+        self._pending_since: Optional[float] = None
+        self._exhausted_until: Optional[datetime] = None
+        self._backoff_until = float("-inf")
+
+    def _refresh(self, now: datetime):
+        # Caller holds the lock. Re-reads the shared counters, plus our unflushed calls.
+        buckets = _buckets(now)
+        if buckets != self._buckets:
+            self._flush_locked()
+            self._buckets = buckets
+            self._loaded_at = float("-inf")
+        if time.monotonic() - self._loaded_at < REFRESH_SECONDS:
+            return
+        with self._repo_factory() as repo:
+            used = repo.get_provider_usage(self.provider, list(buckets.items()))
+        self._used = {period: used.get((period, bucket), 0) + self._pending for period, bucket in buckets.items()}
+        self._loaded_at = time.monotonic()
+
+    def _flush_locked(self):
+        if not self._pending:
+            return
+        calls, self._pending, self._pending_since = self._pending, 0, None
+        try:
+            with self._repo_factory() as repo:
+                repo.add_provider_usage(self.provider, list(self._buckets.items()), calls)
+        except Exception as e:
+            logger.exception("Could not save %s usage: %s", self.provider, e)
+            self._pending += calls
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def record(self, calls: int = 1):
+        """Count calls that reached the provider."""
+        metrics.provider_calls.inc(calls, provider=self.provider)
+        with self._lock:
+            self._refresh(utcnow())
+            self._pending += calls
+            for period in self._used:
+                self._used[period] += calls
+            if self._pending_since is None:
+                self._pending_since = time.monotonic()
+            if self._pending >= FLUSH_CALLS or time.monotonic() - self._pending_since >= FLUSH_SECONDS:
+                self._flush_locked()
+
+    def mark_exhausted(self, now: Optional[datetime] = None):
+        """The provider said the quota is spent: stop calling it until the day rolls over."""
+        now = now or utcnow()
+        metrics.quota_exhausted.inc(provider=self.provider)
+        with self._lock:
+            self._exhausted_until = _next_day(now)
+        logger.warning("%s quota exhausted until %s", self.provider, self._exhausted_until.isoformat())
+
+    def back_off(self, seconds: Optional[float] = None):
+        """The provider is throttling us: make no calls for a while, without giving up on the day."""
+        seconds = BACKOFF_SECONDS if seconds is None else seconds
+        with self._lock:
+            self._backoff_until = max(self._backoff_until, time.monotonic() + seconds)
+        logger.warning("%s is rate limiting; backing off for %.0fs", self.provider, seconds)
+
+    def backing_off(self) -> bool:
+        return time.monotonic() < self._backoff_until
+
+    def available(self, now: Optional[datetime] = None) -> Optional[int]:
+        """Calls that may still be made today; None when no quota is configured."""
+        now = now or utcnow()
+        with self._lock:
+            if self._exhausted_until and now < self._exhausted_until:
+                return 0
+            if self.daily is None and self.monthly is None:
+                return None
+            self._refresh(now)
+            limits = []
+            if self.daily is not None:
+                limits.append(self.daily - self._used["day"])
+            if self.monthly is not None:
+                # Whatever is left of the month, spread evenly over the days that remain (today included)
+                days_left = calendar.monthrange(now.year, now.month)[1] - now.day + 1
+                month_left_at_midnight = self.monthly - self._used["month"] + self._used["day"]
+                limits.append(min(self.monthly - self._used["month"],
+                                  math.floor(month_left_at_midnight / days_left) - self._used["day"]))
+            return max(0, min(limits))
+
+    def acquire(self) -> bool:
+        """False if today's budget is spent or we are backing off; otherwise waits for a rate token and returns True."""
+        if self.backing_off() or self.available() == 0:
+            return False
+        self.limiter.acquire()
+        return True
+
+    async def aacquire(self) -> bool:
+        """acquire() for asyncio code; the usage refresh may hit the DB, so it runs in a thread."""
+        if self.backing_off() or await asyncio.to_thread(self.available) == 0:
+            return False
+        await self.limiter.aacquire()
+        return True
+
+    def reserve(self) -> int:
+        """Calls per day held back for urgent checks."""
+        if self.daily is not None:
+            return int(self.daily * RESERVE_FRACTION)
+        if self.monthly is not None:
+            return int(self.monthly / 30 * RESERVE_FRACTION)
+        return 0
+
+    def next_reset(self, now: Optional[datetime] = None) -> datetime:
+        """When deferred checks should be retried: next month if the monthly quota is gone, else tomorrow."""
+        now = now or utcnow()
+        with self._lock:
+            self._refresh(now)
+            if self.monthly is not None and self._used["month"] >= self.monthly:
+                return _next_month(now)
+        return _next_day(now)
+
+    def stats(self) -> dict:
+        now = utcnow()
+        available = self.available(now)
+        with self._lock:
+            self._refresh(now)
+            return {
+                "provider": self.provider,
+                "rate_per_sec": self.limiter.rate,
+                "daily_quota": self.daily,
+                "monthly_quota": self.monthly,
+                "used_today": self._used["day"],
+                "used_this_month": self._used["month"],
+                "available_today": available,
+                "reserve": self.reserve() if available is not None else None,
+                "exhausted_until": self._exhausted_until if self._exhausted_until and now < self._exhausted_until else None,
+            }
+
+
+_quotas: Dict[str, ProviderQuota] = {}
+_quotas_lock = threading.Lock()
+
+
+def get_quota(provider: str) -> ProviderQuota:
+    with _quotas_lock:
+        quota = _quotas.get(provider)
+        if quota is None:
+            quota = ProviderQuota(provider, _env_limit(f"{provider.upper()}_DAILY_QUOTA"),
+                                  _env_limit(f"{provider.upper()}_MONTHLY_QUOTA"))
+            _quotas[provider] = quota
+        return quota
+
+
+def flush_quotas():
+    for quota in list(_quotas.values()):
+        quota.flush()
+
+
+atexit.register(flush_quotas)
@@ -0,0 +1,73 @@
+import asyncio
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+# Default requests/second per provider. Override with e.g. SERPAPI_RATE_PER_SEC=5
+DEFAULT_RATES = {
+    "serpapi": 5.0,
+    "google": 0.5,
+}
+
+
+class RateLimiter:
+    """
+    Thread-safe token bucket. acquire() blocks until a token is available,
+    so N worker threads sharing one limiter never exceed `rate` calls/sec.
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.capacity = burst if burst is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _take(self, tokens: float) -> float:
+        # 0 when the tokens were taken, else how long to wait before trying again
+        with self._lock:
+            self._refill()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0.0
+            return (tokens - self._tokens) / self.rate
+
+    def acquire(self, tokens: float = 1.0):
+        if self.rate <= 0:
+            return
+        while True:
+            wait = self._take(tokens)
+            if not wait:
+                return
+            time.sleep(wait)
+
+    async def aacquire(self, tokens: float = 1.0):
+        """acquire() for asyncio code: waits without blocking the event loop."""
+        if self.rate <= 0:
+            return
+        while True:
+            wait = self._take(tokens)
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+
+_limiters: Dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(provider: str) -> RateLimiter:
+    with _limiters_lock:
+        limiter = _limiters.get(provider)
+        if limiter is None:
+            env_rate = os.getenv(f"{provider.upper()}_RATE_PER_SEC")
+            rate = float(env_rate) if env_rate else DEFAULT_RATES.get(provider, 1.0)
+            limiter = RateLimiter(rate)
+            _limiters[provider] = limiter
+        return limiter
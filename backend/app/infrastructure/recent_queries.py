@@ -0,0 +1,117 @@
+"""
+Recent searches per owner (a user/session id, "" when anonymous) behind the
+/queries endpoints, which the UI hits on every search.
+
+Each owner's last RING_SIZE queries live in an in-process ring buffer, so
+/queries/recent only reads the DB to load a ring: on first use and again
+every RELOAD_SECONDS. Its JSON body is cached until the next write or the
+next minute (the "X min ago" labels have minute resolution). Writes go
+through to `recent_query_slots` as one upsert of slot seq % RING_SIZE: the
+table holds at most RING_SIZE rows per owner and nothing is ever deleted. At
+most MAX_OWNERS rings are kept in memory, least recently used evicted first.
+
+The seq counter is per process. API processes sharing the DB only converge
+at a reload; until then, adds for the same owner from two processes can pick
+the same slot and the later write wins. That's acceptable for a "recent
+searches" list, which is a convenience rather than a log.
+"""
+import json
+import os
+import time
+from collections import OrderedDict, deque
+from typing import Dict, List
+
+from app.core.rank import as_utc, utcnow
+
+RING_SIZE = int(os.getenv("RECENT_QUERIES_SIZE", "5"))
+MAX_OWNERS = int(os.getenv("RECENT_QUERIES_MAX_OWNERS", "10000"))
+RELOAD_SECONDS = float(os.getenv("RECENT_QUERIES_RELOAD_SECONDS", "60"))
+
+
+def format_ago(dt, now=None) -> str:
+    now = now or utcnow()
+    minutes = int((now - as_utc(dt)).total_seconds() / 60)
+    if minutes < 1:
+        return "Just now"
+    if minutes < 60:
+        return f"{minutes} min ago"
+    hours = int(minutes / 60)
+    if hours < 24:
+        return f"{hours}h ago"
+    return f"{int(hours / 24)}d ago"
+
+
+class _Ring:
+    __slots__ = ("entries", "seq", "loaded_at", "body", "body_minute")
+
+    def __init__(self, entries: List[Dict], seq: int, size: int):
+        self.entries = deque(entries, maxlen=size)  # newest first
+        self.seq = seq
+        self.loaded_at = time.monotonic()
+        self.body = None
+        self.body_minute = None
+
+    def insert(self, entry: Dict):
+        # Concurrent adds can finish out of order; keep the entries sorted by id
+        entries = sorted([e for e in self.entries if e["id"] != entry["id"]] + [entry],
+                         key=lambda e: e["id"], reverse=True)[:self.entries.maxlen]
+        self.entries = deque(entries, maxlen=self.entries.maxlen)
+        self.body = None
+
+
+class RecentQueryStore:
+    def __init__(self, size: int = RING_SIZE, max_owners: int = MAX_OWNERS, reload_seconds: float = RELOAD_SECONDS):
+        self.size = size
+        self.max_owners = max_owners
+        self.reload_seconds = reload_seconds
+        self._rings: "OrderedDict[str, _Ring]" = OrderedDict()
+
+    async def _ring(self, repo, owner: str) -> _Ring:
+        ring = self._rings.get(owner)
+        if ring is None or time.monotonic() - ring.loaded_at > self.reload_seconds:
+            rows = await repo.get_recent_query_slots(owner)
+            current = self._rings.get(owner)
+            if current is not None and current is not ring:
+                ring = current  # another request (re)loaded it while we waited
+            else:
+                entries = [{"id": r.seq, "query": r.query, "location": r.location, "results": r.results_count,
+                            "created_at": r.created_at} for r in rows[:self.size]]
+                # Seqs reserved by adds still in flight may not be in the table yet
+                seq = max(rows[0].seq if rows else 0, ring.seq if ring else 0)
+                ring = _Ring(entries, seq, self.size)
+                self._rings[owner] = ring
+                while len(self._rings) > self.max_owners:
+                    self._rings.popitem(last=False)
+        self._rings.move_to_end(owner)
+        return ring
+
+    async def add(self, repo, owner: str, query: str, location: str, results_count: str) -> Dict:
+        ring = await self._ring(repo, owner)
+        # Reserved before the write's await so concurrent adds for one owner get distinct slots
+        # (anonymous clients all share owner ""). A failed write just leaves a gap in the ids.
+        ring.seq += 1
+        seq = ring.seq
+        created_at = utcnow()
+        await repo.put_recent_query_slot({
+            "owner": owner, "slot": seq % self.size, "seq": seq, "query": query,
+            "location": location, "results_count": results_count, "created_at": created_at,
+        })
+        entry = {"id": seq, "query": query, "location": location, "results": results_count, "created_at": created_at}
+        # The ring may have been reloaded while the write was in flight
+        self._rings.get(owner, ring).insert(entry)
+        return entry
+
+    async def recent_json(self, repo, owner: str) -> bytes:
+        """The /queries/recent body for `owner`, newest first."""
+        ring = await self._ring(repo, owner)
+        minute = int(time.time() // 60)
+        if ring.body is None or ring.body_minute != minute:
+            now = utcnow()
+            ring.body = json.dumps([{"id": e["id"], "query": e["query"], "location": e["location"],
+                                     "time": format_ago(e["created_at"], now), "results": e["results"]}
+                                    for e in ring.entries]).encode()
+            ring.body_minute = minute
+        return ring.body
+
+
+recent_queries = RecentQueryStore()
@@ -1,40 +1,257 @@
-from apscheduler.schedulers.background import BackgroundScheduler
 from app.services.rank_tracker_service import RankTrackerService
 from app.infrastructure.database_repository import Repository
+from app.infrastructure.history_writer import get_history_writer, flush_history_writer
+from app.infrastructure import metrics, work_queue
+from app.core.rank import as_utc
+from datetime import datetime
+from typing import Optional
+import heapq
 import logging
+import os
+import threading
+import time
 
 logger = logging.getLogger(__name__)
 
 _scheduler = None
+_tracking_scheduler = None
+# In queue mode only the process holding the producer lease runs the maintenance jobs
+_is_leader = work_queue.RANK_CHECK_MODE != "queue"
 
-def _job_run_all_tracking():
-    # logger.info("Scheduler Tick: Job started")
-    repo = Repository()
-    service = RankTrackerService(repo, None)
+# Max trackings handed to one check batch, and how often the heap is rebuilt
+# from the DB to pick up rows changed by other processes.
+BATCH_SIZE = int(os.getenv("SCHEDULER_BATCH_SIZE", "500"))
+RESYNC_SECONDS = float(os.getenv("SCHEDULER_RESYNC_SECONDS", "600"))
+# If a check did not move a row's due time forward, try it again after this delay
+RETRY_SECONDS = 60.0
+# How often new history rows are folded into the daily/weekly rollups
+ROLLUP_MINUTES = float(os.getenv("HISTORY_ROLLUP_MINUTES", "15"))
+
+
+def _to_ts(dt: Optional[datetime]) -> float:
+    return as_utc(dt).timestamp() if dt else time.time()
+
+
+class TrackingScheduler(threading.Thread):
+    """
+    Min-heap of (next_due, tracking_id). Sleeps until the earliest deadline
+    instead of scanning the table every minute. Entries are invalidated lazily:
+    `_due` holds the current deadline per tracking and stale heap entries are
+    skipped when popped.
+    """
+
+    def __init__(self, run_checks, load_schedule):
+        super().__init__(name="tracking-scheduler", daemon=True)
+        self._run_checks = run_checks
+        self._load_schedule = load_schedule
+        self._heap = []
+        self._due = {}
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._next_resync = 0.0
+        self.last_lag_seconds = 0.0
+
+    def schedule(self, tracking_id: int, due_at: Optional[datetime]):
+        self._push(tracking_id, _to_ts(due_at))
+
+    def _push(self, tracking_id: int, ts: float, only_if_absent: bool = False):
+        with self._cond:
+            if only_if_absent and tracking_id in self._due:
+                return
+            self._due[tracking_id] = ts
+            heapq.heappush(self._heap, (ts, tracking_id))
+            self._cond.notify()
+
+    def remove(self, tracking_id: int):
+        with self._cond:
+            self._due.pop(tracking_id, None)
+
+    def rebuild(self):
+        rows = self._load_schedule()
+        with self._cond:
+            self._due = {tid: _to_ts(due) for tid, due in rows}
+            self._heap = [(ts, tid) for tid, ts in self._due.items()]
+            heapq.heapify(self._heap)
+            self._cond.notify()
+        self._next_resync = time.monotonic() + RESYNC_SECONDS
+        logger.info("Tracking scheduler loaded %d trackings", len(rows))
+
+    def request_resync(self):
+        # Rebuild from the DB on the next wake-up, e.g. after a bulk import
+        with self._cond:
+            self._next_resync = 0.0
+            self._cond.notify()
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+
+    def _take_due(self):
+        """Wait until something is due, then pop up to BATCH_SIZE due ids."""
+        with self._cond:
+            while not self._stopped:
+                while self._heap and self._due.get(self._heap[0][1]) != self._heap[0][0]:
+                    heapq.heappop(self._heap)  # stale entry
+                now = time.time()
+                until_resync = self._next_resync - time.monotonic()
+                if until_resync <= 0:
+                    return []
+                if self._heap and self._heap[0][0] <= now:
+                    batch = []
+                    while self._heap and self._heap[0][0] <= now and len(batch) < BATCH_SIZE:
+                        ts, tid = heapq.heappop(self._heap)
+                        if self._due.get(tid) != ts:
+                            continue
+                        del self._due[tid]
+                        batch.append(tid)
+                        self.last_lag_seconds = now - ts
+                        metrics.scheduler_lag_seconds.observe(now - ts, source="inline")
+                    return batch
+                wait = until_resync
+                if self._heap:
+                    wait = min(wait, self._heap[0][0] - now)
+                self._cond.wait(timeout=wait)
+            return []
+
+    def run(self):
+        self.rebuild()
+        while not self._stopped:
+            batch = self._take_due()
+            if self._stopped:
+                break
+            if not batch:
+                try:
+                    self.rebuild()
+                except Exception as e:
+                    logger.exception("Error rebuilding tracking schedule: %s", e)
+                    self._next_resync = time.monotonic() + RETRY_SECONDS
+                continue
+            try:
+                with metrics.scheduler_tick_seconds.time(job="tracking"):
+                    next_due = self._run_checks(batch)
+            except Exception as e:
+                logger.exception("Error running tracking batch: %s", e)
+                next_due = None
+            now = time.time()
+            for tid in batch:
+                if next_due is None:
+                    ts = now + RETRY_SECONDS
+                elif tid in next_due:
+                    ts = _to_ts(next_due[tid])
+                    if ts <= now:
+                        ts = now + RETRY_SECONDS
+                else:
+                    continue  # deleted while the batch ran
+                # The API may have rescheduled the row while it was being checked
+                self._push(tid, ts, only_if_absent=True)
+
+
+def _run_due_checks(tracking_ids):
+    # Closing the session drops the in-memory schedule changes; the writer persists them
+    with Repository() as repo:
+        service = RankTrackerService(repo, None, history_writer=get_history_writer())
+        trackings, deferred = service.admit_checks(repo.get_trackings_by_ids(tracking_ids))
+        repo.defer_trackings(deferred)
+        service.check_many(trackings)
+        return {**{t.id: t.next_due_at for t in trackings}, **deferred}
+
+
+def _load_schedule():
+    # Persist buffered checks first so the rebuilt heap sees their new due times
+    flush_history_writer()
+    with Repository() as repo:
+        return repo.list_tracking_schedule()
+
+
+def _job_enqueue_due():
+    global _is_leader
     try:
-        service.run_all_tracking_once()
+        queued = work_queue.enqueue_due()
+        _is_leader = queued is not None
+        if queued:
+            logger.info("Queued %d due rank checks", queued)
     except Exception as e:
-        logger.exception("Error running tracking job: %s", e)
+        logger.exception("Error queueing due checks: %s", e)
+
+
+def _job_rollup_history():
+    if not _is_leader:
+        return
+    try:
+        flush_history_writer()
+        with metrics.scheduler_tick_seconds.time(job="rollup"), Repository() as repo:
+            RankTrackerService(repo, None).rollup_history()
+    except Exception as e:
+        logger.exception("Error running rollup job: %s", e)
+
 
 def _job_cleanup_history():
     # logger.info("Scheduler Tick: Cleanup started")
-    repo = Repository()
-    service = RankTrackerService(repo, None)
+    if not _is_leader:
+        return
     try:
-        service.cleanup_history(days=7)
+        with metrics.scheduler_tick_seconds.time(job="cleanup"), Repository() as repo:
+            RankTrackerService(repo, None).cleanup_history()
     except Exception as e:
         logger.exception("Error running cleanup job: %s", e)
 
+
+def notify_tracking_changed(tracking_id: int, next_due_at: Optional[datetime]):
+    """Called by the API after a tracking is created or edited."""
+    if _tracking_scheduler:
+        _tracking_scheduler.schedule(tracking_id, next_due_at)
+
+
+def notify_tracking_removed(tracking_id: int):
+    if _tracking_scheduler:
+        _tracking_scheduler.remove(tracking_id)
+
+
+def notify_trackings_bulk_added():
+    if _tracking_scheduler:
+        _tracking_scheduler.request_resync()
+
+
 def start_scheduler():
-    global _scheduler
+    global _scheduler, _tracking_scheduler
     if _scheduler:
         return
+    # Imported on start so API-only processes (APP_ROLE=api) never load APScheduler
+    from apscheduler.schedulers.background import BackgroundScheduler
+
     _scheduler = BackgroundScheduler()
-    # Run every minute to check for due tasks
-    _scheduler.add_job(_job_run_all_tracking, 'interval', minutes=1, id="rank_tracker_tick")
-    
     # Daily cleanup job (runs once every 24 hours)
     _scheduler.add_job(_job_cleanup_history, 'interval', days=1, id="rank_tracker_cleanup")
-    
+    # First run right away so an upgraded database gets its backlog aggregated
+    _scheduler.add_job(_job_rollup_history, 'interval', minutes=ROLLUP_MINUTES, id="rank_history_rollup",
+                       next_run_time=datetime.now())
+    if work_queue.RANK_CHECK_MODE == "queue":
+        # Checks run in worker.py processes; this process only feeds the queue
+        _scheduler.add_job(_job_enqueue_due, 'interval', seconds=work_queue.ENQUEUE_SECONDS, id="rank_check_enqueue",
+                           next_run_time=datetime.now(), max_instances=1, coalesce=True)
+        _scheduler.start()
+        logger.info("Rank Tracker Scheduler started (queue producer)")
+        return
     _scheduler.start()
+
+    # Rank checks are driven by per-tracking deadlines rather than a fixed tick
+    _tracking_scheduler = TrackingScheduler(_run_due_checks, _load_schedule)
+    _tracking_scheduler.start()
     logger.info("Rank Tracker Scheduler started")
+
+
+def stop_scheduler():
+    global _scheduler, _tracking_scheduler
+    if _tracking_scheduler:
+        _tracking_scheduler.stop()
+        _tracking_scheduler = None
+    if _scheduler:
+        _scheduler.shutdown(wait=False)
+        _scheduler = None
+        if work_queue.RANK_CHECK_MODE == "queue":
+            # Let another API process take over producing right away
+            try:
+                work_queue.release_producer()
+            except Exception as e:
+                logger.exception("Error releasing producer lease: %s", e)
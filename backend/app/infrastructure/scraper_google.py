@@ -1,33 +1,93 @@
-import requests
-from bs4 import BeautifulSoup
 from urllib.parse import quote_plus
 from typing import List, Optional, Dict
-import time
-import random
+import asyncio
+import logging
+import os
+from app.infrastructure.quota import get_quota
+from app.infrastructure.cache import TTLCache
+from app.infrastructure.http_client import get_http_client, get_async_http_client
+from app.infrastructure.serp_parser import parse_serp_page
+from app.core.domain_match import DomainMatcher
+from app.infrastructure import metrics
+
+logger = logging.getLogger(__name__)
+
+# Overridable so benchmarks can point the scrapers at a local stand-in (benchmarks/fake_provider.py)
+SERPAPI_URL = os.getenv("SERPAPI_URL", "https://serpapi.com/search.json")
+SUGGEST_URL = os.getenv("SUGGEST_URL", "https://suggestqueries.google.com/complete/search")
+GOOGLE_SEARCH_URL = os.getenv("GOOGLE_SEARCH_URL", "https://www.google.com/search")
 
 HEADRES = {
     "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120 Safari/537.36"
 }
 
-def _sleep():
-    time.sleep(0.8 + random.random() * 0.6)
+# SERPs don't depend on the tracked domain, so every tracking that shares a
+# keyword (and search params) shares one provider call per TTL window.
+serp_cache = TTLCache(
+    maxsize=int(os.getenv("SERP_CACHE_SIZE", "2000")),
+    ttl=float(os.getenv("SERP_CACHE_TTL", "3600")),
+)
+
+
+# Autosuggest lists per normalized seed. Research sessions repeat seeds a lot and
+# suggestions change slowly; concurrent requests for one seed share a single call.
+suggest_cache = TTLCache(
+    maxsize=int(os.getenv("SUGGEST_CACHE_SIZE", "5000")),
+    ttl=float(os.getenv("SUGGEST_CACHE_TTL", "21600")),
+)
+
+
+class SuggestUnavailable(Exception):
+    """Upstream answered with an error or an unparseable body; not cached."""
+
+
+def normalize_query(q: str) -> str:
+    return " ".join(q.lower().split())
+
+
+def find_domain_position(items: List[Dict], domain: str) -> Optional[int]:
+    """Position of the first result on `domain` or a subdomain of it (see app.core.domain_match)."""
+    return DomainMatcher([domain]).positions(items).get(domain)
 
 
+def _single(result: Dict, domain: str) -> Dict:
+    # Multi-domain result -> the single-domain shape callers of get_*_positions expect.
+    # An error only stands for domains it left unresolved: one found before it is a real result.
+    single = {"position": result["positions"].get(domain), "items": result["items"]}
+    if "error" in result and single["position"] is None:
+        single["error"] = result["error"]
+    return single
+
 def get_autosuggests(seed: str, limit: int = 10) -> List[str]:
     """
     Uses Google Suggest API endpoint to get suggestions.
+    Served from suggest_cache when possible; [] if upstream fails.
     """
-    url = f"https://suggestqueries.google.com/complete/search?client=chrome&q={quote_plus(seed)}"
-    resp = requests.get(url, headers=HEADRES, timeout=10)
-    if resp.status_code != 200:
+    try:
+        suggestions = suggest_cache.get_or_load(normalize_query(seed), lambda: _fetch_autosuggests(seed))
+    except SuggestUnavailable:
         return []
+    return suggestions[:limit]
+
+
+def _fetch_autosuggests(seed: str) -> List[str]:
+    url = f"{SUGGEST_URL}?client=chrome&q={quote_plus(seed)}"
+    with metrics.provider_fetch_seconds.time(provider="suggest"):
+        resp = get_http_client().get(url, headers=HEADRES, timeout=10)
+    return _parse_autosuggests(resp)
+
+
+def _parse_autosuggests(resp) -> List[str]:
+    if resp.status_code != 200:
+        metrics.provider_errors.inc(provider="suggest")
+        raise SuggestUnavailable(f"status {resp.status_code}")
     # response is like: ["seed", ["suggest1", "suggest2"], ...]
     try:
         data = resp.json()
-        suggestions = data[1][:limit]
-        return suggestions
-    except Exception:
-        return []
+        return list(data[1])
+    except Exception as e:
+        metrics.provider_errors.inc(provider="suggest")
+        raise SuggestUnavailable(str(e))
 
 
 def get_search_results_count(keyword: str) -> Optional[int]:
@@ -36,10 +96,16 @@ def get_search_results_count(keyword: str) -> Optional[int]:
     Returns None if not available.
     """
     q = quote_plus(keyword)
-    url = f"https://www.google.com/search?q={q}&hl=en"
-    resp = requests.get(url, headers=HEADRES, timeout=10)
+    url = f"{GOOGLE_SEARCH_URL}?q={q}&hl=en"
+    quota = get_quota("google")
+    if not quota.acquire():
+        return None
+    resp = get_http_client().get(url, headers=HEADRES, timeout=10)
+    quota.record()
     if resp.status_code != 200:
         return None
+    from bs4 import BeautifulSoup  # only this fallback scraper needs it; keeps it out of API startup
+
     soup = BeautifulSoup(resp.text, "html.parser")
     stat = soup.find(id="result-stats")
     if not stat:
@@ -57,116 +123,275 @@ def get_search_results_count(keyword: str) -> Optional[int]:
     return num
 
 
-def get_serp_positions(keyword: str, domain: str, max_pages: int = 1) -> Dict:
+def _retry_after(resp) -> Optional[float]:
+    try:
+        return float(resp.headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+
+def _fetch_google_page(keyword: str, start: int):
+    """(items, None) for one parsed page of Google results, or (None, error message)."""
+    url = f"{GOOGLE_SEARCH_URL}?q={quote_plus(keyword)}&start={start}&hl=en"
+    logger.debug("Fetching %s", url)
+    quota = get_quota("google")
+    if not quota.acquire():
+        if quota.backing_off():
+            return None, "Google is rate limiting requests; backing off"
+        logger.info("Google scraping budget spent for today")
+        return None, "Google scraping budget for today is used up"
+    try:
+        with metrics.provider_fetch_seconds.time(provider="google"):
+            resp = get_http_client().get(url, headers=HEADRES, timeout=5) # Reduced timeout
+    except Exception as e:
+        metrics.provider_errors.inc(provider="google")
+        logger.warning("Google request for %r failed: %s", keyword, e)
+        return None, str(e)
+    quota.record()
+    if resp.status_code == 429:
+        # Throttling, not the daily budget: that one is our own quota above
+        quota.back_off(_retry_after(resp))
+    if resp.status_code != 200:
+        metrics.provider_errors.inc(provider="google")
+        logger.warning("Google returned status %s for %r: %s", resp.status_code, keyword, resp.text[:100])
+        return None, f"Google returned status {resp.status_code}"
+    with metrics.serp_parse_seconds.time(provider="google"):
+        items = parse_serp_page(resp.text, start)
+    logger.debug("Parsed %d results for %r (start=%d)", len(items), keyword, start)
+    return items, None
+
+
+def get_serp_positions_multi(keyword: str, domains: List[str], max_pages: int = 1,
+                             previous_position: Optional[int] = None) -> Dict:
     """
-    Very lightweight SERP parser: returns position (1..N) of first result matching domain.
-    Also returns parsed snippet list for the first N results.
-    max_pages controls how many pages (10 results each) to fetch (1 => first 10 results).
+    Scrape Google directly: {"positions": {domain: first position}, "items": [...]}
+    for every domain in `domains`, from one pass over the result pages.
+    max_pages controls how many pages (10 results each) to fetch (1 => first 10 results);
+    pagination stops as soon as every domain has been found.
+    Pages are cached in serp_cache, so other domains tracking the same keyword reuse them.
+    Spacing between page requests comes from the "google" rate limiter / quota.
+    If a page can't be fetched, the result carries an "error": domains not found
+    on the pages before it are unknown, not absent.
+    Pages stop once everything is found, so `previous_position` adds nothing here.
     """
-    print(f"DEBUG: Scraper starting for '{keyword}' domain '{domain}'")
-    result = {"position": None, "items": []}
+    logger.debug("Google scraper for %r domains %s", keyword, domains)
+    matcher = DomainMatcher(domains)
+    found = {}
+    result = {"positions": found, "items": []}
     for page in range(max_pages):
         start = page * 10
-        url = f"https://www.google.com/search?q={quote_plus(keyword)}&start={start}&hl=en"
-        print(f"DEBUG: Fetching {url}")
-        try:
-            resp = requests.get(url, headers=HEADRES, timeout=5) # Reduced timeout
-            print(f"DEBUG: Status {resp.status_code}")
-            if resp.status_code != 200:
-                print(f"DEBUG: Non-200 status: {resp.text[:100]}")
-                continue
-            soup = BeautifulSoup(resp.text, "html.parser")
-            containers = soup.select("div.g")  # g class usually wraps results
-            print(f"DEBUG: Found {len(containers)} containers")
-            pos = start + 1
-            for c in containers:
-                a = c.find("a", href=True)
-                h3 = c.find("h3")
-                if not a or not h3:
-                    continue
-                href = a["href"]
-                title = h3.get_text().strip()
-                snippet = c.get_text().strip()
-                result["items"].append({"position": pos, "title": title, "href": href, "snippet": snippet})
-                if domain in href:
-                    result["position"] = pos
-                    print(f"DEBUG: Found match at {pos}")
-                    return result
-                pos += 1
-            _sleep()
-        except Exception as e:
-            print(f"DEBUG: Requests exception: {e}")
-    print(f"DEBUG: Scraper finished. Found: {result['position']}")
+        key = ("google", normalize_query(keyword), "en", start)
+        items = serp_cache.get(key)
+        if items is None:
+            items, error = _fetch_google_page(keyword, start)
+            if error:
+                result["error"] = error
+                break
+            serp_cache.set(key, items)
+        result["items"].extend(items)
+        matcher.positions(items, found)
+        if matcher.complete(found):
+            break
+    logger.debug("Google scraper for %r found %s", keyword, found)
     return result
 
-def get_serpapi_positions(keyword: str, domain: str, max_pages: int = 1) -> Dict:
+
+def get_serp_positions(keyword: str, domain: str, max_pages: int = 1, previous_position: Optional[int] = None) -> Dict:
     """
-    Uses SerpApi to get real Google rank data.
+    Very lightweight SERP parser: returns position (1..N) of first result matching domain.
+    Also returns parsed snippet list for the results fetched.
     """
-    try:
-        from serpapi import GoogleSearch
-    except ImportError:
-        return {"position": None, "items": [], "error": "Dependency 'google-search-results' not installed."}
+    return _single(get_serp_positions_multi(keyword, [domain], max_pages, previous_position), domain)
+
+# SerpApi result depths we ask for. A tracking that ranked at N last time asks
+# for the smallest depth covering N + DEPTH_MARGIN (smaller pages come back
+# faster and cheaper); if the domain is not in there it escalates to the full 100.
+SERPAPI_DEPTHS = (10, 30, 100)
+DEPTH_MARGIN = int(os.getenv("SERP_DEPTH_MARGIN", "5"))
+QUOTA_ERRORS = ("run out of searches", "quota", "limit reached")
+
+
+def serpapi_depth(previous_position: Optional[int]) -> int:
+    if previous_position is None:
+        return SERPAPI_DEPTHS[-1]
+    for depth in SERPAPI_DEPTHS:
+        if previous_position + DEPTH_MARGIN <= depth:
+            return depth
+    return SERPAPI_DEPTHS[-1]
 
-    import os
-    
-    api_key = os.getenv("SERP_API_KEY")
-    if not api_key:
-        return {"position": None, "items": [], "error": "Missing SERP_API_KEY. Sign up at serpapi.com to get one."}
 
-    print(f"DEBUG: SerpApi Scraper for '{keyword}' domain '{domain}'")
-    
-    params = {
-      "q": keyword,
+def _serpapi_params(keyword: str, num: int = SERPAPI_DEPTHS[-1]) -> Dict:
+    return {
+      "engine": "google",
+      "q": normalize_query(keyword),
       "location": "United States",
       "hl": "en",
       "gl": "us",
       "google_domain": "google.com",
-      "api_key": api_key,
-      "num": 100 # Fetch top 100 in one go if possible, or paginate
+      "num": num
     }
-    
+
+
+def _serpapi_key(params: Dict) -> tuple:
+    return ("serpapi",) + tuple(sorted(params.items()))
+
+
+def _serpapi_cached(keyword: str, num: int, count: bool = True) -> Optional[List[Dict]]:
+    # A cached deeper SERP answers a shallower request too. The depths are probed
+    # with peek() so one lookup counts as one hit or one miss in the cache stats.
+    for depth in SERPAPI_DEPTHS:
+        if depth >= num:
+            key = _serpapi_key(_serpapi_params(keyword, depth))
+            if serp_cache.peek(key) is not None:
+                return serp_cache.get(key) if count else serp_cache.peek(key)
+    return serp_cache.get(_serpapi_key(_serpapi_params(keyword, num))) if count else None
+
+
+def serp_cached(provider: str, keyword: str) -> bool:
+    """Whether a check of `keyword` would be served without a provider call (for quota planning; not counted)."""
+    if provider == "serpapi":
+        return _serpapi_cached(keyword, SERPAPI_DEPTHS[0], count=False) is not None
+    return serp_cache.peek(("google", normalize_query(keyword), "en", 0)) is not None
+
+
+def _is_quota_error(message: str) -> bool:
+    message = message.lower()
+    return any(e in message for e in QUOTA_ERRORS)
+
+
+def _parse_serpapi_results(results: Dict) -> List[Dict]:
+    # Simple structure for our frontend
+    return [{
+        "position": item.get("position"),
+        "title": item.get("title"),
+        "href": item.get("link"),
+        "snippet": item.get("snippet")
+    } for item in results.get("organic_results", [])]
+
+
+def _serpapi_result(items: List[Dict], matcher: DomainMatcher) -> Dict:
+    found = matcher.positions(items)
+    logger.debug("SerpApi found matches %s", found)
+
+    return {
+        "positions": found,
+        "items": items[:15] # Keep it light for DB
+    }
+
+
+def _serpapi_response(keyword: str, params: Dict, resp, quota):
+    """(items, None) or (None, error message) for a SerpApi response; shared by the sync and async fetches."""
+    if resp.status_code == 429:
+        quota.mark_exhausted()
+    with metrics.serp_parse_seconds.time(provider="serpapi"):
+        results = resp.json()
+    # Check for error in response
+    if "error" in results:
+        error_msg = results["error"] # e.g. "Google Search: Quota limit reached"
+        metrics.provider_errors.inc(provider="serpapi")
+        logger.error("SerpApi returned error for %r: %s", keyword, error_msg)
+        if _is_quota_error(error_msg):
+            quota.mark_exhausted()
+        return None, error_msg
+    # Only successful searches count against the plan
+    quota.record()
+    items = _parse_serpapi_results(results)
+    serp_cache.set(_serpapi_key(params), items)
+    return items, None
+
+
+def _fetch_serpapi(keyword: str, num: int, api_key: str):
+    """(items, None) from cache or one SerpApi call, or (None, error message)."""
+    items = _serpapi_cached(keyword, num)
+    if items is not None:
+        return items, None
+    quota = get_quota("serpapi")
+    if not quota.acquire():
+        return None, "SerpApi quota for today is used up"
+    params = _serpapi_params(keyword, num)
     try:
-        search = GoogleSearch(params)
-        results = search.get_dict()
-        
-        # Check for error in response
-        if "error" in results:
-            error_msg = results["error"] # e.g. "Google Search: Quota limit reached"
-            print(f"ERROR: SerpApi returned error: {error_msg}")
-            return {"position": None, "items": [], "error": error_msg}
-
-        organic_results = results.get("organic_results", [])
-        
-        found_position = None
-        items = []
-        
-        # Parse results
-        for item in organic_results:
-            pos = item.get("position")
-            title = item.get("title")
-            link = item.get("link")
-            snippet = item.get("snippet")
-            
-            # Simple structure for our frontend
-            mapped_item = {
-                "position": pos,
-                "title": title,
-                "href": link,
-                "snippet": snippet
-            }
-            items.append(mapped_item)
-            
-            # Check for domain match
-            if domain in link and found_position is None:
-                found_position = pos
-                print(f"DEBUG: SerpApi found match at {pos}")
-        
-        return {
-            "position": found_position,
-            "items": items[:15] # Keep it light for DB
-        }
-        
+        # 429 from SerpApi usually means the plan quota is spent: don't retry it
+        with metrics.provider_fetch_seconds.time(provider="serpapi"):
+            resp = get_http_client().get(SERPAPI_URL, params=dict(params, api_key=api_key), timeout=30,
+                                         retry_statuses=(500, 502, 503, 504))
+        return _serpapi_response(keyword, params, resp, quota)
     except Exception as e:
-        print(f"ERROR: SerpApi failed: {e}")
-        return {"position": None, "items": [], "error": str(e)}
+        metrics.provider_errors.inc(provider="serpapi")
+        logger.error("SerpApi request for %r failed: %s", keyword, e)
+        return None, str(e)
+
+
+async def _afetch_serpapi(keyword: str, num: int, api_key: str):
+    """Async _fetch_serpapi: same cache, quota, rate limit and error handling."""
+    items = _serpapi_cached(keyword, num)
+    if items is not None:
+        return items, None
+    quota = get_quota("serpapi")
+    if not await quota.aacquire():
+        return None, "SerpApi quota for today is used up"
+    params = _serpapi_params(keyword, num)
+    try:
+        with metrics.provider_fetch_seconds.time(provider="serpapi"):
+            resp = await get_async_http_client().get(SERPAPI_URL, params=dict(params, api_key=api_key), timeout=30,
+                                                     retry_statuses=(500, 502, 503, 504))
+        # Recording usage may hit the DB
+        return await asyncio.to_thread(_serpapi_response, keyword, params, resp, quota)
+    except Exception as e:
+        metrics.provider_errors.inc(provider="serpapi")
+        logger.error("SerpApi request for %r failed: %s", keyword, e)
+        return None, str(e)
+
+
+def get_serpapi_positions_multi(keyword: str, domains: List[str], max_pages: int = 1,
+                                previous_position: Optional[int] = None) -> Dict:
+    """
+    Uses SerpApi to get real Google rank data for every domain in `domains`
+    from one search: {"positions": {domain: position}, "items": [...]}.
+    Calls the JSON endpoint through the shared pooled client rather than the
+    serpapi package, which opens a fresh connection per search.
+    `previous_position` (the lowest last known rank among the domains) picks a
+    shallower search depth; see serpapi_depth.
+    """
+    api_key = os.getenv("SERP_API_KEY")
+    if not api_key:
+        return {"positions": {}, "items": [], "error": "Missing SERP_API_KEY. Sign up at serpapi.com to get one."}
+
+    logger.debug("SerpApi scraper for %r domains %s", keyword, domains)
+
+    matcher = DomainMatcher(domains)
+    depth = serpapi_depth(previous_position)
+    items, error = _fetch_serpapi(keyword, depth, api_key)
+    if error:
+        return {"positions": {}, "items": [], "error": error}
+    if depth < SERPAPI_DEPTHS[-1] and not matcher.complete(matcher.positions(items)):
+        # Someone dropped out of the expected range: look at the full depth before reporting it
+        deeper, error = _fetch_serpapi(keyword, SERPAPI_DEPTHS[-1], api_key)
+        if not error:
+            items = deeper
+
+    return _serpapi_result(items, matcher)
+
+
+def get_serpapi_positions(keyword: str, domain: str, max_pages: int = 1, previous_position: Optional[int] = None) -> Dict:
+    """Single-domain get_serpapi_positions_multi: {"position", "items"[, "error"]}."""
+    return _single(get_serpapi_positions_multi(keyword, [domain], max_pages, previous_position), domain)
+
+
+async def aget_serpapi_positions_multi(keyword: str, domains: List[str], max_pages: int = 1,
+                                       previous_position: Optional[int] = None) -> Dict:
+    """Async get_serpapi_positions_multi, sharing the same SERP cache, quota and depth logic."""
+    api_key = os.getenv("SERP_API_KEY")
+    if not api_key:
+        return {"positions": {}, "items": [], "error": "Missing SERP_API_KEY. Sign up at serpapi.com to get one."}
+
+    matcher = DomainMatcher(domains)
+    depth = serpapi_depth(previous_position)
+    items, error = await _afetch_serpapi(keyword, depth, api_key)
+    if error:
+        return {"positions": {}, "items": [], "error": error}
+    if depth < SERPAPI_DEPTHS[-1] and not matcher.complete(matcher.positions(items)):
+        deeper, error = await _afetch_serpapi(keyword, SERPAPI_DEPTHS[-1], api_key)
+        if not error:
+            items = deeper
+
+    return _serpapi_result(items, matcher)
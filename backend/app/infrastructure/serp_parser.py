@@ -0,0 +1,133 @@
+"""
+Google results-page parsers.
+
+Each backend returns the same list of {"position", "title", "href", "snippet"}
+dicts and only touches the nodes it needs: the first link, the h3 and the
+description block of each `div.g` result container.
+
+Backends, fastest first: selectolax, lxml, html.parser (BeautifulSoup, always
+available). Pick one with SERP_PARSER, otherwise the fastest installed is used.
+"""
+import os
+from typing import Callable, Dict, List, Optional
+
+# Class names Google has used for the description text under a result
+SNIPPET_CLASSES = ("VwiC3b", "IsZvec", "aCOpRe")
+
+
+def _parse_html_parser(html: str, start: int) -> List[Dict]:
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "html.parser")
+    items = []
+    pos = start + 1
+    for c in soup.select("div.g"):
+        a = c.find("a", href=True)
+        h3 = c.find("h3")
+        if not a or not h3:
+            continue
+        sn = c.find(lambda tag: tag.has_attr("data-sncf") or any(n in tag.get("class", ()) for n in SNIPPET_CLASSES))
+        items.append({
+            "position": pos,
+            "title": h3.get_text().strip(),
+            "href": a["href"],
+            "snippet": sn.get_text().strip() if sn else None,
+        })
+        pos += 1
+    return items
+
+
+_LXML_SNIPPET_XPATH = " | ".join(
+    [".//*[@data-sncf]"] + [f".//*[contains(concat(' ', normalize-space(@class), ' '), ' {n} ')]" for n in SNIPPET_CLASSES]
+)
+
+
+def _parse_lxml(html: str, start: int) -> List[Dict]:
+    from lxml import html as lxml_html
+
+    if not html.strip():
+        return []
+    doc = lxml_html.fromstring(html)
+    items = []
+    pos = start + 1
+    for c in doc.xpath("//div[contains(concat(' ', normalize-space(@class), ' '), ' g ')]"):
+        a = c.xpath("(.//a[@href])[1]")
+        h3 = c.xpath("(.//h3)[1]")
+        if not a or not h3:
+            continue
+        sn = c.xpath(f"({_LXML_SNIPPET_XPATH})[1]")
+        items.append({
+            "position": pos,
+            "title": h3[0].text_content().strip(),
+            "href": a[0].get("href"),
+            "snippet": sn[0].text_content().strip() if sn else None,
+        })
+        pos += 1
+    return items
+
+
+_SELECTOLAX_SNIPPET_CSS = ", ".join(["[data-sncf]"] + [f".{n}" for n in SNIPPET_CLASSES])
+
+
+def _parse_selectolax(html: str, start: int) -> List[Dict]:
+    from selectolax.parser import HTMLParser
+
+    tree = HTMLParser(html)
+    items = []
+    pos = start + 1
+    for c in tree.css("div.g"):
+        a = c.css_first("a[href]")
+        h3 = c.css_first("h3")
+        if a is None or h3 is None:
+            continue
+        sn = c.css_first(_SELECTOLAX_SNIPPET_CSS)
+        items.append({
+            "position": pos,
+            "title": h3.text().strip(),
+            "href": a.attributes.get("href"),
+            "snippet": sn.text().strip() if sn else None,
+        })
+        pos += 1
+    return items
+
+
+BACKENDS: Dict[str, Callable[[str, int], List[Dict]]] = {
+    "selectolax": _parse_selectolax,
+    "lxml": _parse_lxml,
+    "html.parser": _parse_html_parser,
+}
+
+_MODULES = {"selectolax": "selectolax.parser", "lxml": "lxml.html", "html.parser": "bs4"}
+
+
+def available_backends() -> List[str]:
+    import importlib.util
+
+    found = []
+    for name, module in _MODULES.items():
+        try:
+            if importlib.util.find_spec(module) is not None:
+                found.append(name)
+        except ModuleNotFoundError:
+            continue
+    return found
+
+
+_default_backend: Optional[str] = None
+
+
+def default_backend() -> str:
+    global _default_backend
+    if _default_backend is None:
+        available = available_backends()
+        wanted = os.getenv("SERP_PARSER")
+        if wanted in available:
+            _default_backend = wanted
+        else:
+            _default_backend = available[0] if available else "html.parser"
+    return _default_backend
+
+
+def parse_serp_page(html: str, start: int = 0, backend: Optional[str] = None) -> List[Dict]:
+    """Parse one results page; `start` is the result offset (0, 10, 20...)."""
+    return BACKENDS[backend or default_backend()](html, start)
@@ -0,0 +1,118 @@
+"""
+Deduplicated SERP snapshot storage.
+
+The same titles/URLs/snippets show up in check after check, so each distinct
+result is stored once in `serp_results` and a history row only keeps a packed
+array of (position, result id) pairs in `rank_history.snapshot_refs`
+(8 bytes per result instead of ~300 bytes of JSON).
+
+`snapshot_json` rebuilds the exact JSON the API has always returned, so
+readers of `serp_snapshot` don't see the difference.
+"""
+import hashlib
+import json
+import struct
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import select
+
+from app.data import models
+from app.data.bulk import chunked, insert_ignore
+from app.infrastructure.cache import TTLCache
+
+SNAPSHOT_ITEMS = 10  # results kept per check
+
+_results = models.SerpResult.__table__
+# key -> serp_results.id; ids never change once committed
+_id_cache = TTLCache(maxsize=100000, ttl=24 * 3600)
+
+
+def result_key(item: Dict) -> str:
+    raw = json.dumps([item.get("href"), item.get("title"), item.get("snippet")], ensure_ascii=False)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+# Little-endian uint32s whatever the platform; the same bytes array("I") wrote on x86/ARM
+_REF_FORMAT = "<%dI"
+
+
+def pack_refs(pairs: Sequence[Tuple[int, int]]) -> bytes:
+    flat = []
+    for pos, rid in pairs:
+        flat.append(pos or 0)
+        flat.append(rid)
+    return struct.pack(_REF_FORMAT % len(flat), *flat)
+
+
+def unpack_refs(blob: bytes) -> List[Tuple[int, int]]:
+    flat = struct.unpack(_REF_FORMAT % (len(blob) // 4), blob)
+    return [(flat[i], flat[i + 1]) for i in range(0, len(flat), 2)]
+
+
+def _lookup_ids(conn, keys: Iterable[str]) -> Dict[str, int]:
+    found = {}
+    for part in chunked(list(keys), 500):
+        for rid, key in conn.execute(select(_results.c.id, _results.c.key).where(_results.c.key.in_(part))):
+            found[key] = rid
+    return found
+
+
+def intern_items(conn, item_lists: Sequence[Sequence[Dict]]) -> List[bytes]:
+    """
+    Store any new results and return packed refs for each item list, in order.
+    Uses one SELECT for unknown keys and one INSERT ... ON CONFLICT DO NOTHING
+    for the new ones; keys seen before are resolved from memory.
+    """
+    keyed = [[(item.get("position"), result_key(item), item) for item in items] for items in item_lists]
+    ids: Dict[str, int] = {}
+    pending: Dict[str, Dict] = {}
+    for entries in keyed:
+        for _, key, item in entries:
+            if key in ids or key in pending:
+                continue
+            rid = _id_cache.get(key)
+            if rid is not None:
+                ids[key] = rid
+            else:
+                pending[key] = item
+
+    if pending:
+        existing = _lookup_ids(conn, pending)
+        for key, rid in existing.items():
+            _id_cache.set(key, rid)
+        ids.update(existing)
+        new = [k for k in pending if k not in existing]
+        if new:
+            insert_ignore(conn, _results, [
+                {"key": k, "href": pending[k].get("href"), "title": pending[k].get("title"), "snippet": pending[k].get("snippet")}
+                for k in new
+            ], ["key"])
+            # Not cached yet: if this transaction rolls back the ids would be dangling
+            ids.update(_lookup_ids(conn, new))
+
+    return [pack_refs([(pos, ids[key]) for pos, key, _ in entries]) for entries in keyed]
+
+
+def load_results(conn, blobs: Iterable[Optional[bytes]]) -> Dict[int, Dict]:
+    """serp_results rows referenced by any of `blobs`, keyed by id."""
+    wanted = set()
+    for blob in blobs:
+        if blob:
+            wanted.update(rid for _, rid in unpack_refs(blob))
+    rows = {}
+    for part in chunked(sorted(wanted), 500):
+        stmt = select(_results.c.id, _results.c.href, _results.c.title, _results.c.snippet).where(_results.c.id.in_(part))
+        for rid, href, title, snippet in conn.execute(stmt):
+            rows[rid] = {"href": href, "title": title, "snippet": snippet}
+    return rows
+
+
+def snapshot_json(blob: Optional[bytes], legacy: Optional[str], results: Dict[int, Dict]) -> Optional[str]:
+    """The JSON string stored before interning: [{position, title, href, snippet}, ...]."""
+    if blob is None:
+        return legacy
+    items = []
+    for pos, rid in unpack_refs(blob):
+        r = results.get(rid, {})
+        items.append({"position": pos or None, "title": r.get("title"), "href": r.get("href"), "snippet": r.get("snippet")})
+    return json.dumps(items)
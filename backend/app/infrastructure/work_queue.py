@@ -0,0 +1,129 @@
+"""
+DB-backed rank check queue, so checks can run outside the API process.
+
+With RANK_CHECK_MODE=queue the API processes only produce: every few seconds
+the one holding the producer lease copies due trackings into
+`rank_check_queue` (one row per tracking at most). Any number of worker
+processes (worker.py, on any machine sharing the database) claim jobs in
+batches with a visibility timeout, fetch, then record the history and delete
+the jobs in one transaction. Jobs of a worker that died become claimable again
+when their lease runs out; a result that arrives after its lease was taken
+over is dropped, so every due check is recorded exactly once.
+"""
+import json
+import logging
+import os
+import socket
+import threading
+from typing import List, Optional
+
+from app.core.rank import as_utc, schedule_after_check, utcnow
+from app.infrastructure import event_feed, metrics
+from app.infrastructure.database_repository import Repository
+from app.services.rank_tracker_service import RankTrackerService
+
+logger = logging.getLogger(__name__)
+
+# "inline": the API process runs checks itself (TrackingScheduler); "queue": API produces, worker.py consumes
+RANK_CHECK_MODE = os.getenv("RANK_CHECK_MODE", "inline").lower()
+
+PRODUCER_LEASE = "rank-check-producer"
+PRODUCER_LEASE_SECONDS = float(os.getenv("QUEUE_PRODUCER_LEASE_SECONDS", "30"))
+ENQUEUE_SECONDS = float(os.getenv("QUEUE_ENQUEUE_SECONDS", "5"))
+ENQUEUE_LIMIT = int(os.getenv("QUEUE_ENQUEUE_LIMIT", "5000"))
+
+# Jobs per claim, how long a claim is invisible to other workers, and how long
+# an idle worker waits before polling again
+CLAIM_SIZE = int(os.getenv("QUEUE_CLAIM_SIZE", "32"))
+LEASE_SECONDS = float(os.getenv("QUEUE_LEASE_SECONDS", "300"))
+POLL_SECONDS = float(os.getenv("QUEUE_POLL_SECONDS", "2"))
+# A job claimed this many times without completing (its worker keeps dying) is recorded as failed
+MAX_ATTEMPTS = int(os.getenv("QUEUE_MAX_ATTEMPTS", "5"))
+
+
+def process_name() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class _Results:
+    """Collects rows in HistoryWriter.add's shape so one claim is recorded in one transaction."""
+
+    def __init__(self):
+        self.rows: List[dict] = []
+
+    def add(self, tracking_id, position, serp_snapshot, checked_at, next_due_at, items=None, fingerprint=None,
+            event=None):
+        self.rows.append({"tracking_id": tracking_id, "position": position, "serp_snapshot": serp_snapshot,
+                          "items": items, "checked_at": checked_at, "next_due_at": next_due_at,
+                          "fingerprint": fingerprint, "event": event})
+
+
+def enqueue_due(holder: Optional[str] = None, scraper=None) -> Optional[int]:
+    """
+    Producer tick: queue the due checks the provider quota admits (the rest are
+    deferred) if this process holds the producer lease. None if it does not.
+    """
+    with metrics.scheduler_tick_seconds.time(job="enqueue"), Repository() as repo:
+        if not repo.acquire_lease(PRODUCER_LEASE, holder or process_name(), PRODUCER_LEASE_SECONDS):
+            return None
+        due = repo.list_due_unqueued(limit=ENQUEUE_LIMIT)
+        if not due:
+            return 0
+        # Jobs already queued will spend quota too
+        pending = repo.queue_stats()["queued"]
+        admitted, deferred = RankTrackerService(repo, scraper).admit_checks(due, pending=pending)
+        queued = repo.enqueue_checks(admitted)
+        repo.defer_trackings(deferred)
+        return queued
+
+
+def release_producer(holder: Optional[str] = None):
+    with Repository() as repo:
+        repo.release_lease(PRODUCER_LEASE, holder or process_name())
+
+
+def work_once(worker: str, scraper=None, concurrency: Optional[int] = None, claim_size: int = CLAIM_SIZE) -> int:
+    """Claim one batch, check it and record it. Returns the number of jobs claimed."""
+    with Repository() as repo:
+        token, claimed = repo.claim_checks(worker, claim_size, LEASE_SECONDS)
+        if not claimed:
+            return 0
+        results = _Results()
+        service = RankTrackerService(repo, scraper, concurrency=concurrency, history_writer=results)
+        fresh = []
+        now = utcnow()
+        for tracking, attempts in claimed:
+            if tracking.next_due_at:
+                metrics.scheduler_lag_seconds.observe(max(0.0, (now - as_utc(tracking.next_due_at)).total_seconds()),
+                                                      source="queue")
+            if attempts > MAX_ATTEMPTS:
+                checked_at = utcnow()
+                results.add(tracking.id, None, json.dumps({"error": f"gave up after {MAX_ATTEMPTS} attempts"}),
+                            checked_at, schedule_after_check(tracking, checked_at))
+            else:
+                fresh.append(tracking)
+        service.check_many(fresh)
+        with metrics.history_write_seconds.time(path="queue"):
+            recorded = repo.complete_checks(token, results.rows)
+        metrics.history_rows_written.inc(recorded, path="queue")
+        if any(r["event"] for r in results.rows):
+            event_feed.notify()
+        if recorded < len(results.rows):
+            logger.warning("Worker %s lost the lease on %d jobs", worker, len(results.rows) - recorded)
+        return len(claimed)
+
+
+def run_worker(stop: threading.Event, worker: Optional[str] = None, scraper=None, concurrency: Optional[int] = None,
+               claim_size: int = CLAIM_SIZE):
+    """Consume the queue until `stop` is set; polls every POLL_SECONDS while it is empty."""
+    worker = worker or process_name()
+    logger.info("Rank check worker %s started", worker)
+    while not stop.is_set():
+        try:
+            claimed = work_once(worker, scraper, concurrency, claim_size)
+        except Exception as e:
+            logger.exception("Error in rank check worker %s: %s", worker, e)
+            claimed = 0
+        if not claimed:
+            stop.wait(POLL_SECONDS)
+    logger.info("Rank check worker %s stopped", worker)
@@ -0,0 +1,160 @@
+"""
+Keyword expansion: breadth-first autosuggest crawl from one seed.
+
+Level 1 queries the seed itself, the seed with every letter appended
+("seed a" ... "seed z") and with question prefixes ("how seed", ...). Each
+new suggestion becomes a plain query on the next level, up to `max_depth`
+levels or `budget` upstream calls, whichever comes first.
+
+The frontier is fetched a chunk at a time on a thread pool (calls go through
+get_autosuggests, so they are cached and coalesced). A query that fails with
+a network error is counted in `failed_calls` and skipped. After each chunk
+the suggestions are stored in `keywords` in bulk and the job row gets its
+progress and a checkpoint of the remaining frontier; the queries queued in
+that chunk are appended to `expansion_visited`, the job's dedupe set. So a
+paused, crashed or budget-capped job resumes where it stopped.
+"""
+import json
+import logging
+import os
+import string
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from app.infrastructure.database_repository import Repository
+from app.infrastructure.scraper_google import get_autosuggests, normalize_query
+from app.services.keyword_research_service import KeywordResearchService
+
+logger = logging.getLogger(__name__)
+
+EXPANSION_CONCURRENCY = int(os.getenv("EXPANSION_CONCURRENCY", "8"))
+# Queries fetched between checkpoints
+EXPANSION_CHUNK = int(os.getenv("EXPANSION_CHUNK", "64"))
+# Jobs allowed to run at once in this process
+EXPANSION_MAX_JOBS = int(os.getenv("EXPANSION_MAX_JOBS", "2"))
+SUGGESTIONS_PER_QUERY = 20
+
+QUESTION_PREFIXES = ("how", "what", "why", "when", "where", "which", "who", "can", "is", "does")
+
+
+def seed_queries(seed: str) -> List[str]:
+    seed = normalize_query(seed)
+    return [seed] + [f"{seed} {c}" for c in string.ascii_lowercase] + [f"{q} {seed}" for q in QUESTION_PREFIXES]
+
+
+def _suggestions(query: str) -> Optional[List[str]]:
+    """Suggestions for one frontier query; None if the request failed."""
+    try:
+        return get_autosuggests(query, limit=SUGGESTIONS_PER_QUERY)
+    except OSError as e:  # requests' ConnectionError/Timeout included
+        logger.warning("Autosuggest for %r failed: %s", query, e)
+        return None
+
+
+class KeywordExpansionService:
+    def __init__(self, repo_factory=Repository, concurrency: int = EXPANSION_CONCURRENCY, chunk: int = EXPANSION_CHUNK):
+        self._repo_factory = repo_factory
+        self.concurrency = concurrency
+        self.chunk = chunk
+
+    def run(self, job_id: int, stop: Optional[threading.Event] = None) -> str:
+        """Run (or resume) a job until its frontier is empty, the budget is spent or `stop` is set."""
+        with self._repo_factory() as repo:
+            job = repo.get_expansion_job(job_id)
+            if job is None:
+                raise ValueError(f"expansion job {job_id} not found")
+            seed, max_depth, budget, calls = job.seed, job.max_depth, job.budget, job.calls_made
+            found, failed = job.keywords_found, job.failed_calls
+            if job.checkpoint:
+                frontier = deque(json.loads(job.checkpoint)["frontier"])
+                queued = repo.get_expansion_visited(job_id)
+                repo.update_expansion_job(job_id, status="running", error=None)
+            else:
+                first = seed_queries(seed)
+                frontier = deque([q, 1] for q in first)
+                queued = set(first)
+                repo.update_expansion_job(job_id, visited=first, status="running", error=None)
+
+        status = "running"
+        try:
+            with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+                while frontier and calls < budget:
+                    if stop is not None and stop.is_set():
+                        status = "paused"
+                        break
+                    batch = [frontier.popleft() for _ in range(min(self.chunk, len(frontier), budget - calls))]
+                    lists = list(pool.map(lambda item: _suggestions(item[0]), batch))
+                    calls += len(batch)
+                    failed += sum(1 for suggestions in lists if suggestions is None)
+                    lists = [suggestions or [] for suggestions in lists]
+                    new = []
+                    for (_, level), suggestions in zip(batch, lists):
+                        if level >= max_depth:
+                            continue
+                        for s in suggestions:
+                            key = normalize_query(s)
+                            if key not in queued:
+                                queued.add(key)
+                                new.append(key)
+                                frontier.append([key, level + 1])
+                    with self._repo_factory() as repo:
+                        found += KeywordResearchService(repo).store_suggestions(lists)
+                        repo.update_expansion_job(
+                            job_id, visited=new, calls_made=calls, keywords_found=found, failed_calls=failed,
+                            frontier_size=len(frontier), checkpoint=json.dumps({"frontier": list(frontier)}),
+                        )
+            if status == "running":
+                # Budget-capped jobs keep their frontier: resume with a larger budget to go on
+                status = "done"
+        except Exception as e:
+            logger.exception("Expansion job %s failed: %s", job_id, e)
+            status = "failed"
+            with self._repo_factory() as repo:
+                repo.update_expansion_job(job_id, status=status, error=str(e))
+            return status
+        with self._repo_factory() as repo:
+            repo.update_expansion_job(job_id, status=status)
+        return status
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+_stops: Dict[int, threading.Event] = {}
+_lock = threading.Lock()
+
+
+def start_expansion(job_id: int) -> bool:
+    """Run a job on the background pool; False if it is already running in this process."""
+    global _executor
+    with _lock:
+        if job_id in _stops:
+            return False
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=EXPANSION_MAX_JOBS, thread_name_prefix="expansion")
+        stop = _stops[job_id] = threading.Event()
+
+    def _run():
+        try:
+            KeywordExpansionService().run(job_id, stop)
+        finally:
+            with _lock:
+                _stops.pop(job_id, None)
+
+    _executor.submit(_run)
+    return True
+
+
+def pause_expansion(job_id: int) -> bool:
+    """Ask a running job to stop after its current chunk (it checkpoints first)."""
+    with _lock:
+        stop = _stops.get(job_id)
+    if stop is None:
+        return False
+    stop.set()
+    return True
+
+
+def is_expansion_running(job_id: int) -> bool:
+    with _lock:
+        return job_id in _stops
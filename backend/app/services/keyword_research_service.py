@@ -1,8 +1,16 @@
 from app.infrastructure.scraper_google import get_autosuggests
 from app.core.keyword import KeywordSuggestion
+from app.core.keyword_metrics import score_keyword, score_keywords
 from app.infrastructure.database_repository import Repository
-import math
-import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+import os
+import time
+
+# Upstream autosuggest calls in flight at once for batch requests
+SUGGEST_CONCURRENCY = int(os.getenv("SUGGEST_CONCURRENCY", "8"))
+# Keywords loaded, scored and written per transaction by rescore_all
+RESCORE_BATCH_SIZE = int(os.getenv("KEYWORD_RESCORE_BATCH_SIZE", "50000"))
 
 class KeywordResearchService:
     def __init__(self, repo: Repository):
@@ -11,83 +19,67 @@ class KeywordResearchService:
     def _calculate_metrics(self, keyword: str, position: int) -> tuple[int, int]:
         """
         Calculate estimated volume and difficulty based on keyword characteristics.
-        Uses heuristics instead of unreliable web scraping.
+        Uses heuristics instead of unreliable web scraping (see app.core.keyword_metrics).
         """
-        # Base metrics on keyword characteristics
-        word_count = len(keyword.split())
-        keyword_length = len(keyword)
-        
-        # Use hash for consistent pseudo-random variation
-        hash_val = int(hashlib.md5(keyword.encode()).hexdigest(), 16)
-        variation = (hash_val % 100) / 100.0  # 0.0 to 1.0
-        
-        # Volume estimation (monthly searches)
-        # Shorter, more generic keywords = higher volume
-        # Position in autocomplete also matters (higher = less popular)
-        base_volume = 50000
-        
-        # Adjust by word count (more words = more specific = lower volume)
-        word_count_factor = 1.0 / (word_count ** 1.5)
-        
-        # Adjust by position (lower position = more popular)
-        position_factor = 1.0 / (1 + position * 0.3)
-        
-        # Add variation for realism
-        volume_variation = 0.5 + variation
-        
-        estimated_volume = int(base_volume * word_count_factor * position_factor * volume_variation)
-        
-        # Ensure reasonable bounds
-        estimated_volume = max(100, min(500000, estimated_volume))
-        
-        # Difficulty calculation (0-100)
-        # Shorter keywords = higher difficulty (more competition)
-        # Longer, specific keywords = lower difficulty
-        base_difficulty = 70
-        
-        # Adjust by word count (more words = easier to rank)
-        word_difficulty_factor = max(0.3, 1.0 - (word_count - 1) * 0.15)
-        
-        # Adjust by estimated volume (higher volume = higher difficulty)
-        volume_difficulty_factor = 0.5 + (estimated_volume / 100000) * 0.5
-        
-        # Add variation
-        difficulty_variation = 0.7 + (variation * 0.6)
-        
-        difficulty = int(base_difficulty * word_difficulty_factor * volume_difficulty_factor * difficulty_variation)
-        
-        # Ensure bounds
-        difficulty = max(10, min(100, difficulty))
-        
-        return estimated_volume, difficulty
+        return score_keyword(keyword, position)
+
+    def _build_suggestions(self, suggestions: List[str]) -> List[KeywordSuggestion]:
+        # Autocomplete position is the index in the list
+        volumes, difficulties, opportunities = score_keywords(suggestions, range(len(suggestions)))
+        return [
+            KeywordSuggestion(keyword=s, estimated_volume=int(v), difficulty=int(d), opportunity=str(o))
+            for s, v, d, o in zip(suggestions, volumes, difficulties, opportunities)
+        ]
+
+    def _store(self, result_lists: List[List[KeywordSuggestion]]) -> int:
+        # Store the ones we don't have yet, in one round trip. The position is
+        # kept so rescore_all can recompute the metrics later.
+        return self.repo.bulk_add_keywords([
+            {"text": ks.keyword, "estimated_volume": ks.estimated_volume, "difficulty": ks.difficulty,
+             "suggest_position": idx}
+            for results in result_lists for idx, ks in enumerate(results)
+        ])
+
+    def store_suggestions(self, suggestion_lists: List[List[str]]) -> int:
+        """Score and store raw autosuggest lists; returns how many keywords were new."""
+        return self._store([self._build_suggestions(s) for s in suggestion_lists])
 
     def suggest_keywords(self, seed: str, limit: int = 10):
-        suggestions = get_autosuggests(seed, limit=limit)
-        results = []
-        
-        for idx, s in enumerate(suggestions):
-            # Calculate metrics based on keyword characteristics
-            estimated_volume, difficulty = self._calculate_metrics(s, idx)
-            
-            # Opportunity label
-            if estimated_volume > 10000 and difficulty < 40:
-                opportunity = "high"
-            elif estimated_volume > 2000 and difficulty < 60:
-                opportunity = "medium"
-            else:
-                opportunity = "low"
-            
-            ks = KeywordSuggestion(
-                keyword=s, 
-                estimated_volume=estimated_volume, 
-                difficulty=difficulty, 
-                opportunity=opportunity
-            )
-            results.append(ks)
+        results = self._build_suggestions(get_autosuggests(seed, limit=limit))
+        self._store([results])
+        return results
 
-            # Optionally store (if not exists)
-            existing = self.repo.get_keyword(s)
-            if not existing:
-                self.repo.create_keyword(s, estimated_volume, difficulty)
-        
+    def suggest_many(self, seeds: List[str], limit: int = 10) -> Dict[str, List[KeywordSuggestion]]:
+        """
+        Suggestions for many seeds. Upstream calls run concurrently (cached and
+        coalesced per seed by get_autosuggests); everything is stored at once.
+        """
+        unique = list(dict.fromkeys(seeds))
+        with ThreadPoolExecutor(max_workers=max(1, min(SUGGEST_CONCURRENCY, len(unique)))) as pool:
+            fetched = dict(zip(unique, pool.map(lambda seed: get_autosuggests(seed, limit=limit), unique)))
+        results = {seed: self._build_suggestions(fetched[seed]) for seed in unique}
+        self._store(list(results.values()))
         return results
+
+    def rescore_all(self, batch_size: int = RESCORE_BATCH_SIZE) -> dict:
+        """
+        Recompute estimated_volume/difficulty for every stored keyword with the
+        current heuristics, a batch at a time. Keywords stored before their
+        autocomplete position was recorded keep their values.
+        """
+        start = time.perf_counter()
+        after_id, scanned, updated = 0, 0, 0
+        while True:
+            rows = self.repo.keyword_scoring_batch(after_id, batch_size)
+            if not rows:
+                break
+            after_id = rows[-1][0]
+            scanned += len(rows)
+            volumes, difficulties, _ = score_keywords([r[1] for r in rows], [r[2] for r in rows])
+            changes = [
+                {"kid": r[0], "estimated_volume": v, "difficulty": d}
+                for r, v, d in zip(rows, list(map(int, volumes)), list(map(int, difficulties)))
+                if (r[3], r[4]) != (v, d)
+            ]
+            updated += self.repo.update_keyword_metrics(changes)
+        return {"scanned": scanned, "updated": updated, "seconds": round(time.perf_counter() - start, 2)}
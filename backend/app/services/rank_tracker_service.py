@@ -1,13 +1,52 @@
-from app.infrastructure.scraper_google import get_serp_positions, get_serpapi_positions
+from app.infrastructure.scraper_google import (
+    get_serp_positions, get_serp_positions_multi, get_serpapi_positions, get_serpapi_positions_multi,
+    normalize_query, serp_cached,
+)
 from app.infrastructure.database_repository import Repository
+from app.infrastructure.quota import get_quota
+from app.infrastructure import metrics
+from app.core.rank import as_utc, schedule_after_check, utcnow
+from app.core.rank_events import detect_change, serp_fingerprint
+from app.infrastructure import event_feed
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import timedelta
 from typing import Optional
+import logging
 import os
+import time
+
+logger = logging.getLogger(__name__)
+
+# Number of rank checks allowed in flight at once. Provider rate limits
+# (see rate_limiter.py) still apply on top of this.
+DEFAULT_CONCURRENCY = int(os.getenv("TRACKING_CONCURRENCY", "8"))
+
+# Raw history rows are kept this long; daily/weekly rollups are kept forever
+RAW_RETENTION_DAYS = int(os.getenv("HISTORY_RAW_RETENTION_DAYS", "7"))
+EVENT_RETENTION_DAYS = int(os.getenv("RANK_EVENT_RETENTION_DAYS", "90"))
+ROLLUP_BATCH_SIZE = int(os.getenv("HISTORY_ROLLUP_BATCH_SIZE", "5000"))
+
+# Quota accounting for the built-in scrapers; injected scrapers are not metered
+SCRAPER_PROVIDERS = {get_serpapi_positions: "serpapi", get_serp_positions: "google"}
+# Built-in scrapers can resolve every domain of a keyword from one SERP fetch
+MULTI_SCRAPERS = {get_serpapi_positions: get_serpapi_positions_multi, get_serp_positions: get_serp_positions_multi}
+
+def check_priority(tracking, now):
+    """Sort key, most important first when the quota cannot cover every due check."""
+    overdue = (now - as_utc(tracking.next_due_at)).total_seconds() if tracking.next_due_at else 0
+    return (-(tracking.priority or 0), tracking.last_checked_at is not None, -overdue)
 
 class RankTrackerService:
-    def __init__(self, repo: Repository, scraper=None):
+    def __init__(self, repo: Repository, scraper=None, concurrency: Optional[int]=None, history_writer=None):
         self.repo = repo
+        # When set, history rows are buffered and written in bulk instead of one commit per check
+        self.history_writer = history_writer
         # Use SerpApi by default
         self.scraper = scraper or get_serpapi_positions
+        self.concurrency = concurrency or DEFAULT_CONCURRENCY
+        self.provider = SCRAPER_PROVIDERS.get(self.scraper)
+        self._label = metrics.provider_label(self.provider)
+        self._depth_hints = {}
 
     def add_tracking(self, domain: str, keyword: str, frequency: str="daily"):
         return self.repo.add_tracking_keyword(domain=domain, keyword=keyword, frequency=frequency)
@@ -19,65 +58,213 @@ class RankTrackerService:
         return self.repo.update_tracking(tracking_id, domain, keyword, frequency)
 
     def check_rank_once(self, tracking):
-        keyword = tracking.keyword
-        domain = tracking.domain
-        res = self.scraper(keyword, domain, max_pages=3)
+        start = time.perf_counter()
+        pos = self._record_result(tracking, self._fetch(tracking))
+        metrics.rank_check_seconds.observe(time.perf_counter() - start, provider=self._label)
+        return pos
+
+    def _fetch(self, tracking):
+        # Network only, no DB access: safe to call from worker threads
+        if self.scraper not in SCRAPER_PROVIDERS:
+            # Injected scrapers keep the (keyword, domain, max_pages) signature
+            return self.scraper(tracking.keyword, tracking.domain, max_pages=3)
+        previous = self._depth_hints.get(normalize_query(tracking.keyword), tracking.last_position)
+        return self.scraper(tracking.keyword, tracking.domain, max_pages=3, previous_position=previous)
+
+    def _fetch_group(self, group):
+        """Results for trackings sharing a keyword, from one multi-domain fetch when the scraper has one."""
+        multi = MULTI_SCRAPERS.get(self.scraper)
+        if multi is None or len(group) == 1:
+            return [self._fetch(t) for t in group]
+        first = group[0]
+        res = multi(first.keyword, [t.domain for t in group], max_pages=3,
+                    previous_position=self._depth_hints.get(normalize_query(first.keyword), first.last_position))
+        results = []
+        for t in group:
+            single = {"position": res["positions"].get(t.domain), "items": res["items"]}
+            # A failed later page leaves only the domains not found yet unresolved
+            if "error" in res and single["position"] is None:
+                single["error"] = res["error"]
+            results.append(single)
+        return results
+
+    def _groups(self, trackings):
+        # Injected scrapers get one call per tracking
+        if MULTI_SCRAPERS.get(self.scraper) is None:
+            return [[t] for t in trackings]
+        groups = {}
+        for t in trackings:
+            groups.setdefault(normalize_query(t.keyword), []).append(t)
+        return list(groups.values())
+
+    def _set_depth_hints(self, trackings):
+        # One SERP serves every tracking of a keyword, so it is fetched as deep
+        # as the lowest-ranked of them needs (any never-found one: full depth)
+        hints = {}
+        for t in trackings:
+            kw = normalize_query(t.keyword)
+            if kw in hints and (hints[kw] is None or t.last_position is None):
+                hints[kw] = None
+            else:
+                hints[kw] = max(hints.get(kw) or 0, t.last_position) if t.last_position is not None else None
+        self._depth_hints = hints
+
+    def _record_result(self, tracking, res):
         pos = res.get("position")
         
         # Check if we got an error message from scraper
         error_msg = res.get("error")
         
         import json
+        fingerprint = event = None
         if error_msg:
+            metrics.rank_check_errors.inc(provider=self._label, stage="fetch")
             # Store the error in the snapshot field so user can see it
-            snapshot = json.dumps({"error": error_msg})
+            snapshot, items = json.dumps({"error": error_msg}), None
         else:
-            snapshot = json.dumps(res.get("items", [])[:10])
+            # SERP items are interned by the repository (see snapshot_store)
+            snapshot, items = None, res.get("items", [])
+            # Compared with the state cached on the tracking row, not with history
+            fingerprint = serp_fingerprint(items)
+            if tracking.last_checked_at is not None:
+                kind = detect_change(tracking.last_position, pos, tracking.serp_fingerprint, fingerprint)
+                if kind:
+                    event = {"kind": kind, "old_position": tracking.last_position, "new_position": pos}
             
-        self.repo.add_rank_history(tracking.id, pos, snapshot)
+        if self.history_writer:
+            checked_at = utcnow()
+            next_due = schedule_after_check(tracking, checked_at)
+            self.history_writer.add(tracking.id, pos, snapshot, checked_at, next_due, items=items,
+                                    fingerprint=fingerprint, event=event)
+            # Reflect the new schedule on the in-memory row; the DB catches up on flush
+            tracking.last_checked_at = checked_at
+            tracking.next_due_at = next_due
+            if not error_msg:
+                tracking.last_position = pos
+                tracking.serp_fingerprint = fingerprint
+        else:
+            with metrics.history_write_seconds.time(path="direct"):
+                self.repo.add_rank_history(tracking.id, pos, snapshot, items=items, fingerprint=fingerprint, event=event)
+            metrics.history_rows_written.inc(path="direct")
+            if event:
+                event_feed.notify()
+        metrics.rank_checks.inc(provider=self._label)
         return pos
 
+    def admit_checks(self, trackings, pending: int = 0, now=None):
+        """
+        Split due trackings into (admitted, {tracking_id: retry_at}) by what the
+        provider quota still allows today, `pending` calls being already promised
+        (e.g. queued jobs). Most important first (see check_priority); trackings
+        sharing a keyword, or whose SERP is cached, cost one call or none. Normal
+        checks leave the reserve to priority trackings and first checks.
+        """
+        if not self.provider or not trackings:
+            return list(trackings), {}
+        quota = get_quota(self.provider)
+        available = quota.available(now)
+        if available is None:
+            return list(trackings), {}
+        now = now or utcnow()
+        available -= pending
+        reserve = quota.reserve()
+        admitted, deferred, keywords = [], [], set()
+        for t in sorted(trackings, key=lambda t: check_priority(t, now)):
+            kw = normalize_query(t.keyword)
+            cost = 0 if kw in keywords or serp_cached(self.provider, t.keyword) else 1
+            floor = 0 if (t.priority or 0) > 0 or t.last_checked_at is None else reserve
+            if cost == 0 or available - cost >= floor:
+                available -= cost
+                keywords.add(kw)
+                admitted.append(t)
+            else:
+                deferred.append(t)
+        if not deferred:
+            return admitted, {}
+        retry_at = quota.next_reset(now)
+        metrics.quota_deferred_checks.inc(len(deferred), provider=self.provider)
+        logger.info("Quota: admitted %d checks, deferred %d until %s", len(admitted), len(deferred), retry_at.isoformat())
+        return admitted, {t.id: retry_at for t in deferred}
+
     def run_all_tracking_once(self):
-        all_tracking = self.repo.list_tracking()
-        from datetime import datetime, timedelta
-        
-        for t in all_tracking:
+        # Due selection (frequency vs last check) happens in SQL via next_due_at
+        due, deferred = self.admit_checks(self.repo.list_due_tracking())
+        self.repo.defer_trackings(deferred)
+        return self.check_many(due)
+
+    def check_many(self, trackings):
+        """
+        Run rank checks for many trackings with bounded concurrency.
+        Trackings of the same keyword share one SERP fetch (one pass over the
+        results for all their domains). Fetches run on a thread pool; history
+        rows are written from this thread as results come in, since the
+        repository session is not thread-safe.
+        Returns the number of checks that were recorded.
+        """
+        if not trackings:
+            return 0
+        self._set_depth_hints(trackings)
+        groups = self._groups(trackings)
+        done = 0
+        if self.concurrency <= 1 or len(groups) == 1:
+            for group in groups:
+                start = time.perf_counter()
+                try:
+                    results = self._fetch_group(group)
+                except Exception as e:
+                    metrics.rank_check_errors.inc(len(group), provider=self._label, stage="fetch")
+                    logger.error("Error checking rank for %r: %s", group[0].keyword, e)
+                    continue
+                done += self._record_group(group, results, start)
+            return done
+
+        workers = min(self.concurrency, len(groups))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="rank-check") as pool:
+            futures = {pool.submit(self._timed_fetch_group, g): g for g in groups}
+            for fut in as_completed(futures):
+                group = futures[fut]
+                start, results = fut.result()
+                done += self._record_group(group, results, start)
+        return done
+
+    def _timed_fetch_group(self, group):
+        start = time.perf_counter()
+        try:
+            return start, self._fetch_group(group)
+        except Exception as e:
+            # A failed fetch is still recorded so the row is not retried every tick
+            logger.error("Error checking rank for %r: %s", group[0].keyword, e)
+            return start, [{"position": None, "items": [], "error": str(e)}] * len(group)
+
+    def _record_group(self, group, results, start: float) -> int:
+        done = 0
+        for t, res in zip(group, results):
             try:
-                # Check if due based on frequency
-                should_run = False
-                histories = self.repo.get_rank_history_for(t.id, limit=1)
-                last_run = histories[0].checked_at if histories else None
-                
-                if not last_run:
-                    should_run = True
-                else:
-                    now = datetime.now(last_run.tzinfo)
-                    delta = now - last_run
-                    
-                    freq = (t.frequency or "daily").lower()
-                    
-                    if freq == "minutely":
-                        should_run = delta >= timedelta(minutes=1)
-                    elif freq == "hourly":
-                        should_run = delta >= timedelta(hours=1)
-                    elif freq == "daily":
-                        should_run = delta >= timedelta(days=1)
-                    elif freq == "weekly":
-                        should_run = delta >= timedelta(weeks=1)
-                    elif freq == "monthly":
-                        should_run = delta >= timedelta(days=30)
-                    else:
-                        # Default to daily
-                        should_run = delta >= timedelta(days=1)
-
-                if should_run:
-                    self.check_rank_once(t)
+                self._record_result(t, res)
+                done += 1
             except Exception as e:
-                # continue tracking others even if one fails
-                print(f"Error checking rank for {t.keyword}: {e}")
-                continue
+                metrics.rank_check_errors.inc(provider=self._label, stage="record")
+                logger.error("Error saving rank for %r: %s", t.keyword, e)
+        elapsed = time.perf_counter() - start
+        for _ in range(done):
+            metrics.rank_check_seconds.observe(elapsed, provider=self._label)
+        return done
+
+    def rollup_history(self, batch_size: int = ROLLUP_BATCH_SIZE) -> int:
+        """Aggregate all new history rows into the rollups, one transaction per batch."""
+        total = 0
+        while True:
+            n = self.repo.rollup_history(batch_size)
+            total += n
+            if n < batch_size:
+                return total
 
-    def cleanup_history(self, days: int = 7):
-        count = self.repo.delete_old_history(days)
-        print(f"Cleaned up {count} old history records (older than {days} days)")
+    def cleanup_history(self, days: int = RAW_RETENTION_DAYS):
+        # Roll up first: only rows already in the daily/weekly tables are deleted
+        self.rollup_history()
+        count = self.repo.delete_rolled_up_history(utcnow() - timedelta(days=days))
+        logger.info("Cleaned up %d old history records (older than %d days)", count, days)
+        events = self.repo.delete_rank_events(utcnow() - timedelta(days=EVENT_RETENTION_DAYS))
+        if events:
+            logger.info("Cleaned up %d rank events older than %d days", events, EVENT_RETENTION_DAYS)
         return count
@@ -0,0 +1,108 @@
+"""
+Read-endpoint throughput and latency while tracking runs in the background.
+
+    cd backend && python benchmarks/bench_api.py [--requests 2000] [--concurrency 50]
+
+Seeds a throwaway SQLite DB, starts a thread that keeps running rank checks
+against a slow fake provider (so history is being written), then drives
+/rank/list and /rank/history/{id} in-process through httpx's ASGI transport.
+Prints one JSON line per endpoint.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+async def drive(client, path, total, concurrency):
+    latencies = []
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with sem:
+            t = time.perf_counter()
+            resp = await client.get(path)
+            latencies.append(time.perf_counter() - t)
+            resp.raise_for_status()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    elapsed = time.perf_counter() - start
+    return {
+        "path": path,
+        "requests": total,
+        "concurrency": concurrency,
+        "rps": round(total / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--trackings", type=int, default=200)
+    parser.add_argument("--history", type=int, default=200)
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp()
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmpdir, 'bench.db')}"
+
+    import httpx
+    from app.data.db import init_db
+    from app.core.rank import utcnow, compute_next_due
+    from app.infrastructure.database_repository import Repository
+    from app.services.rank_tracker_service import RankTrackerService
+    from main import app
+
+    init_db()
+    repo = Repository()
+    repo.bulk_add_tracking([{"domain": f"d{i}.com", "keyword": f"kw {i % 20}"} for i in range(args.trackings)])
+    ids = [tid for tid, _ in repo.list_tracking_schedule()]
+    snapshot = json.dumps([{"position": i, "title": "t", "href": "https://example.com", "snippet": "s"} for i in range(10)])
+    now = utcnow()
+    repo.bulk_add_rank_history([
+        {"tracking_id": ids[0], "position": i % 50, "serp_snapshot": snapshot, "checked_at": now, "next_due_at": compute_next_due(now, "daily")}
+        for i in range(args.history)
+    ])
+
+    stop = threading.Event()
+
+    def slow_provider(keyword, domain, max_pages=1, previous_position=None):
+        time.sleep(0.05)
+        return {"position": 7, "items": []}
+
+    def background_tracking():
+        bg_repo = Repository()
+        service = RankTrackerService(bg_repo, slow_provider, concurrency=8)
+        while not stop.is_set():
+            service.check_many(bg_repo.get_trackings_by_ids(ids[:40]))
+
+    worker = threading.Thread(target=background_tracking, daemon=True)
+    worker.start()
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for path in ("/rank/list", f"/rank/history/{ids[0]}"):
+                print(json.dumps(await drive(client, path, args.requests, args.concurrency)))
+
+    asyncio.run(run())
+    stop.set()
+    worker.join()
+
+
+if __name__ == "__main__":
+    main()
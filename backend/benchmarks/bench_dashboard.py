@@ -0,0 +1,80 @@
+"""
+Portfolio dashboard load: one /rank/history/{id} request per tracking vs a
+single POST /rank/history/batch.
+
+    cd backend && python benchmarks/bench_dashboard.py --trackings 500 --days 7
+
+Seeds a throwaway SQLite DB with hourly checks and drives the app in-process
+through httpx's ASGI transport. Prints one JSON line per mode.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--trackings", type=int, default=500)
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--concurrency", type=int, default=6, help="parallel requests, like a browser")
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp()
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmpdir, 'bench.db')}"
+
+    import httpx
+    from sqlalchemy import insert
+    from app.core.rank import utcnow
+    from app.data import models
+    from app.data.db import init_db
+    from app.infrastructure.database_repository import Repository
+    from main import app
+
+    init_db()
+    now = utcnow()
+    with Repository() as repo:
+        repo.bulk_add_tracking([{"domain": "example.com", "keyword": f"kw {i}"} for i in range(args.trackings)])
+        ids = [tid for tid, _ in repo.list_tracking_schedule()]
+        rows = [{"tracking_id": tid, "position": (h + tid) % 40 or None, "checked_at": now - timedelta(hours=h)}
+                for h in range(args.days * 24) for tid in ids]
+        for i in range(0, len(rows), 20000):
+            repo._session.execute(insert(models.RankHistory), rows[i:i + 20000])
+        repo.commit()
+    start_param = (now - timedelta(days=args.days)).isoformat()
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            sem = asyncio.Semaphore(args.concurrency)
+
+            async def one(tid):
+                async with sem:
+                    resp = await client.get(f"/rank/history/{tid}", params={"limit": 5000})
+                    resp.raise_for_status()
+                    return len(resp.json())
+
+            t = time.perf_counter()
+            points = sum(await asyncio.gather(*(one(tid) for tid in ids)))
+            print(json.dumps({"mode": "per_tracking", "requests": len(ids), "points": points,
+                              "seconds": round(time.perf_counter() - t, 3)}))
+
+            t = time.perf_counter()
+            resp = await client.post("/rank/history/batch", json={"domain": "example.com", "from": start_param,
+                                                                   "granularity": "raw"})
+            resp.raise_for_status()
+            body = resp.json()
+            print(json.dumps({"mode": "batch", "requests": 1, "points": len(body["points"]["position"]),
+                              "bytes": len(resp.content), "seconds": round(time.perf_counter() - t, 3)}))
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
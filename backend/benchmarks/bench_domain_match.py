@@ -0,0 +1,103 @@
+"""
+SERP domain matching: the old per-domain `domain in href` substring scan vs
+DomainMatcher (one pass, hostname suffix lookup) for a competitor set, and
+provider calls for a tracking batch where several domains share keywords.
+
+    cd backend && python benchmarks/bench_domain_match.py --domains 20 --serps 2000
+
+Prints one JSON line per measurement.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+def substring_position(items, domain):
+    # The matcher this replaces
+    for item in items:
+        if domain in (item.get("href") or ""):
+            return item.get("position")
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--domains", type=int, default=20, help="domains in the competitor set")
+    parser.add_argument("--serps", type=int, default=2000)
+    parser.add_argument("--keywords", type=int, default=200, help="keywords in the tracking batch")
+    args = parser.parse_args()
+
+    from app.core.domain_match import DomainMatcher
+
+    rnd = random.Random(3)
+    sites = [f"site{i}.com" for i in range(300)]
+    domains = sites[:args.domains]
+    serps = []
+    for _ in range(args.serps):
+        hosts = rnd.sample(sites, 100)
+        serps.append([{"position": i + 1, "href": f"https://{rnd.choice(['', 'www.', 'blog.', 'shop.'])}{h}/p{i}"}
+                      for i, h in enumerate(hosts)])
+    # Lookalikes the substring test gets wrong
+    tricky = [{"position": 1, "href": "https://notsite1.com/"}, {"position": 2, "href": "https://site1.com.mirror.net/"},
+              {"position": 3, "href": "https://site10.com/"}, {"position": 4, "href": "https://www.site1.com/"}]
+
+    start = time.perf_counter()
+    old = [{d: substring_position(items, d) for d in domains} for items in serps]
+    old_s = time.perf_counter() - start
+
+    matcher = DomainMatcher(domains)
+    start = time.perf_counter()
+    new = [matcher.positions(items) for items in serps]
+    new_s = time.perf_counter() - start
+
+    disagreements = sum(1 for o, n in zip(old, new) for d in domains if o[d] != n.get(d))
+    print(json.dumps({
+        "mode": "match", "domains": args.domains, "serps": args.serps,
+        "substring_seconds": round(old_s, 3), "matcher_seconds": round(new_s, 3),
+        "disagreements": disagreements,
+        "tricky_substring": {d: substring_position(tricky, d) for d in ("site1.com",)},
+        "tricky_matcher": DomainMatcher(["site1.com"]).positions(tricky),
+    }))
+
+    # Provider calls for one batch: per-tracking fetches vs one fetch per keyword
+    os.environ["DATABASE_URL"] = "sqlite://"
+    from types import SimpleNamespace
+    from app.services import rank_tracker_service
+    from app.services.rank_tracker_service import RankTrackerService
+
+    calls = []
+
+    def fake_multi(keyword, ds, max_pages=1, previous_position=None):
+        calls.append(keyword)
+        return {"positions": DomainMatcher(ds).positions(serps[hash(keyword) % len(serps)]), "items": []}
+
+    def fake_single(keyword, domain, max_pages=1, previous_position=None):
+        calls.append(keyword)
+        return {"position": substring_position(serps[hash(keyword) % len(serps)], domain), "items": []}
+
+    trackings = [SimpleNamespace(id=i, keyword=f"kw {k}", domain=d, last_position=None, last_checked_at=None,
+                                 next_due_at=None, frequency="daily")
+                 for i, (k, d) in enumerate((k, d) for k in range(args.keywords) for d in domains[:5])]
+
+    class Recorder:
+        def add(self, *a, **kw):
+            pass
+
+    for mode, scraper in (("per_tracking", fake_single), ("per_keyword", fake_multi)):
+        calls.clear()
+        if mode == "per_keyword":
+            rank_tracker_service.MULTI_SCRAPERS[fake_single] = fake_multi
+        service = RankTrackerService(None, fake_single, concurrency=8, history_writer=Recorder())
+        start = time.perf_counter()
+        service.check_many(trackings)
+        print(json.dumps({"mode": mode, "trackings": len(trackings), "provider_calls": len(calls),
+                          "seconds": round(time.perf_counter() - start, 3)}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Keyword expansion crawl against a fake upstream with fixed latency: serial
+one-call-at-a-time baseline vs KeywordExpansionService, plus pause/resume from
+the checkpoint.
+
+    cd backend && python benchmarks/bench_expansion.py --latency 0.05 --budget 400
+
+Runs against a throwaway SQLite file and prints one JSON line per mode.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+SUFFIXES = ("tutorial", "pricing", "vs", "alternatives", "review", "free", "login", "api", "download", "examples")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per upstream call")
+    parser.add_argument("--budget", type=int, default=400)
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp()
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmpdir, 'bench.db')}"
+
+    from app.data.db import init_db
+    from app.infrastructure import scraper_google
+    from app.infrastructure.database_repository import Repository
+    from app.services.keyword_expansion_service import KeywordExpansionService
+
+    calls = []
+    calls_lock = threading.Lock()
+
+    def fake_fetch(seed):
+        with calls_lock:
+            calls.append(seed)
+        time.sleep(args.latency)
+        # Overlapping suggestions so the frontier dedupe has work to do
+        words = seed.split()
+        return [f"{seed} {s}" for s in SUFFIXES] + [f"{words[0]} {s}" for s in SUFFIXES[:3]]
+
+    scraper_google._fetch_autosuggests = fake_fetch
+    init_db()
+
+    def report(mode, start, job_id):
+        with Repository() as repo:
+            job = repo.get_expansion_job(job_id)
+            print(json.dumps({"mode": mode, "status": job.status, "calls_made": job.calls_made,
+                              "upstream_calls": len(calls), "keywords_found": job.keywords_found,
+                              "frontier_size": job.frontier_size, "seconds": round(time.perf_counter() - start, 3)}))
+        calls.clear()
+
+    with Repository() as repo:
+        serial_id = repo.create_expansion_job("serial seed", args.depth, args.budget).id
+        job_id = repo.create_expansion_job("rank tracker", args.depth, args.budget).id
+
+    start = time.perf_counter()
+    KeywordExpansionService(concurrency=1, chunk=1).run(serial_id)
+    report("serial", start, serial_id)
+
+    scraper_google.suggest_cache.clear()
+    stop = threading.Event()
+    timer = threading.Timer(args.latency * args.budget / args.concurrency / 3, stop.set)
+    start = time.perf_counter()
+    timer.start()
+    KeywordExpansionService(concurrency=args.concurrency, chunk=args.concurrency * 2).run(job_id, stop)
+    report("concurrent_until_pause", start, job_id)
+
+    start = time.perf_counter()
+    KeywordExpansionService(concurrency=args.concurrency, chunk=args.concurrency * 2).run(job_id)
+    report("concurrent_resumed", start, job_id)
+
+    with Repository() as repo:
+        print(json.dumps({"queued": len(repo.get_expansion_visited(job_id)),
+                          "keywords_table": len(repo.list_keywords(limit=10 ** 9))}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+History retention: one unbounded DELETE vs rollup + chunked deletes, and a
+long-range chart query against raw rows vs the weekly rollup.
+
+    cd backend && python benchmarks/bench_history_rollup.py --trackings 100 --days 60
+
+Runs against throwaway SQLite files and prints one JSON line per measurement.
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--trackings", type=int, default=100)
+    parser.add_argument("--days", type=int, default=60)
+    parser.add_argument("--per-day", type=int, default=24, help="checks per tracking per day")
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp()
+    path = os.path.join(tmpdir, "bench.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+
+    from sqlalchemy import insert
+    from app.core.rank import utcnow
+    from app.data import models
+    from app.data.db import engine, init_db
+    from app.infrastructure.database_repository import Repository
+
+    init_db()
+    now = utcnow()
+    with Repository() as repo:
+        repo.bulk_add_tracking([{"domain": f"d{i}.com", "keyword": "bench"} for i in range(args.trackings)])
+        ids = [tid for tid, _ in repo.list_tracking_schedule()]
+        step = timedelta(days=1) / args.per_day
+        rows = [
+            {"tracking_id": tid, "position": (n + tid) % 30 or None, "checked_at": now - step * n}
+            for n in range(args.days * args.per_day, 0, -1) for tid in ids
+        ]
+        for i in range(0, len(rows), 20000):
+            repo._session.execute(insert(models.RankHistory), rows[i:i + 20000])
+        repo.commit()
+    print(json.dumps({"history_rows": len(rows)}))
+    engine.dispose()
+    shutil.copy(path, path + ".copy")
+
+    cutoff = now - timedelta(days=7)
+    with Repository() as repo:
+        start = time.perf_counter()
+        deleted = repo._session.query(models.RankHistory).filter(models.RankHistory.checked_at < cutoff).delete()
+        repo.commit()
+        print(json.dumps({"mode": "single_delete", "rows": deleted,
+                          "write_lock_ms": round((time.perf_counter() - start) * 1000)}))
+    engine.dispose()
+    shutil.copy(path + ".copy", path)
+
+    with Repository() as repo:
+        start = time.perf_counter()
+        rolled = 0
+        while True:
+            n = repo.rollup_history(5000)
+            rolled += n
+            if n < 5000:
+                break
+        print(json.dumps({"mode": "rollup", "rows": rolled, "seconds": round(time.perf_counter() - start, 2)}))
+
+        # Chunked: the write lock is held per chunk, so report the longest chunk
+        longest, total, chunks = 0.0, 0, 0
+        while True:
+            t0 = time.perf_counter()
+            n = repo.delete_rolled_up_history(cutoff, chunk_size=1000, max_seconds=0, pause=0)
+            if n == 0:
+                break
+            longest = max(longest, time.perf_counter() - t0)
+            total += n
+            chunks += 1
+        print(json.dumps({"mode": "chunked_delete", "rows": total, "chunks": chunks,
+                          "max_write_lock_ms": round(longest * 1000, 1)}))
+    engine.dispose()
+    shutil.copy(path + ".copy", path)
+
+    with Repository() as repo:
+        while repo.rollup_history(5000):
+            pass
+        tid = ids[0]
+        for label, fetch in (
+            ("raw", lambda: repo.get_rank_history_for(tid, limit=10 ** 6, start=now - timedelta(days=args.days))),
+            ("weekly", lambda: repo.get_rollups(tid, "weekly", start=now - timedelta(days=args.days))),
+        ):
+            start = time.perf_counter()
+            for _ in range(20):
+                points = fetch()
+                repo._session.expunge_all()
+            print(json.dumps({"mode": f"range_query_{label}", "days": args.days, "points": len(points),
+                              "ms": round((time.perf_counter() - start) / 20 * 1000, 2)}))
+
+
+if __name__ == "__main__":
+    main()
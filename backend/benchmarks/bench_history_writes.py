@@ -0,0 +1,56 @@
+"""
+Compare per-check history commits with the buffered HistoryWriter.
+
+    cd backend && python benchmarks/bench_history_writes.py --rows 10000
+
+Runs against a throwaway SQLite file and prints one JSON line per mode.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--trackings", type=int, default=100)
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp()
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmpdir, 'bench.db')}"
+
+    from app.data.db import init_db
+    from app.core.rank import utcnow, compute_next_due
+    from app.infrastructure.database_repository import Repository
+    from app.infrastructure.history_writer import HistoryWriter
+
+    init_db()
+    repo = Repository()
+    repo.bulk_add_tracking([{"domain": f"d{i}.com", "keyword": "bench"} for i in range(args.trackings)])
+    ids = [tid for tid, _ in repo.list_tracking_schedule()]
+    snapshot = json.dumps([{"position": i, "title": "t", "href": "https://example.com", "snippet": "s"} for i in range(10)])
+
+    start = time.perf_counter()
+    for i in range(args.rows):
+        repo.add_rank_history(ids[i % len(ids)], i % 100, snapshot)
+    elapsed = time.perf_counter() - start
+    print(json.dumps({"mode": "per_row_commit", "rows": args.rows, "seconds": round(elapsed, 3),
+                      "rows_per_sec": round(args.rows / elapsed)}))
+
+    start = time.perf_counter()
+    with HistoryWriter() as writer:
+        for i in range(args.rows):
+            now = utcnow()
+            writer.add(ids[i % len(ids)], i % 100, snapshot, now, compute_next_due(now, "daily"))
+    elapsed = time.perf_counter() - start
+    print(json.dumps({"mode": "history_writer", "rows": args.rows, "seconds": round(elapsed, 3),
+                      "rows_per_sec": round(args.rows / elapsed), "flushes": writer.flushes}))
+
+
+if __name__ == "__main__":
+    main()
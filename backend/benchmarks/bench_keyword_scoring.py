@@ -0,0 +1,70 @@
+"""
+Keyword metrics: scalar score_keyword loop vs vectorized score_keywords, and a
+full-table rescore after a heuristic change.
+
+    cd backend && python benchmarks/bench_keyword_scoring.py --keywords 1000000
+
+Checks that both paths agree exactly, then runs KeywordResearchService.rescore_all
+against a throwaway SQLite file. Prints one JSON line per measurement.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+WORDS = ["seo", "tool", "free", "best", "how", "to", "rank", "tracker", "keyword", "research", "vs", "2024",
+         "cheap", "online", "api", "python", "guide", "for", "beginners", "review"]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--keywords", type=int, default=1000000)
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp()
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmpdir, 'bench.db')}"
+
+    from sqlalchemy import insert
+    from app.core import keyword_metrics
+    from app.data import models
+    from app.data.db import init_db
+    from app.infrastructure.database_repository import Repository
+    from app.services.keyword_research_service import KeywordResearchService
+
+    rnd = random.Random(7)
+    keywords = list({" ".join(rnd.choice(WORDS) for _ in range(rnd.randint(1, 6))) + f" {i}" for i in range(args.keywords)})
+    positions = [rnd.randint(0, 14) for _ in keywords]
+
+    start = time.perf_counter()
+    scalar = [keyword_metrics.score_keyword(k, p) for k, p in zip(keywords, positions)]
+    scalar_opp = [keyword_metrics.opportunity(v, d) for v, d in scalar]
+    scalar_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    volumes, difficulties, opportunities = keyword_metrics.score_keywords(keywords, positions)
+    vector_s = time.perf_counter() - start
+
+    same = all(s == (v, d) for s, v, d in zip(scalar, volumes.tolist(), difficulties.tolist())) \
+        and scalar_opp == opportunities.tolist()
+    print(json.dumps({"keywords": len(keywords), "scalar_seconds": round(scalar_s, 2),
+                      "vector_seconds": round(vector_s, 2), "identical": same}))
+
+    init_db()
+    with Repository() as repo:
+        rows = [{"text": k, "estimated_volume": int(v), "difficulty": int(d), "suggest_position": p}
+                for k, p, v, d in zip(keywords, positions, volumes, difficulties)]
+        for i in range(0, len(rows), 50000):
+            repo._session.execute(insert(models.Keyword), rows[i:i + 50000])
+        repo.commit()
+
+        keyword_metrics.BASE_VOLUME = 60000  # "tuned" heuristic
+        print(json.dumps({"mode": "rescore_all", **KeywordResearchService(repo).rescore_all()}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Successful rank checks out of a fixed SerpApi budget. A fake SerpApi (patched
+HTTP client) answers "run out of searches" once `--budget` calls were made.
+Two rounds of checks (every tracking due each round), with and without the
+quota manager configured:
+
+- unmanaged: no SERPAPI_DAILY_QUOTA; checks run until the provider refuses,
+  and the rest are recorded as errors.
+- managed: SERPAPI_DAILY_QUOTA=budget; due checks are admitted by priority
+  and the rest deferred to the next reset instead of failing.
+
+Search depth follows the previous position in both (second round mostly
+asks for num=10/30). Cache is cleared between rounds so every round pays.
+
+    cd backend && python benchmarks/bench_quota.py --keywords 300 --domains 3 --budget 400
+
+Runs against a throwaway SQLite file and prints one JSON line per mode/round.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import zlib
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+class FakeResponse:
+    def __init__(self, status_code, body):
+        self.status_code = status_code
+        self._body = body
+
+    def json(self):
+        return self._body
+
+
+class FakeSerpApi:
+    def __init__(self, budget):
+        self.budget = budget
+        self.calls = 0
+        self.refused = 0
+        self.depths = Counter()
+
+    def get(self, url, params=None, timeout=None, retry_statuses=None, **kw):
+        if self.calls >= self.budget:
+            self.refused += 1
+            return FakeResponse(200, {"error": "Your account has run out of searches."})
+        self.calls += 1
+        num = params["num"]
+        self.depths[num] += 1
+        seed = zlib.crc32(params["q"].encode())
+        return FakeResponse(200, {"organic_results": [
+            {"position": i + 1, "title": f"r{i}", "link": f"https://site{(seed + i * 7) % 120}.com/page", "snippet": "s"}
+            for i in range(num)
+        ]})
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--keywords", type=int, default=300)
+    parser.add_argument("--domains", type=int, default=3, help="trackings per keyword")
+    parser.add_argument("--budget", type=int, default=400, help="provider calls the plan allows")
+    parser.add_argument("--priority-share", type=float, default=0.1, help="fraction of trackings with priority 1")
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp()
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmpdir, 'bench.db')}"
+    os.environ["SERP_API_KEY"] = "bench"
+    os.environ["SERPAPI_RATE_PER_SEC"] = "0"
+
+    from sqlalchemy import delete, func, update
+    from app.core.rank import utcnow
+    from app.data import models
+    from app.data.db import init_db
+    from app.infrastructure import quota, scraper_google
+    from app.infrastructure.database_repository import Repository
+    from app.services.rank_tracker_service import RankTrackerService
+
+    init_db()
+    with Repository() as repo:
+        repo.bulk_add_tracking([{"domain": f"site{(k * 13 + d * 41) % 120}.com", "keyword": f"keyword {k}"}
+                                for k in range(args.keywords) for d in range(args.domains)])
+        n = len(repo.list_tracking())
+        repo._session.execute(update(models.TrackingKeyword)
+                              .where(models.TrackingKeyword.id % int(1 / args.priority_share) == 0).values(priority=1))
+        repo.commit()
+
+    for mode in ("unmanaged", "managed"):
+        provider = FakeSerpApi(args.budget)
+        scraper_google.get_http_client = lambda: provider
+        quota._quotas["serpapi"] = quota.ProviderQuota("serpapi", daily=args.budget if mode == "managed" else None)
+        with Repository() as repo:
+            repo._session.execute(delete(models.RankHistory))
+            repo._session.execute(delete(models.ProviderUsage))
+            repo._session.execute(update(models.TrackingKeyword).values(
+                next_due_at=utcnow(), last_checked_at=None, last_position=None))
+            repo.commit()
+
+        for rnd in (1, 2):
+            scraper_google.serp_cache.clear()
+            provider.depths.clear()
+            with Repository() as repo:
+                # Each round gets a fresh day of budget
+                provider.calls = provider.refused = 0
+                repo._session.execute(delete(models.ProviderUsage))
+                repo._session.execute(update(models.TrackingKeyword).values(next_due_at=utcnow()))
+                repo.commit()
+                quota._quotas["serpapi"]._exhausted_until = None
+                quota._quotas["serpapi"]._loaded_at = float("-inf")
+                history_before = repo._session.query(func.count(models.RankHistory.id)).scalar()
+                RankTrackerService(repo, concurrency=1).run_all_tracking_once()
+                rh = models.RankHistory
+                rows = repo._session.query(rh.serp_snapshot, models.TrackingKeyword.priority)\
+                    .join(models.TrackingKeyword, models.TrackingKeyword.id == rh.tracking_id)\
+                    .order_by(rh.id).offset(history_before).all()
+                ok = [p for snap, p in rows if snap is None]
+                print(json.dumps({
+                    "mode": mode, "round": rnd, "trackings": n, "budget": args.budget,
+                    "provider_calls": provider.calls, "refused_calls": provider.refused,
+                    "successful_checks": len(ok), "failed_checks": len(rows) - len(ok),
+                    "priority_checks_ok": sum(1 for p in ok if p), "deferred": n - len(rows),
+                    "depths": dict(provider.depths),
+                }))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+/queries/add + /queries/recent per search, as the UI calls them: the old
+recent_queries table (insert + DELETE NOT IN per add, a select per read) vs the ring buffer with write-through slots.
+
+    cd backend && python benchmarks/bench_recent_queries.py --searches 2000
+
+Runs against a throwaway SQLite file and prints one JSON line per mode, with
+the SQL statements issued per search.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--searches", type=int, default=2000)
+    parser.add_argument("--sessions", type=int, default=50, help="distinct X-Session-ID values in the new mode")
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp()
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmpdir, 'bench.db')}"
+
+    from sqlalchemy import event, text
+    from app.data import db
+    from app.data.db import init_db, get_async_sessionmaker
+    from app.infrastructure.async_repository import AsyncRepository
+    from app.infrastructure.recent_queries import recent_queries
+
+    init_db()
+    get_async_sessionmaker()
+    statements = Counter()
+    event.listen(db._async_engine.sync_engine, "before_cursor_execute",
+                 lambda conn, cursor, stmt, *a: statements.update([stmt.split()[0].upper()]))
+
+    async def old_mode():
+        # The previous AsyncRepository.add_recent_query / get_recent_queries, in plain SQL
+        async with db._async_engine.begin() as conn:
+            await conn.execute(text("CREATE TABLE IF NOT EXISTS old_recent_queries (id INTEGER PRIMARY KEY, query TEXT, "
+                                    "location TEXT, results_count TEXT, created_at DATETIME DEFAULT CURRENT_TIMESTAMP)"))
+        for i in range(args.searches):
+            async with get_async_sessionmaker()() as session:
+                await session.execute(text("INSERT INTO old_recent_queries (query, location, results_count) "
+                                           "VALUES (:q, 'Global', '0')"), {"q": f"query {i}"})
+                await session.execute(text("DELETE FROM old_recent_queries WHERE id NOT IN (SELECT id FROM "
+                                           "old_recent_queries ORDER BY created_at DESC, id DESC LIMIT 5)"))
+                await session.commit()
+            async with get_async_sessionmaker()() as session:
+                await session.execute(text("SELECT * FROM old_recent_queries ORDER BY created_at DESC LIMIT 5"))
+
+    async def new_mode():
+        # What the two route handlers do, one request-scoped session each
+        for i in range(args.searches):
+            owner = f"s{i % args.sessions}"
+            async with get_async_sessionmaker()() as session:
+                await recent_queries.add(AsyncRepository(session), owner, f"query {i}", "Global", "0")
+            async with get_async_sessionmaker()() as session:
+                await recent_queries.recent_json(AsyncRepository(session), owner)
+
+    for mode, run in (("old_table", old_mode), ("ring_buffer", new_mode)):
+        statements.clear()
+        start = time.perf_counter()
+        asyncio.run(run())
+        seconds = time.perf_counter() - start
+        print(json.dumps({"mode": mode, "searches": args.searches, "seconds": round(seconds, 3),
+                          "searches_per_sec": round(args.searches / seconds, 1),
+                          "statements_per_search": {k: round(v / args.searches, 2) for k, v in statements.items()}}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Parse time and peak memory per SERP parser backend.
+
+    cd backend && python benchmarks/bench_serp_parser.py [--pages 20] [--rounds 5]
+
+Each backend runs in its own subprocess so peak RSS is not shared between
+them. Prints one JSON line per backend.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, ".."))
+sys.path.insert(0, HERE)
+
+
+def run_backend(backend: str, pages: int, rounds: int) -> dict:
+    from app.infrastructure.serp_parser import parse_serp_page
+    from serp_fixtures import load_serp_pages
+
+    corpus = load_serp_pages(pages)
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    parse_serp_page(corpus[0], 0, backend)  # warm-up / import
+
+    tracemalloc.start()
+    timings = []
+    results = 0
+    for _ in range(rounds):
+        for html in corpus:
+            t = time.perf_counter()
+            results += len(parse_serp_page(html, 0, backend))
+            timings.append(time.perf_counter() - t)
+    _, py_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    timings.sort()
+    return {
+        "backend": backend,
+        "pages": len(timings),
+        "avg_page_kb": round(sum(len(p) for p in corpus) / len(corpus) / 1024, 1),
+        "results_per_page": round(results / len(timings), 2),
+        "ms_per_page_avg": round(sum(timings) / len(timings) * 1000, 3),
+        "ms_per_page_p50": round(timings[len(timings) // 2] * 1000, 3),
+        "ms_per_page_p99": round(timings[min(len(timings) - 1, int(len(timings) * 0.99))] * 1000, 3),
+        "peak_python_alloc_kb": py_peak // 1024,
+        # ru_maxrss is KiB on Linux; includes libxml2/lexbor allocations tracemalloc can't see
+        "peak_rss_growth_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--backend", help="run a single backend in-process")
+    args = parser.parse_args()
+
+    if args.backend:
+        print(json.dumps(run_backend(args.backend, args.pages, args.rounds)))
+        return
+
+    from app.infrastructure.serp_parser import available_backends
+
+    for backend in available_backends():
+        out = subprocess.run(
+            [sys.executable, __file__, "--backend", backend, "--pages", str(args.pages), "--rounds", str(args.rounds)],
+            capture_output=True, text=True, check=True,
+        )
+        print(out.stdout.strip())
+
+
+if __name__ == "__main__":
+    main()
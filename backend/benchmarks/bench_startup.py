@@ -0,0 +1,87 @@
+"""
+API cold start: CPU time to import main and to run the startup hooks, and
+peak RSS, each measured in a fresh interpreter (median of --runs; CPU time
+because wall time is too noisy on shared machines). Modes:
+
+- full: APP_ROLE=all with auto-migrate, the default
+- lean: APP_ROLE=api, DB_AUTO_MIGRATE=false (schema migrated beforehand)
+
+Also lists which of the deferred modules (bs4, requests, apscheduler) got
+imported. --app-dir points at another checkout's backend/ to measure it the
+same way, e.g. the previous commit as a baseline:
+
+    cd backend && python benchmarks/bench_startup.py --runs 7
+    git worktree add /tmp/base HEAD~1 && python benchmarks/bench_startup.py --app-dir /tmp/base/backend --modes full
+
+Prints one JSON line per mode.
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+MODES = {
+    "full": {"APP_ROLE": "all", "DB_AUTO_MIGRATE": "true"},
+    "lean": {"APP_ROLE": "api", "DB_AUTO_MIGRATE": "false"},
+}
+DEFERRED = ("bs4", "requests", "apscheduler")
+
+_CHILD = """
+import json, resource, sys, time
+start = time.process_time()
+import main
+imported = time.process_time()
+for handler in main.app.router.on_startup:
+    handler()
+started = time.process_time()
+loaded = [m for m in %r if m in sys.modules]
+for handler in main.app.router.on_shutdown:
+    handler()
+print(json.dumps({"import_s": imported - start, "startup_s": started - imported,
+                  "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, "modules": len(sys.modules),
+                  "deferred_loaded": loaded}))
+""" % (DEFERRED,)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--modes", default=",".join(MODES))
+    parser.add_argument("--app-dir", default=os.path.join(os.path.dirname(__file__), ".."))
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp()
+    db_path = os.path.join(tmpdir, "bench.db")
+    # Migrated up front, as the explicit deploy step would
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{db_path}", LOG_LEVEL="WARNING")
+    subprocess.run([sys.executable, "-c", "from app.data.db import init_db; init_db()"],
+                   cwd=args.app_dir, env=env, check=True)
+
+    try:
+        for mode in args.modes.split(","):
+            samples = []
+            for _ in range(args.runs):
+                out = subprocess.run([sys.executable, "-c", _CHILD], cwd=args.app_dir, env=dict(env, **MODES[mode]),
+                                     check=True, capture_output=True, text=True).stdout
+                samples.append(json.loads(out.strip().splitlines()[-1]))
+            print(json.dumps({
+                "mode": mode, "app_dir": os.path.abspath(args.app_dir), "runs": args.runs,
+                "import_ms": round(statistics.median(s["import_s"] for s in samples) * 1000, 1),
+                "startup_ms": round(statistics.median(s["startup_s"] for s in samples) * 1000, 1),
+                "total_ms": round(statistics.median(s["import_s"] + s["startup_s"] for s in samples) * 1000, 1),
+                "peak_rss_mb": round(statistics.median(s["rss_mb"] for s in samples), 1),
+                "modules": samples[-1]["modules"],
+                "deferred_loaded": samples[-1]["deferred_loaded"],
+            }))
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
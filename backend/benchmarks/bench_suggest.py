@@ -0,0 +1,85 @@
+"""
+Keyword suggestion pipeline against a fake upstream with fixed latency:
+cold vs cached /keywords/suggest, concurrent identical seeds (coalesced), and
+/keywords/suggest/batch.
+
+    cd backend && python benchmarks/bench_suggest.py --latency 0.2 --seeds 20
+
+Runs against a throwaway SQLite file and prints one JSON line per mode.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds per upstream call")
+    parser.add_argument("--seeds", type=int, default=20)
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp()
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmpdir, 'bench.db')}"
+
+    from fastapi.testclient import TestClient
+    from app.data.db import init_db
+    from app.infrastructure import scraper_google
+    from app.api.keyword_routes import router
+
+    calls = []
+    calls_lock = threading.Lock()
+
+    def fake_fetch(seed):
+        with calls_lock:
+            calls.append(seed)
+        time.sleep(args.latency)
+        return [f"{seed} {suffix}" for suffix in ("tutorial", "pricing", "vs", "alternatives", "review",
+                                                  "free", "login", "api", "download", "examples")]
+
+    scraper_google._fetch_autosuggests = fake_fetch
+    init_db()
+
+    from fastapi import FastAPI
+    app = FastAPI()
+    app.include_router(router, prefix="/keywords")
+    client = TestClient(app)
+    seeds = [f"seed {i}" for i in range(args.seeds)]
+
+    def report(mode, start, requests):
+        print(json.dumps({"mode": mode, "requests": requests, "upstream_calls": len(calls),
+                          "seconds": round(time.perf_counter() - start, 3)}))
+        calls.clear()
+
+    start = time.perf_counter()
+    for seed in seeds:
+        client.post("/keywords/suggest", json={"seed": seed}).raise_for_status()
+    report("sequential_cold", start, len(seeds))
+
+    start = time.perf_counter()
+    for seed in seeds:
+        client.post("/keywords/suggest", json={"seed": seed}).raise_for_status()
+    report("sequential_cached", start, len(seeds))
+
+    scraper_google.suggest_cache.clear()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=20) as pool:
+        list(pool.map(lambda _: client.post("/keywords/suggest", json={"seed": "same seed"}).raise_for_status(),
+                      range(20)))
+    report("concurrent_same_seed", start, 20)
+
+    scraper_google.suggest_cache.clear()
+    start = time.perf_counter()
+    client.post("/keywords/suggest/batch", json={"seeds": seeds}).raise_for_status()
+    report("batch_cold", start, 1)
+    print(json.dumps({"suggest_cache": client.get("/keywords/suggest-cache").json()}))
+
+
+if __name__ == "__main__":
+    main()
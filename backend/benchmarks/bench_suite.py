@@ -0,0 +1,267 @@
+"""
+Offline benchmark suite: the hot paths against a local fake provider
+(fake_provider.py), no network needed. Scenarios:
+
+- tracking:      one run_all_tracking_once over N due trackings (N from
+                 --trackings, e.g. 1000,10000,100000), through SerpApi JSON or
+                 Google HTML (--provider), history rows via the HistoryWriter.
+                 Latency is per SERP fetch (one per keyword group).
+- history_reads: POST /rank/history/batch over hourly history, 200 trackings
+                 per request. Latency is per request.
+- suggest_burst: concurrent suggest_keywords calls over a pool of seeds with
+                 repeats (cold cache), the way a research session hits
+                 /keywords/suggest. Latency is per call.
+
+Each scenario runs in its own process against a throwaway SQLite file, so
+peak RSS is per scenario. Prints one JSON line per scenario (throughput, p50
+and p99 latency in ms, peak RSS in MB); --out also writes them to a file,
+tagged with the current commit, for comparing runs between commits.
+
+    cd backend && python benchmarks/bench_suite.py --trackings 1000,10000 --latency 0.02 --error-rate 0.01
+    cd backend && python benchmarks/bench_suite.py --scenarios tracking --trackings 100000 --out results.jsonl
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+SCENARIOS = ("tracking", "history_reads", "suggest_burst")
+
+
+def percentile(values, p):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def summary(name, ops, seconds, latencies, **extra):
+    result = {
+        "scenario": name,
+        "ops": ops,
+        "seconds": round(seconds, 3),
+        "ops_per_sec": round(ops / seconds, 1) if seconds else None,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2) if latencies else None,
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2) if latencies else None,
+    }
+    result.update(extra)
+    # ru_maxrss is KB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    result["peak_rss_mb"] = round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+    return result
+
+
+class Timer:
+    def __init__(self):
+        self.latencies = []
+        self._lock = threading.Lock()
+
+    def wrap(self, fn):
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self.latencies.append(time.perf_counter() - start)
+        return timed
+
+
+def seed_trackings(repo, n, per_keyword, sites=200):
+    from app.data.bulk import chunked
+    rows = [{"domain": f"site{(i * 37) % sites}.com", "keyword": f"keyword {i // per_keyword}"} for i in range(n)]
+    for chunk in chunked(rows, 5000):
+        repo.bulk_add_tracking(chunk, commit=False)
+    repo.commit()
+
+
+def run_tracking(args):
+    from sqlalchemy import func
+    from app.data import models
+    from app.infrastructure.database_repository import Repository
+    from app.infrastructure.history_writer import HistoryWriter
+    from app.infrastructure.http_client import get_http_client
+    from app.infrastructure.scraper_google import get_serp_positions
+    from app.services.rank_tracker_service import RankTrackerService
+
+    with Repository() as repo:
+        seed_trackings(repo, args.size, args.per_keyword)
+    timer = Timer()
+    writer = HistoryWriter()
+    with Repository() as repo:
+        service = RankTrackerService(repo, get_serp_positions if args.provider == "google" else None,
+                                     concurrency=args.concurrency, history_writer=writer)
+        service._fetch_group = timer.wrap(service._fetch_group)
+        start = time.perf_counter()
+        checks = service.run_all_tracking_once()
+        writer.close()
+        seconds = time.perf_counter() - start
+        recorded = repo._session.query(func.count(models.RankHistory.id)).scalar()
+    http = get_http_client().stats.snapshot()
+    return summary(f"tracking_{args.size}", checks, seconds, timer.latencies, provider=args.provider,
+                   history_rows=recorded, provider_requests=http["requests"], retries=http["retries"],
+                   failures=http["failures"])
+
+
+def run_history_reads(args):
+    import asyncio
+    import httpx
+    from datetime import timedelta
+    from sqlalchemy import insert
+    from app.core.rank import utcnow
+    from app.data import models
+    from app.infrastructure.database_repository import Repository
+    from main import app
+
+    now = utcnow()
+    with Repository() as repo:
+        seed_trackings(repo, args.size, 1)
+        ids = [tid for tid, _ in repo.list_tracking_schedule()]
+        rows = [{"tracking_id": tid, "position": (h + tid) % 40 or None, "checked_at": now - timedelta(hours=h)}
+                for h in range(args.days * 24) for tid in ids]
+        for i in range(0, len(rows), 20000):
+            repo._session.execute(insert(models.RankHistory), rows[i:i + 20000])
+        repo.commit()
+    batches = [ids[i:i + 200] for i in range(0, len(ids), 200)] * args.repeat
+    start_param = (now - timedelta(days=args.days)).isoformat()
+    latencies = []
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            sem = asyncio.Semaphore(args.concurrency)
+
+            async def one(batch):
+                async with sem:
+                    t = time.perf_counter()
+                    resp = await client.post("/rank/history/batch", json={"tracking_ids": batch, "from": start_param,
+                                                                           "granularity": "raw"})
+                    resp.raise_for_status()
+                    latencies.append(time.perf_counter() - t)
+                    return len(resp.json()["points"]["position"])
+
+            return sum(await asyncio.gather(*(one(b) for b in batches)))
+
+    start = time.perf_counter()
+    points = asyncio.run(run())
+    seconds = time.perf_counter() - start
+    return summary("history_reads", len(batches), seconds, latencies, history_rows=len(rows), points=points,
+                   points_per_sec=round(points / seconds, 1))
+
+
+def run_suggest_burst(args):
+    from app.infrastructure.database_repository import Repository
+    from app.infrastructure.http_client import get_http_client
+    from app.services.keyword_research_service import KeywordResearchService
+
+    seeds = [f"seed {i % args.size}" for i in range(args.size * args.repeat)]
+    timer = Timer()
+
+    @timer.wrap
+    def one(seed):
+        with Repository() as repo:
+            return len(KeywordResearchService(repo).suggest_keywords(seed))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        suggestions = sum(pool.map(one, seeds))
+    seconds = time.perf_counter() - start
+    return summary("suggest_burst", len(seeds), seconds, timer.latencies, unique_seeds=args.size,
+                   suggestions=suggestions, provider_requests=get_http_client().stats.snapshot()["requests"])
+
+
+def child(args):
+    from app.data.db import init_db
+    init_db()
+    run = {"tracking": run_tracking, "history_reads": run_history_reads, "suggest_burst": run_suggest_burst}
+    print(json.dumps(run[args.child](args)))
+
+
+def commit_id():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(__file__)).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--trackings", default="1000,10000", help="comma-separated sizes for the tracking scenario")
+    parser.add_argument("--per-keyword", type=int, default=3, help="trackings sharing each keyword")
+    parser.add_argument("--provider", choices=("serpapi", "google"), default="serpapi")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--history-trackings", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=7, help="days of hourly history for history_reads")
+    parser.add_argument("--seeds", type=int, default=500, help="distinct seeds for suggest_burst")
+    parser.add_argument("--repeat", type=int, default=4, help="times each history batch / seed is requested")
+    parser.add_argument("--latency", type=float, default=0.01, help="fake provider latency, seconds")
+    parser.add_argument("--jitter", type=float, default=0.01)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of provider requests failing with 503")
+    parser.add_argument("--out", help="append result lines to this file")
+    parser.add_argument("--verbose", action="store_true", help="show the app's output")
+    parser.add_argument("--child", choices=SCENARIOS, help=argparse.SUPPRESS)
+    parser.add_argument("--size", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        return child(args)
+
+    from fake_provider import FakeProvider
+
+    provider = FakeProvider(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate).start()
+    runs = []
+    for scenario in args.scenarios.split(","):
+        if scenario == "tracking":
+            runs += [(scenario, int(n)) for n in args.trackings.split(",")]
+        elif scenario == "history_reads":
+            runs.append((scenario, args.history_trackings))
+        elif scenario == "suggest_burst":
+            runs.append((scenario, args.seeds))
+        else:
+            parser.error(f"unknown scenario {scenario}")
+
+    common = ["--per-keyword", str(args.per_keyword), "--provider", args.provider,
+              "--concurrency", str(args.concurrency), "--days", str(args.days), "--repeat", str(args.repeat)]
+    commit = commit_id()
+    results = []
+    try:
+        for scenario, size in runs:
+            tmpdir = tempfile.mkdtemp()
+            env = dict(os.environ, **provider.env(),
+                       DATABASE_URL=f"sqlite:///{os.path.join(tmpdir, 'bench.db')}",
+                       SERP_API_KEY="bench", SERPAPI_RATE_PER_SEC="0", GOOGLE_RATE_PER_SEC="0",
+                       HTTP_BACKOFF_BASE="0.05")
+            for name in ("SERPAPI_DAILY_QUOTA", "SERPAPI_MONTHLY_QUOTA", "GOOGLE_DAILY_QUOTA", "GOOGLE_MONTHLY_QUOTA"):
+                env.pop(name, None)
+            before = sum(provider.requests.values())
+            proc = subprocess.run([sys.executable, __file__, "--child", scenario, "--size", str(size)] + common,
+                                  env=env, stdout=subprocess.PIPE, stderr=None if args.verbose else subprocess.DEVNULL,
+                                  text=True)
+            if proc.returncode != 0:
+                result = {"scenario": scenario, "size": size, "error": f"exit status {proc.returncode}"}
+            else:
+                result = json.loads(proc.stdout.strip().splitlines()[-1])
+            result.update(commit=commit, latency=args.latency, error_rate=args.error_rate,
+                          server_requests=sum(provider.requests.values()) - before)
+            print(json.dumps(result), flush=True)
+            results.append(result)
+    finally:
+        provider.stop()
+    if args.out:
+        with open(args.out, "a") as f:
+            for result in results:
+                f.write(json.dumps(result) + "\n")
+
+
+if __name__ == "__main__":
+    main()
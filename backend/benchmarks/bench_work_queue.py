@@ -0,0 +1,124 @@
+"""
+Rank check queue throughput by worker process count, against a fake provider
+with fixed latency, plus a crashed-worker case (claims a batch and never
+completes it) to check lease expiry.
+
+    cd backend && python benchmarks/bench_work_queue.py --trackings 2000 --latency 0.05 --processes 1 2 4
+
+Runs against a throwaway SQLite file (all trackings made due again before each
+run) and prints one JSON line per run; every tracking must end up with exactly
+one history row and the queue empty.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+def fake_scraper(keyword, domain, max_pages=1, previous_position=None):
+    time.sleep(float(os.environ["BENCH_LATENCY"]))
+    return {"position": len(keyword) % 10 + 1, "items": [{"position": 1, "href": f"https://{domain}/", "title": keyword}]}
+
+
+def _worker(db_url, concurrency, claim_size, lease_seconds):
+    os.environ["DATABASE_URL"] = db_url
+    from app.infrastructure import work_queue
+    work_queue.LEASE_SECONDS = lease_seconds
+    work_queue.POLL_SECONDS = 0.2
+    stop = threading.Event()
+    idle_since = [None]
+
+    # Stop once the queue has stayed empty for a while (longer than a lease)
+    while not stop.is_set():
+        if work_queue.work_once(work_queue.process_name(), fake_scraper, concurrency, claim_size):
+            idle_since[0] = None
+            continue
+        idle_since[0] = idle_since[0] or time.monotonic()
+        if time.monotonic() - idle_since[0] > 1.0 + lease_seconds:
+            stop.set()
+        stop.wait(work_queue.POLL_SECONDS)
+
+
+def run(args, db_url, processes, crash):
+    from sqlalchemy import delete, text, update
+    from app.core.rank import utcnow
+    from app.data import models
+    from app.infrastructure.database_repository import Repository
+    from app.infrastructure import work_queue
+    with Repository() as repo:
+        repo._session.execute(delete(models.RankHistory))
+        repo._session.execute(delete(models.RankCheckJob))
+        repo._session.execute(update(models.TrackingKeyword).values(next_due_at=utcnow(), last_checked_at=None))
+        repo.commit()
+    queued = work_queue.enqueue_due(holder="bench", scraper=fake_scraper)
+    with Repository() as repo:
+        if crash:
+            # A worker that claims a batch and dies: its jobs come back after the lease
+            repo.claim_checks("crashed", args.claim_size, args.lease)
+    # The producer running again must not queue anything twice
+    queued += work_queue.enqueue_due(holder="bench", scraper=fake_scraper)
+
+    ctx = multiprocessing.get_context("spawn")
+    start = time.perf_counter()
+    procs = [ctx.Process(target=_worker, args=(db_url, args.concurrency, args.claim_size, args.lease))
+             for _ in range(processes)]
+    for p in procs:
+        p.start()
+    # Timed until the queue drains; the workers linger a little before exiting
+    while True:
+        with Repository() as repo:
+            if repo.queue_stats()["queued"] == 0:
+                break
+        time.sleep(0.05)
+    elapsed = time.perf_counter() - start
+    for p in procs:
+        p.join()
+
+    with Repository() as repo:
+        counts = dict(repo._session.execute(
+            text("SELECT tracking_id, COUNT(*) FROM rank_history GROUP BY tracking_id")
+        ).all())
+        stats = repo.queue_stats()
+        print(json.dumps({
+            "processes": processes, "concurrency": args.concurrency, "crashed_worker": crash,
+            "trackings": args.trackings, "queued": queued, "checks_recorded": sum(counts.values()),
+            "exactly_once": len(counts) == args.trackings and set(counts.values()) == {1},
+            "queue_left": stats["queued"], "seconds": round(elapsed, 2),
+            "checks_per_sec": round(sum(counts.values()) / elapsed, 1),
+        }))
+        if work_queue.enqueue_due(holder="bench", scraper=fake_scraper) != 0:
+            print(json.dumps({"error": "checked trackings were queued again"}))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--trackings", type=int, default=2000)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per fake provider call")
+    parser.add_argument("--concurrency", type=int, default=8, help="checks in flight per worker process")
+    parser.add_argument("--claim-size", type=int, default=32)
+    parser.add_argument("--lease", type=float, default=2.0, help="lease seconds (short, so the crash case recovers fast)")
+    parser.add_argument("--processes", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args()
+    os.environ["BENCH_LATENCY"] = str(args.latency)
+    db_url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    os.environ["DATABASE_URL"] = db_url
+
+    from app.data.db import init_db
+    from app.infrastructure.database_repository import Repository
+    init_db()
+    with Repository() as repo:
+        repo.bulk_add_tracking([{"domain": f"d{i}.com", "keyword": f"kw {i}"} for i in range(args.trackings)])
+
+    for n in args.processes:
+        run(args, db_url, n, crash=False)
+    run(args, db_url, max(args.processes), crash=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""
+Local stand-in for the providers the scrapers call, so benchmarks run with no
+network:
+
+- /search.json        SerpApi-shaped JSON (organic_results, honours num/start)
+- /search             Google results HTML (saved pages from benchmarks/fixtures/serp
+                      or generated ones, see serp_fixtures.py)
+- /complete/search    Google Suggest JSON (["seed", [suggestions...]])
+
+Results are deterministic per query. Every response waits `latency` seconds
+(plus up to `jitter`), and a fraction `error_rate` of requests gets a 503
+(which the HTTP client retries) so backoff paths are exercised too.
+
+Standalone, for poking at the app by hand:
+
+    cd backend && python benchmarks/fake_provider.py --port 8765 --latency 0.05
+
+prints the env vars that point the scrapers at it.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+import zlib
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from serp_fixtures import load_serp_pages  # noqa: E402
+
+SITES = 200
+
+
+def serpapi_results(q: str, num: int, start: int = 0):
+    seed = zlib.crc32(q.encode())
+    return [{"position": start + i + 1, "title": f"{q} result {start + i + 1}",
+             "link": f"https://{'www.' if i % 3 == 0 else ''}site{(seed + (start + i) * 7) % SITES}.com/p/{start + i}",
+             "snippet": f"About {q}"}
+            for i in range(num)]
+
+
+def suggestions(q: str, n: int = 10):
+    return [f"{q} {w}" for w in ("best", "free", "online", "tool", "price", "review",
+                                 "near me", "vs", "guide", "2024")[:n]]
+
+
+class FakeProvider:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0, jitter: float = 0.0,
+                 error_rate: float = 0.0, seed: int = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.requests = Counter()
+        self.errors = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._pages = None
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def env(self) -> dict:
+        """Env vars that point the scrapers at this server."""
+        return {
+            "SERPAPI_URL": f"{self.url}/search.json",
+            "GOOGLE_SEARCH_URL": f"{self.url}/search",
+            "SUGGEST_URL": f"{self.url}/complete/search",
+        }
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-provider", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _html(self, q: str, start: int) -> str:
+        if self._pages is None:
+            self._pages = load_serp_pages()
+        return self._pages[zlib.crc32(f"{q}:{start}".encode()) % len(self._pages)]
+
+    def _respond(self, path: str, params: dict):
+        """(status, content type, body) for one request."""
+        with self._lock:
+            self.requests[path] += 1
+            fail = self.error_rate and self._rng.random() < self.error_rate
+            delay = self.latency + (self._rng.uniform(0, self.jitter) if self.jitter else 0)
+            if fail:
+                self.errors += 1
+        if delay:
+            time.sleep(delay)
+        if fail:
+            return 503, "text/plain", b"unavailable"
+        q = params.get("q", [""])[0]
+        if path == "/search.json":
+            num = int(params.get("num", ["10"])[0])
+            start = int(params.get("start", ["0"])[0])
+            body = {"search_metadata": {"status": "Success"}, "organic_results": serpapi_results(q, num, start)}
+            return 200, "application/json", json.dumps(body).encode()
+        if path == "/search":
+            return 200, "text/html; charset=utf-8", self._html(q, int(params.get("start", ["0"])[0])).encode()
+        if path == "/complete/search":
+            return 200, "application/json", json.dumps([q, suggestions(q)]).encode()
+        return 404, "text/plain", b"not found"
+
+    def _handler(self):
+        provider = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # Keep-alive, like the real providers, so the client's pool is exercised
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                parts = urlsplit(self.path)
+                status, content_type, body = provider._respond(parts.path, parse_qs(parts.query))
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="up to this many extra seconds, uniform")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    args = parser.parse_args()
+
+    provider = FakeProvider(args.host, args.port, args.latency, args.jitter, args.error_rate).start()
+    for name, value in provider.env().items():
+        print(f"export {name}={value}")
+    try:
+        while True:
+            time.sleep(60)
+    except KeyboardInterrupt:
+        provider.stop()
+
+
+if __name__ == "__main__":
+    main()
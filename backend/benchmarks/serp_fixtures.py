@@ -0,0 +1,58 @@
+"""
+SERP HTML fixtures for benchmarks.
+
+Saved Google pages dropped into benchmarks/fixtures/serp/*.html are used as-is.
+When there are none, Google-shaped pages are generated: a large head of inline
+CSS/JS, 10 `div.g` result blocks with the nesting real pages use, and sidebar
+noise, so parse cost is in the same range as a live results page.
+"""
+import glob
+import os
+import random
+from typing import List
+
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), "fixtures", "serp")
+
+_WORDS = ("seo rank tracker keyword research tool best free online guide review "
+          "price compare analytics search engine results marketing content").split()
+
+
+def _text(rng: random.Random, n: int) -> str:
+    return " ".join(rng.choice(_WORDS) for _ in range(n))
+
+
+def make_serp_html(keyword: str, start: int = 0, results: int = 10, seed: int = 0) -> str:
+    rng = random.Random(f"{keyword}:{start}:{seed}")
+    head = "".join(
+        f"<style>.c{i}{{margin:{i}px;padding:{i % 7}px;font:13px arial}}</style>"
+        f"<script>window.__d{i}={{a:{i},b:'{_text(rng, 12)}'}};</script>"
+        for i in range(600)
+    )
+    blocks = []
+    for i in range(results):
+        domain = f"{rng.choice(_WORDS)}{rng.randint(1, 500)}.com"
+        blocks.append(
+            f'<div class="g Ww4FFb"><div class="N54PNb"><div class="kb0PBd" data-snhf="0">'
+            f'<div class="yuRUbf"><div><span><a jsname="UWckNb" href="https://www.{domain}/{i}/{rng.randint(1, 9999)}" data-ved="x">'
+            f'<h3 class="LC20lb MBeuO DKV0Md">{_text(rng, 8).title()}</h3></a></span>'
+            f'<div class="notranslate"><cite class="tjvcx">https://www.{domain}</cite></div></div></div></div>'
+            f'<div class="kb0PBd" data-sncf="1"><div class="VwiC3b yXK7lf"><span>{_text(rng, 30)}</span></div></div>'
+            + "".join(f'<div class="c{j}"><span>{_text(rng, 4)}</span></div>' for j in range(40))
+            + "</div></div>"
+        )
+    sidebar = "".join(f'<div class="rhs c{j}"><a href="/search?q={j}">{_text(rng, 5)}</a></div>' for j in range(300))
+    return (
+        f"<!doctype html><html><head><title>{keyword} - Google Search</title>{head}</head>"
+        f'<body><div id="search"><div id="rso">{"".join(blocks)}</div></div><div id="rhs">{sidebar}</div></body></html>'
+    )
+
+
+def load_serp_pages(count: int = 20) -> List[str]:
+    saved = sorted(glob.glob(os.path.join(FIXTURE_DIR, "*.html")))
+    if saved:
+        pages = []
+        for path in saved:
+            with open(path, encoding="utf-8", errors="replace") as f:
+                pages.append(f.read())
+        return pages
+    return [make_serp_html(f"keyword {i}", start=(i % 3) * 10, seed=i) for i in range(count)]
@@ -1,22 +1,56 @@
-from fastapi import FastAPI
+"""
+API entry point (uvicorn main:app).
+
+APP_ROLE picks what the process runs besides the API:
+
+- all (default): the scheduler too (maintenance jobs, and rank checks or the
+  queue producer, see RANK_CHECK_MODE)
+- api: requests only, for autoscaled/serverless instances. Run the scheduler
+  once elsewhere with `python worker.py --scheduler`. Pair it with
+  RANK_CHECK_MODE=queue: in inline mode the API can't wake that scheduler, so
+  new or edited trackings wait for its next resync (SCHEDULER_RESYNC_SECONDS).
+
+Startup also runs create_all + migrations unless DB_AUTO_MIGRATE=false, in
+which case run `python manage.py migrate` as a deploy step. The scrapers'
+parsers, requests and APScheduler are imported on first use, not here.
+"""
+import logging
+import os
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
+from app.infrastructure.log_config import configure_logging
 from app.api.keyword_routes import router as keyword_router
 from app.api.rank_routes import router as rank_router
 from app.api.query_routes import router as query_router
 
+configure_logging()
+logger = logging.getLogger("main")
+
+APP_ROLE = os.getenv("APP_ROLE", "all").lower()
+
 app = FastAPI(
     title="SEO Keyword Research & Rank Tracker API",
     version="1.0.0"
 )
 
-from app.infrastructure.scheduler import start_scheduler
+from app.infrastructure.scheduler import start_scheduler, stop_scheduler
+from app.data.db import AUTO_MIGRATE, init_db
 
 @app.on_event("startup")
 def on_startup():
-    print(f"Allowed origins: {origins}")
-    start_scheduler()
+    logger.info("Allowed origins: %s", origins)
+    logger.info("Role: %s", APP_ROLE)
+    if AUTO_MIGRATE:
+        init_db()
+    if APP_ROLE != "api":
+        start_scheduler()
+
+@app.on_event("shutdown")
+def on_shutdown():
+    from app.infrastructure.history_writer import flush_history_writer
+    stop_scheduler()
+    flush_history_writer()
 
-import os
 origins = [
     "http://localhost:3000",
     "http://127.0.0.1:3000",
@@ -34,6 +68,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Pagination cursor and history granularity are returned as headers
+    expose_headers=["X-Next-Cursor", "X-History-Granularity"],
 )
 
 app.include_router(keyword_router, prefix="/keywords", tags=["Keyword Research"])
@@ -44,13 +80,23 @@ app.include_router(query_router, prefix="/queries", tags=["Query Management"])
 def root():
     return {"message": "SEO Keyword & Rank Tracker API is running! (v1.1)"}
 
+@app.get("/metrics")
+def metrics_endpoint():
+    """Prometheus text format; see app/infrastructure/metrics.py for what is measured."""
+    from app.infrastructure import metrics
+    from app.infrastructure.quota import PROVIDERS, get_quota
+    for provider in PROVIDERS:
+        available = get_quota(provider).available()
+        if available is not None:
+            metrics.quota_available.set(available, provider=provider)
+    return Response(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
 @app.post("/test-run-tracking")
 def test_run_tracking():
     """Manually trigger rank tracking for all keywords (for testing)"""
     from app.services.rank_tracker_service import RankTrackerService
     from app.infrastructure.database_repository import Repository
     
-    repo = Repository()
-    service = RankTrackerService(repo)
-    service.run_all_tracking_once()
+    with Repository() as repo:
+        RankTrackerService(repo).run_all_tracking_once()
     return {"message": "Rank tracking executed"}
@@ -0,0 +1,36 @@
+"""
+One-off maintenance commands, run from backend/ against DATABASE_URL:
+
+    python manage.py migrate    # create missing tables and apply pending migrations
+
+Deployments that set DB_AUTO_MIGRATE=false (see main.py) run `migrate` once
+per release instead of on every API/worker start.
+"""
+import argparse
+import logging
+import time
+
+from app.data.db import init_db
+from app.infrastructure.log_config import configure_logging
+
+logger = logging.getLogger("manage")
+
+
+def migrate(_args):
+    start = time.perf_counter()
+    init_db()
+    logger.info("Database is up to date (%.2fs)", time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintenance commands")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("migrate", help="run create_all and pending migrations").set_defaults(func=migrate)
+    args = parser.parse_args()
+
+    configure_logging()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Shared fixtures. The app reads DATABASE_URL at import, so it is pointed at a
+throwaway SQLite file before anything from app/ is imported.
+
+    cd backend && python -m pytest -q
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+_tmpdir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmpdir, 'test.db')}"
+# No pacing between provider calls in tests
+for _provider in ("TEST", "GOOGLE", "SERPAPI"):
+    os.environ[f"{_provider}_RATE_PER_SEC"] = "0"
+
+from app.data.db import Base, get_engine, init_db  # noqa: E402
+
+init_db()
+
+
+@pytest.fixture(autouse=True)
+def clean_db():
+    yield
+    from app.infrastructure import quota, snapshot_store
+
+    with get_engine().begin() as conn:
+        for table in reversed(Base.metadata.sorted_tables):
+            conn.execute(table.delete())
+    # Ids get reused once their rows are gone
+    snapshot_store._id_cache.clear()
+    quota._quotas.clear()
+
+
+@pytest.fixture
+def repo():
+    from app.infrastructure.database_repository import Repository
+
+    with Repository() as r:
+        yield r
+
+
+@pytest.fixture
+def client():
+    # Startup hooks (migrations, scheduler) are not run: the schema is already there
+    from fastapi.testclient import TestClient
+    from main import app
+
+    return TestClient(app)
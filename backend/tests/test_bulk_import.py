@@ -0,0 +1,42 @@
+import pytest
+
+from app.data import models
+
+
+@pytest.mark.parametrize("body", [5, "abc", {"items": "abc"}, [{"domain": "a.com", "keyword": "x"}, 3]])
+def test_payload_must_be_a_list_of_objects(client, repo, body):
+    resp = client.post("/rank/track/bulk", json=body)
+    assert resp.status_code == 400
+    assert resp.json()["detail"]["inserted"] == 0
+    assert repo._session.query(models.TrackingKeyword).count() == 0
+
+
+def test_rows_are_validated_and_deduplicated(client, repo):
+    resp = client.post("/rank/track/bulk", json={"items": [
+        {"domain": "a.com", "keyword": "shoes"},
+        {"domain": "a.com", "keyword": "shoes"},
+        {"domain": "a.com", "keyword": "boots", "frequency": "Weekly"},
+        {"domain": "a.com", "keyword": "socks", "frequency": "fortnightly"},
+        {"domain": "a.com", "keyword": 7},
+        {"keyword": "hats"},
+    ]})
+    assert resp.json() == {"received": 6, "inserted": 2, "duplicates": 1, "invalid": 3}
+    frequencies = dict(repo._session.query(models.TrackingKeyword.keyword, models.TrackingKeyword.frequency))
+    assert frequencies == {"shoes": "daily", "boots": "weekly"}
+
+
+def test_malformed_stream_reports_rows_already_committed(client, monkeypatch):
+    from app.api import rank_routes
+
+    monkeypatch.setattr(rank_routes, "BULK_CHUNK_SIZE", 2)
+    body = "\n".join(['{"domain": "a.com", "keyword": "k%d"}' % i for i in range(3)] + ["{not json"])
+    resp = client.post("/rank/track/bulk", content=body, headers={"content-type": "application/x-ndjson"})
+    assert resp.status_code == 400
+    assert resp.json()["detail"]["inserted"] == 2
+    assert resp.json()["detail"]["received"] == 3
+
+
+def test_csv_import(client, repo):
+    body = "domain,keyword,frequency\na.com,shoes,hourly\nb.com,boots\n"
+    resp = client.post("/rank/track/bulk", content=body, headers={"content-type": "text/csv"})
+    assert resp.json()["inserted"] == 2
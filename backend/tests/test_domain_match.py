@@ -0,0 +1,81 @@
+import pytest
+
+from app.core.domain_match import DomainMatcher, normalize_domain, result_host
+
+
+@pytest.mark.parametrize("given, expected", [
+    ("example.com", "example.com"),
+    ("https://www.Example.com/path?q=1", "example.com"),
+    ("  WWW.example.com. ", "example.com"),
+    ("shop.example.co.uk", "shop.example.co.uk"),
+])
+def test_normalize_domain(given, expected):
+    assert normalize_domain(given) == expected
+
+
+@pytest.mark.parametrize("href, host", [
+    ("https://Blog.Example.com:443/a", "blog.example.com"),
+    ("/url?q=https://www.example.com/x&sa=U", "www.example.com"),
+    ("https://user@example.com/", "example.com"),
+    ("", None),
+])
+def test_result_host(href, host):
+    assert result_host(href) == host
+
+
+@pytest.mark.parametrize("href, matches", [
+    ("https://example.com/", ["example.com"]),
+    ("https://www.example.com/", ["example.com"]),
+    ("https://deep.blog.example.com/", ["example.com"]),
+    ("https://notexample.com/", []),
+    ("https://example.com.evil.net/", []),
+    ("https://example.org/", []),
+])
+def test_suffix_matching(href, matches):
+    assert DomainMatcher(["example.com"]).match(href) == matches
+
+
+def test_nested_domains_and_spellings_all_match():
+    matcher = DomainMatcher(["example.com", "https://www.example.com", "blog.example.com"])
+    assert sorted(matcher.match("https://blog.example.com/post")) == ["blog.example.com", "example.com",
+                                                                       "https://www.example.com"]
+
+
+def test_positions_continue_across_pages_and_stop_when_complete():
+    matcher = DomainMatcher(["a.com", "b.com"])
+    page1 = [{"position": 1, "href": "https://x.com/"}, {"position": 2, "href": "https://www.a.com/"},
+             {"position": 3, "href": "https://a.com/again"}]
+    found = matcher.positions(page1)
+    assert found == {"a.com": 2}
+    assert not matcher.complete(found)
+    page2 = [{"position": 11, "href": "https://shop.b.com/"}, {"position": 12, "href": None}]
+    assert matcher.positions(page2, found) == {"a.com": 2, "b.com": 11}
+    assert matcher.complete(found)
+
+
+def test_trackings_of_one_keyword_share_one_fetch(repo, monkeypatch):
+    from app.infrastructure import scraper_google
+    from app.services.rank_tracker_service import RankTrackerService
+
+    calls = []
+
+    class Response:
+        status_code = 200
+
+        def json(self):
+            return {"organic_results": [{"position": 1, "link": "https://a.com/"},
+                                        {"position": 2, "link": "https://blog.b.com/"}]}
+
+    class Client:
+        def get(self, url, params=None, **kwargs):
+            calls.append(params["q"])
+            return Response()
+
+    monkeypatch.setenv("SERP_API_KEY", "test")
+    monkeypatch.setattr(scraper_google, "get_http_client", lambda: Client())
+    scraper_google.serp_cache.clear()
+
+    trackings = [repo.add_tracking_keyword(d, "shoes") for d in ("a.com", "b.com", "c.com")]
+    assert RankTrackerService(repo, concurrency=1).check_many(trackings) == 3
+    assert calls == ["shoes"]
+    assert [t.last_position for t in trackings] == [1, 2, None]
@@ -0,0 +1,42 @@
+from datetime import datetime, timedelta, timezone
+
+from app.core.rank import compute_next_due, utcnow
+from app.infrastructure.database_repository import Repository
+
+
+def _due_ids(now=None, limit=None):
+    with Repository() as r:
+        return [t.id for t in r.list_due_tracking(now=now, limit=limit)]
+
+
+def test_new_trackings_are_due_and_checked_ones_wait_for_their_interval(repo):
+    hourly = repo.add_tracking_keyword("example.com", "shoes", "hourly")
+    daily = repo.add_tracking_keyword("example.com", "boots", "daily")
+    assert set(_due_ids()) == {hourly.id, daily.id}
+
+    repo.add_rank_history(hourly.id, 3, items=[])
+    repo.add_rank_history(daily.id, 5, items=[])
+    now = utcnow()
+    assert _due_ids(now) == []
+    # First re-check: interval plus a spread offset of at most 10% of it
+    assert _due_ids(now + timedelta(minutes=67)) == [hourly.id]
+    assert _due_ids(now + timedelta(days=1, hours=2)) == [hourly.id, daily.id]
+
+
+def test_due_trackings_come_oldest_first_and_respect_the_limit(repo):
+    ids = [repo.add_tracking_keyword("example.com", f"k{i}").id for i in range(3)]
+    now = utcnow()
+    repo.defer_trackings({ids[0]: now - timedelta(minutes=1), ids[1]: now - timedelta(minutes=30),
+                          ids[2]: now + timedelta(minutes=5)})
+    assert _due_ids(now) == [ids[1], ids[0]]
+    assert _due_ids(now, limit=1) == [ids[1]]
+
+
+def test_next_due_stays_on_its_slot():
+    slot = datetime(2026, 1, 1, 12, tzinfo=timezone.utc)
+    # Checked late: the next slot is still one interval after the previous one
+    assert compute_next_due(slot + timedelta(minutes=7), "hourly", 1, slot) == slot + timedelta(hours=1)
+    # Down for a while: missed slots are skipped, not replayed
+    assert compute_next_due(slot + timedelta(hours=3, minutes=1), "hourly", 1, slot) == slot + timedelta(hours=4)
+    # Never checked: due now
+    assert compute_next_due(None, "daily") <= utcnow()
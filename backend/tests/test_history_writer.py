@@ -0,0 +1,44 @@
+from datetime import timedelta
+
+from app.core.rank import utcnow
+from app.data import models
+from app.infrastructure.database_repository import Repository
+from app.infrastructure.history_writer import HistoryWriter
+
+
+def _add(writer, tracking_id, position=1):
+    now = utcnow()
+    writer.add(tracking_id, position, None, now, now + timedelta(days=1))
+
+
+def test_rows_of_deleted_trackings_are_skipped(repo):
+    kept = repo.add_tracking_keyword("example.com", "shoes")
+    gone = repo.add_tracking_keyword("example.com", "boots")
+    with HistoryWriter(max_interval=60) as writer:
+        _add(writer, kept.id)
+        _add(writer, gone.id)
+        repo.delete_tracking(gone.id)
+        assert writer.flush() == 1
+    assert [h.tracking_id for h in repo._session.query(models.RankHistory)] == [kept.id]
+
+
+def test_failing_rows_are_dropped_after_max_attempts(repo):
+    tk = repo.add_tracking_keyword("example.com", "shoes")
+
+    class Broken:
+        def __enter__(self):
+            raise RuntimeError("database is down")
+
+        def __exit__(self, *exc):
+            return False
+
+    writer = HistoryWriter(repo_factory=Broken, max_interval=60, max_attempts=3)
+    _add(writer, tk.id)
+    for _ in range(3):
+        assert writer.flush() == 0
+    assert writer.rows_dropped == 1
+    # Nothing left to retry, and later rows go through once the database is back
+    writer._repo_factory = Repository
+    _add(writer, tk.id)
+    assert writer.flush() == 1
+    writer.close()
@@ -0,0 +1,43 @@
+import asyncio
+
+from app.infrastructure import http_client, scraper_google
+
+
+def test_async_client_is_per_event_loop():
+    async def client():
+        return http_client.get_async_http_client(), http_client.get_async_http_client()
+
+    first, same = asyncio.run(client())
+    second, _ = asyncio.run(client())
+    assert first is same
+    assert first is not second
+
+
+class _Response:
+    status_code = 200
+
+    def __init__(self, body):
+        self._body = body
+
+    def json(self):
+        return self._body
+
+
+def test_compare_fetches_serpapi_asynchronously(client, monkeypatch):
+    calls = []
+
+    class AsyncClient:
+        async def get(self, url, params=None, **kwargs):
+            calls.append(params["num"])
+            return _Response({"organic_results": [
+                {"position": 1, "link": "https://www.rival.com/", "title": "Rival"},
+                {"position": 2, "link": "https://shop.example.com/x", "title": "Us"},
+            ]})
+
+    monkeypatch.setenv("SERP_API_KEY", "test")
+    monkeypatch.setattr(scraper_google, "get_async_http_client", lambda: AsyncClient())
+    scraper_google.serp_cache.clear()
+
+    resp = client.post("/rank/compare", json={"keyword": "running shoes", "domains": ["example.com", "rival.com", "none.com"]})
+    assert resp.json()["positions"] == {"example.com": 2, "rival.com": 1, "none.com": None}
+    assert calls == [scraper_google.SERPAPI_DEPTHS[-1]]
@@ -0,0 +1,54 @@
+import threading
+
+import requests
+
+from app.data import models
+from app.infrastructure.database_repository import Repository
+from app.services import keyword_expansion_service
+from app.services.keyword_expansion_service import KeywordExpansionService, seed_queries
+
+
+def _fake_suggests(monkeypatch, failing=()):
+    def get_autosuggests(query, limit=10):
+        if query in failing:
+            raise requests.ConnectionError("connection reset")
+        return [f"{query} {i}" for i in range(2)][:limit]
+
+    monkeypatch.setattr(keyword_expansion_service, "get_autosuggests", get_autosuggests)
+
+
+def test_network_errors_are_counted_and_skipped(repo, monkeypatch):
+    seed = seed_queries("shoes")
+    _fake_suggests(monkeypatch, failing={seed[1], seed[2]})
+    job_id = repo.create_expansion_job("shoes", max_depth=2, budget=10 ** 4).id
+
+    assert KeywordExpansionService(concurrency=4, chunk=8).run(job_id) == "done"
+    with Repository() as r:
+        job = r.get_expansion_job(job_id)
+        assert job.failed_calls == 2
+        # Level 1 queries, then two suggestions for each that answered
+        assert job.calls_made == len(seed) + 2 * (len(seed) - 2)
+        assert len(r.get_expansion_visited(job_id)) == job.calls_made
+
+
+def test_paused_job_resumes_without_refetching(repo, monkeypatch):
+    _fake_suggests(monkeypatch)
+    job_id = repo.create_expansion_job("shoes", max_depth=3, budget=10 ** 4).id
+    stop = threading.Event()
+    calls = []
+    fetch = keyword_expansion_service.get_autosuggests
+
+    def counting(query, limit=10):
+        calls.append(query)
+        if len(calls) >= 20:
+            stop.set()
+        return fetch(query, limit)
+
+    monkeypatch.setattr(keyword_expansion_service, "get_autosuggests", counting)
+    assert KeywordExpansionService(concurrency=1, chunk=10).run(job_id, stop) == "paused"
+    assert KeywordExpansionService(concurrency=1, chunk=10).run(job_id) == "done"
+
+    assert len(calls) == len(set(calls))
+    with Repository() as r:
+        assert r.get_expansion_job(job_id).calls_made == len(calls)
+        assert r._session.query(models.ExpansionVisited).filter_by(job_id=job_id).count() == len(calls)
@@ -0,0 +1,44 @@
+import random
+import sys
+
+import pytest
+
+from app.core.keyword_metrics import opportunity, score_keyword, score_keywords
+
+WORDS = "seo rank tracker best free how to buy cheap shoes running near me 2026 vs review api ünïcode 中文".split()
+
+
+def _sample(n=3000):
+    rng = random.Random(42)
+    keywords = [" ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 7))) for _ in range(n)]
+    return keywords, [rng.randint(0, 30) for _ in range(n)]
+
+
+def _expected(keywords, positions):
+    scored = [score_keyword(k, p) for k, p in zip(keywords, positions)]
+    return [v for v, _ in scored], [d for _, d in scored], [opportunity(v, d) for v, d in scored]
+
+
+def test_vectorized_scores_match_the_scalar_ones():
+    keywords, positions = _sample()
+    volumes, difficulties, opportunities = score_keywords(keywords, positions)
+    assert (volumes.tolist(), difficulties.tolist(), opportunities.tolist()) == _expected(keywords, positions)
+
+
+def test_fallback_without_numpy_matches(monkeypatch):
+    monkeypatch.setitem(sys.modules, "numpy", None)
+    keywords, positions = _sample(200)
+    assert list(score_keywords(keywords, positions)) == list(_expected(keywords, positions))
+
+
+def test_positions_default_to_zero_and_empty_input():
+    volumes, difficulties, _ = score_keywords(["rank tracker"])
+    assert (int(volumes[0]), int(difficulties[0])) == score_keyword("rank tracker", 0)
+    assert [len(x) for x in score_keywords([])] == [0, 0, 0]
+
+
+def test_keyword_without_words_fails_like_the_scalar_version():
+    with pytest.raises(ZeroDivisionError):
+        score_keyword("  ", 0)
+    with pytest.raises(ZeroDivisionError):
+        score_keywords(["ok", "  "])
@@ -0,0 +1,55 @@
+import json
+from datetime import timedelta
+
+from app.core.rank import utcnow
+
+
+def _pages(client, url, **params):
+    pages, cursor = [], None
+    while True:
+        resp = client.get(url, params=dict(params, **({"cursor": cursor} if cursor else {})))
+        assert resp.status_code == 200
+        pages.append(resp.json())
+        cursor = resp.headers.get("X-Next-Cursor")
+        if not cursor:
+            return pages
+
+
+def test_list_pages_follow_the_cursor(client, repo):
+    ids = [repo.add_tracking_keyword("example.com", f"k{i}").id for i in range(5)]
+    pages = _pages(client, "/rank/list", limit=2)
+    assert [len(p) for p in pages] == [2, 2, 1]
+    assert [row["id"] for p in pages for row in p] == ids
+
+
+def test_list_without_limit_streams_everything(client, repo):
+    ids = [repo.add_tracking_keyword("example.com", f"k{i}").id for i in range(3)]
+    assert [row["id"] for row in client.get("/rank/list").json()] == ids
+    lines = client.get("/rank/list", params={"format": "ndjson"}).text.splitlines()
+    assert [json.loads(line)["id"] for line in lines] == ids
+
+
+def test_history_paging_does_not_skip_rows_with_the_same_timestamp(client, repo):
+    tk = repo.add_tracking_keyword("example.com", "shoes")
+    now = utcnow()
+    # Pairs of rows share a checked_at, so the cursor has to break ties by id
+    times = [now - timedelta(minutes=i // 2) for i in range(7)]
+    repo.bulk_add_rank_history([{"tracking_id": tk.id, "position": i + 1, "serp_snapshot": None, "checked_at": at,
+                                 "next_due_at": now, "items": []} for i, at in enumerate(times)])
+
+    pages = _pages(client, f"/rank/history/{tk.id}", limit=2, fields="position,checked_at")
+    rows = [row for p in pages for row in p]
+    assert sorted(row["position"] for row in rows) == list(range(1, 8))
+    assert [row["checked_at"] for row in rows] == sorted((row["checked_at"] for row in rows), reverse=True)
+    assert set(rows[0]) == {"position", "checked_at"}
+
+
+def test_history_defaults_and_bad_input(client, repo):
+    tk = repo.add_tracking_keyword("example.com", "shoes")
+    repo.add_rank_history(tk.id, 3, items=[{"position": 1, "href": "https://a.com/", "title": "a"}])
+    resp = client.get(f"/rank/history/{tk.id}")
+    assert set(resp.json()[0]) == {"id", "position", "checked_at", "serp_snapshot"}
+    assert resp.headers["X-History-Granularity"] == "raw"
+
+    assert client.get(f"/rank/history/{tk.id}", params={"cursor": "not-a-cursor"}).status_code == 400
+    assert client.get(f"/rank/history/{tk.id}", params={"fields": "position,secret"}).status_code == 400
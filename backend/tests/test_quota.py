@@ -0,0 +1,111 @@
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.infrastructure import quota as quota_module
+from app.infrastructure.quota import ProviderQuota
+
+
+@pytest.fixture(autouse=True)
+def immediate_usage(monkeypatch):
+    # Flush every call and re-read on every check, as if several processes shared the counters
+    monkeypatch.setattr(quota_module, "FLUSH_CALLS", 1)
+    monkeypatch.setattr(quota_module, "REFRESH_SECONDS", 0)
+
+
+def test_daily_quota_is_exhausted():
+    quota = ProviderQuota("test", daily=2)
+    for _ in range(2):
+        assert quota.acquire()
+        quota.record()
+    assert quota.available() == 0
+    assert not quota.acquire()
+
+
+def test_usage_is_shared_between_processes():
+    first, second = ProviderQuota("test", daily=3), ProviderQuota("test", daily=3)
+    first.record(2)
+    assert second.available() == 1
+    second.record()
+    assert first.available() == 0
+
+
+def test_monthly_quota_is_paced_over_the_remaining_days():
+    quota = ProviderQuota("test", monthly=300)
+    # 30 days left in a 31-day month, today included
+    assert quota.available(datetime(2026, 1, 2, 12)) == 10
+
+
+def test_mark_exhausted_blocks_until_tomorrow():
+    quota = ProviderQuota("test")
+    now = datetime(2026, 1, 2, 12)
+    assert quota.available(now) is None
+    quota.mark_exhausted(now)
+    assert quota.available(now + timedelta(hours=11)) == 0
+    assert quota.available(now + timedelta(hours=12)) is None
+
+
+def test_async_acquire_respects_the_quota():
+    import asyncio
+
+    quota = ProviderQuota("test", daily=1)
+
+    async def run():
+        assert await quota.aacquire()
+        quota.record()
+        assert not await quota.aacquire()
+
+    asyncio.run(run())
+
+
+def test_back_off_pauses_calls_without_spending_the_day():
+    quota = ProviderQuota("test", daily=5)
+    quota.back_off(0.05)
+    assert not quota.acquire()
+    assert quota.available() == 5
+    time.sleep(0.1)
+    assert quota.acquire()
+
+
+class _Response:
+    def __init__(self, status_code, text="", headers=None):
+        self.status_code = status_code
+        self.text = text
+        self.headers = headers or {}
+
+
+def _google_answers(monkeypatch, *responses):
+    from app.infrastructure import scraper_google
+
+    answers = list(responses)
+
+    class Client:
+        def get(self, url, **kwargs):
+            return answers.pop(0)
+
+    monkeypatch.setattr(scraper_google, "get_http_client", lambda: Client())
+    scraper_google.serp_cache.clear()
+    return scraper_google
+
+
+def test_google_429_backs_off_and_reports_an_error(monkeypatch):
+    scraper = _google_answers(monkeypatch, _Response(429, headers={"Retry-After": "120"}))
+    res = scraper.get_serp_positions("running shoes", "example.com", max_pages=2)
+    assert res["position"] is None and "error" in res
+
+    quota = quota_module.get_quota("google")
+    assert quota.backing_off()
+    assert quota._exhausted_until is None
+    # Later checks fail fast without calling Google
+    assert "error" in scraper.get_serp_positions("trail shoes", "example.com")
+
+
+def test_failed_later_page_keeps_domains_found_before_it(monkeypatch):
+    page = '<div class="g"><a href="https://www.example.com/a"><h3>A</h3></a></div>'
+    scraper = _google_answers(monkeypatch, _Response(200, page), _Response(503))
+    res = scraper.get_serp_positions_multi("running shoes", ["example.com", "other.com"], max_pages=2)
+    assert res["positions"] == {"example.com": 1}
+    assert "error" in res
+    assert "error" not in scraper._single(res, "example.com")
+    assert "error" in scraper._single(res, "other.com")
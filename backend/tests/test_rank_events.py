@@ -0,0 +1,95 @@
+import threading
+import time
+
+import pytest
+
+from app.core.rank_events import detect_change, serp_fingerprint
+from app.data import models
+from app.infrastructure import event_feed
+from app.infrastructure.database_repository import Repository
+from app.services.rank_tracker_service import RankTrackerService
+
+
+@pytest.mark.parametrize("old, new, old_fp, new_fp, kind", [
+    (None, 4, None, "f1", "entered"),
+    (4, None, "f1", "f1", "dropped"),
+    (4, 7, "f1", "f1", "moved"),
+    (4, 4, "f1", "f2", "serp_changed"),
+    (4, 4, "f1", "f1", None),
+    (None, None, "f1", "f2", "serp_changed"),
+    (None, None, None, "f2", None),
+])
+def test_detect_change(old, new, old_fp, new_fp, kind):
+    assert detect_change(old, new, old_fp, new_fp) == kind
+
+
+def test_small_moves_are_ignored_below_the_threshold():
+    assert detect_change(4, 5, "f", "f", min_delta=3) is None
+    assert detect_change(4, 7, "f", "f", min_delta=3) == "moved"
+
+
+def _items(*hosts):
+    return [{"position": i + 1, "href": f"https://{h}/page"} for i, h in enumerate(hosts)]
+
+
+def test_fingerprint_follows_hosts_in_order():
+    assert serp_fingerprint(_items("a.com", "b.com")) == serp_fingerprint(_items("www.a.com", "b.com"))
+    assert serp_fingerprint(_items("a.com", "b.com")) != serp_fingerprint(_items("b.com", "a.com"))
+    assert serp_fingerprint([]) is None
+
+
+def _checker(repo, results):
+    answers = iter(results)
+    return RankTrackerService(repo, lambda keyword, domain, max_pages=1: next(answers), concurrency=1)
+
+
+def _events(repo):
+    return [(e.kind, e.old_position, e.new_position)
+            for e in repo._session.query(models.RankEvent).order_by(models.RankEvent.id)]
+
+
+def test_events_are_detected_as_checks_are_recorded(repo):
+    tk = repo.add_tracking_keyword("example.com", "shoes")
+    service = _checker(repo, [
+        {"position": 5, "items": _items("a.com", "example.com")},  # baseline
+        {"position": 5, "items": _items("a.com", "example.com")},
+        {"position": None, "items": [], "error": "quota"},         # failed: nothing changes
+        {"position": 2, "items": _items("example.com", "a.com")},
+        {"position": None, "items": _items("a.com", "b.com")},
+    ])
+    for _ in range(5):
+        service.check_many([tk])
+    assert _events(repo) == [("moved", 5, 2), ("dropped", 2, None)]
+
+
+def test_first_check_after_an_edit_is_a_new_baseline(repo):
+    tk = repo.add_tracking_keyword("example.com", "shoes")
+    service = _checker(repo, [{"position": 5, "items": _items("example.com")},
+                              {"position": None, "items": _items("a.com")}])
+    service.check_many([tk])
+    tk = repo.update_tracking(tk.id, "other.com", "shoes", "daily")
+    service.check_many([tk])
+    assert _events(repo) == []
+
+
+def test_long_poll_wakes_up_when_an_event_is_recorded(client, repo, monkeypatch):
+    monkeypatch.setattr(event_feed, "POLL_SECONDS", 30)
+    tk = repo.add_tracking_keyword("example.com", "shoes")
+    repo.add_rank_history(tk.id, 5, items=[])
+
+    def record():
+        time.sleep(0.3)
+        with Repository() as r:
+            r.add_rank_history(tk.id, 1, items=[], event={"kind": "moved", "old_position": 5, "new_position": 1})
+        event_feed.notify()
+
+    resp = client.get("/rank/events", params={"wait": 0})
+    assert resp.json() == {"events": [], "next": 0}
+
+    threading.Thread(target=record).start()
+    start = time.monotonic()
+    resp = client.get("/rank/events", params={"wait": 20})
+    assert time.monotonic() - start < 5
+    body = resp.json()
+    assert [(e["kind"], e["domain"], e["new_position"]) for e in body["events"]] == [("moved", "example.com", 1)]
+    assert client.get("/rank/events", params={"after": body["next"]}).json()["events"] == []
@@ -0,0 +1,61 @@
+import json
+import threading
+import time
+
+from app.data import models
+from app.infrastructure.database_repository import Repository
+from app.infrastructure.rate_limiter import RateLimiter
+from app.services.rank_tracker_service import RankTrackerService
+
+
+def test_injected_scraper_keeps_the_baseline_signature(repo):
+    calls = []
+
+    def scraper(keyword, domain, max_pages=1):
+        calls.append((keyword, domain, max_pages))
+        return {"position": 4, "items": []}
+
+    tk = repo.add_tracking_keyword("example.com", "shoes")
+    assert RankTrackerService(repo, scraper).check_many([tk]) == 1
+    assert calls == [("shoes", "example.com", 3)]
+    with Repository() as other:
+        assert other.get_tracking_by_id(tk.id).last_position == 4
+
+
+def test_checks_run_concurrently_and_a_failure_is_recorded_as_an_error(repo):
+    in_flight, peak, lock = [0], [0], threading.Lock()
+
+    def scraper(keyword, domain, max_pages=1):
+        with lock:
+            in_flight[0] += 1
+            peak[0] = max(peak[0], in_flight[0])
+        time.sleep(0.05)
+        with lock:
+            in_flight[0] -= 1
+        if keyword == "broken":
+            raise RuntimeError("parser exploded")
+        return {"position": 1, "items": []}
+
+    trackings = [repo.add_tracking_keyword("example.com", f"k{i}") for i in range(7)]
+    trackings.append(repo.add_tracking_keyword("example.com", "broken"))
+    assert RankTrackerService(repo, scraper, concurrency=4).check_many(trackings) == 8
+    assert peak[0] == 4
+
+    snapshots = dict(repo._session.query(models.RankHistory.tracking_id, models.RankHistory.serp_snapshot))
+    assert json.loads(snapshots[trackings[-1].id]) == {"error": "parser exploded"}
+    assert all(snapshots[t.id] is None for t in trackings[:-1])
+    # Every row, the failed one included, moved on to its next slot
+    with Repository() as other:
+        assert other.list_due_tracking() == []
+
+
+def test_rate_limiter_paces_concurrent_callers():
+    limiter = RateLimiter(rate=50, burst=1)
+    start = time.monotonic()
+    threads = [threading.Thread(target=limiter.acquire) for _ in range(11)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(5)
+    # One token up front, then 10 more at 50/s
+    assert time.monotonic() - start >= 0.19
@@ -0,0 +1,62 @@
+import asyncio
+
+from sqlalchemy import select
+
+from app.data import models
+from app.data.db import get_async_sessionmaker
+from app.infrastructure.async_repository import AsyncRepository
+from app.infrastructure.recent_queries import RecentQueryStore
+
+
+async def _add(store, owner, query):
+    async with get_async_sessionmaker()() as session:
+        return await store.add(AsyncRepository(session), owner, query, "Global", "0")
+
+
+async def _slots(owner):
+    async with get_async_sessionmaker()() as session:
+        res = await session.execute(select(models.RecentQuerySlot.slot, models.RecentQuerySlot.seq)
+                                    .where(models.RecentQuerySlot.owner == owner))
+        return dict(res.all())
+
+
+def test_adds_wrap_around_the_slots():
+    store = RecentQueryStore(size=3)
+
+    async def run():
+        for i in range(7):
+            await _add(store, "a", f"q{i}")
+        return await _slots("a")
+
+    # seqs 5, 6, 7 survive, each in slot seq % 3
+    assert asyncio.run(run()) == {2: 5, 0: 6, 1: 7}
+    assert [e["query"] for e in store._rings["a"].entries] == ["q6", "q5", "q4"]
+
+
+def test_concurrent_adds_get_distinct_slots():
+    store = RecentQueryStore(size=5)
+
+    async def run():
+        entries = await asyncio.gather(*(_add(store, "", f"q{i}") for i in range(5)))
+        return entries, await _slots("")
+
+    entries, slots = asyncio.run(run())
+    assert sorted(e["id"] for e in entries) == [1, 2, 3, 4, 5]
+    assert sorted(slots.values()) == [1, 2, 3, 4, 5]
+    assert [e["id"] for e in store._rings[""].entries] == [5, 4, 3, 2, 1]
+
+
+def test_ring_reloads_from_the_table():
+    async def run():
+        first = RecentQueryStore(size=3)
+        for i in range(4):
+            await _add(first, "a", f"q{i}")
+        await _add(first, "b", "other")
+        # A fresh process picks up where the table left off
+        second = RecentQueryStore(size=3)
+        entry = await _add(second, "a", "q4")
+        return entry, second
+
+    entry, second = asyncio.run(run())
+    assert entry["id"] == 5
+    assert [e["query"] for e in second._rings["a"].entries] == ["q4", "q3", "q2"]
@@ -0,0 +1,74 @@
+from datetime import datetime, timedelta, timezone
+
+from app.data import models
+
+DAY = datetime(2026, 3, 2, tzinfo=timezone.utc)  # a Monday
+
+
+def _history(repo, tracking_id, checks):
+    repo.bulk_add_rank_history([
+        {"tracking_id": tracking_id, "position": pos, "serp_snapshot": None, "checked_at": at,
+         "next_due_at": at + timedelta(days=1)}
+        for pos, at in checks
+    ])
+
+
+def _rollup_all(repo, batch_size=3):
+    total = 0
+    while True:
+        n = repo.rollup_history(batch_size=batch_size)
+        if not n:
+            return total
+        total += n
+
+
+def test_rollup_counts(repo):
+    tk = repo.add_tracking_keyword("example.com", "shoes")
+    _history(repo, tk.id, [(3, DAY + timedelta(hours=1)), (None, DAY + timedelta(hours=2)), (7, DAY + timedelta(hours=3)),
+                           (5, DAY + timedelta(days=1, hours=1))])
+
+    assert _rollup_all(repo) == 4
+
+    daily = {b.bucket_start.date(): b for b in repo.get_rollups(tk.id, "daily")}
+    first = daily[DAY.date()]
+    assert (first.checks, first.found, first.min_position, first.max_position, first.sum_position) == (3, 2, 3, 7, 10)
+    assert first.last_position == 7
+    assert daily[(DAY + timedelta(days=1)).date()].checks == 1
+
+    (week,) = repo.get_rollups(tk.id, "weekly")
+    assert (week.checks, week.found, week.min_position, week.max_position, week.last_position) == (4, 3, 3, 7, 5)
+
+
+def test_rollup_is_idempotent(repo):
+    tk = repo.add_tracking_keyword("example.com", "shoes")
+    _history(repo, tk.id, [(i + 1, DAY + timedelta(hours=i)) for i in range(5)])
+
+    assert _rollup_all(repo) == 5
+    assert _rollup_all(repo) == 0
+    assert sum(b.checks for b in repo.get_rollups(tk.id, "daily")) == 5
+    assert sum(b.checks for b in repo.get_rollups(tk.id, "weekly")) == 5
+
+
+def test_late_rows_merge_into_existing_buckets(repo):
+    tk = repo.add_tracking_keyword("example.com", "shoes")
+    _history(repo, tk.id, [(4, DAY + timedelta(hours=5))])
+    _rollup_all(repo)
+    # Written after the rollup ran, but checked earlier that day
+    _history(repo, tk.id, [(2, DAY + timedelta(hours=1))])
+
+    assert _rollup_all(repo) == 1
+    (day,) = repo.get_rollups(tk.id, "daily")
+    assert (day.checks, day.min_position, day.max_position) == (2, 2, 4)
+    assert day.last_position == 4
+
+
+def test_only_rolled_up_history_is_deleted(repo):
+    tk = repo.add_tracking_keyword("example.com", "shoes")
+    _history(repo, tk.id, [(1, DAY), (2, DAY + timedelta(hours=1))])
+    _rollup_all(repo)
+    _history(repo, tk.id, [(3, DAY + timedelta(hours=2))])
+
+    assert repo.delete_rolled_up_history(DAY + timedelta(days=1), pause=0) == 2
+    remaining = repo._session.query(models.RankHistory).all()
+    assert [r.position for r in remaining] == [3]
+    assert not remaining[0].rolled_up
@@ -0,0 +1,83 @@
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from app.infrastructure import scheduler
+from app.infrastructure.scheduler import TrackingScheduler
+
+
+def _at(seconds):
+    return datetime.now(timezone.utc) + timedelta(seconds=seconds)
+
+
+def _scheduler(run_checks=None, rows=()):
+    sched = TrackingScheduler(run_checks or (lambda ids: {}), lambda: list(rows))
+    sched._next_resync = time.monotonic() + 3600
+    return sched
+
+
+def test_stale_and_removed_entries_are_skipped():
+    sched = _scheduler()
+    sched.schedule(1, _at(-10))
+    sched.schedule(1, _at(3600))  # rescheduled: the first heap entry is now stale
+    sched.schedule(2, _at(-5))
+    sched.schedule(3, _at(-1))
+    sched.remove(3)
+    assert sched._take_due() == [2]
+    assert sched._due == {1: sched._due[1]}
+
+
+def test_due_entries_are_popped_in_batches_in_due_order(monkeypatch):
+    monkeypatch.setattr(scheduler, "BATCH_SIZE", 2)
+    sched = _scheduler()
+    for tid, offset in ((1, -1), (2, -30), (3, -20), (4, 3600)):
+        sched.schedule(tid, _at(offset))
+    assert sched._take_due() == [2, 3]
+    assert sched._take_due() == [1]
+    assert list(sched._due) == [4]
+
+
+def test_rebuild_loads_the_schedule():
+    sched = _scheduler(rows=[(1, _at(-1)), (2, _at(3600))])
+    sched.rebuild()
+    assert sched._take_due() == [1]
+
+
+def _run_one_batch(sched, ran):
+    sched.start()
+    assert ran.wait(5)
+    # Let the loop push the batch's next due times
+    deadline = time.monotonic() + 5
+    while 7 not in sched._due and time.monotonic() < deadline:
+        time.sleep(0.01)
+    sched.stop()
+    sched.join(5)
+
+
+def test_checked_rows_are_rescheduled_unless_the_api_got_there_first():
+    ran = threading.Event()
+    next_check, edited = _at(86400), _at(120)
+
+    def run_checks(ids):
+        # The API edits tracking 8 while the batch is in flight
+        sched.schedule(8, edited)
+        ran.set()
+        return {7: next_check, 8: next_check}
+
+    sched = _scheduler(run_checks, rows=[(7, _at(-1)), (8, _at(-1))])
+    _run_one_batch(sched, ran)
+    assert sched._due[7] == next_check.timestamp()
+    assert sched._due[8] == edited.timestamp()
+
+
+def test_failed_batch_is_retried():
+    ran = threading.Event()
+
+    def run_checks(ids):
+        ran.set()
+        raise RuntimeError("provider down")
+
+    sched = _scheduler(run_checks, rows=[(7, _at(-1))])
+    before = time.time()
+    _run_one_batch(sched, ran)
+    assert sched._due[7] >= before + scheduler.RETRY_SECONDS
@@ -0,0 +1,113 @@
+import threading
+import time
+
+from app.infrastructure import scraper_google
+from app.infrastructure.cache import TTLCache
+
+
+def test_hits_misses_and_expiry():
+    cache = TTLCache(maxsize=10, ttl=0.05)
+    cache.set("a", 1)
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    time.sleep(0.06)
+    assert cache.get("a") is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["size"]) == (1, 2, 0)
+
+
+def test_peek_is_not_counted_and_keeps_lru_order():
+    cache = TTLCache(maxsize=2)
+    cache.set("old", 1)
+    cache.set("new", 2)
+    assert cache.peek("old") == 1
+    assert cache.peek("missing", "x") == "x"
+    cache.set("newest", 3)  # evicts "old": the peek did not refresh it
+    assert cache.peek("old") is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"]) == (0, 0, 1)
+
+
+def test_concurrent_misses_share_one_load():
+    cache = TTLCache()
+    started, release = threading.Event(), threading.Event()
+    loads = []
+
+    def loader():
+        loads.append(1)
+        started.set()
+        release.wait(5)
+        return "value"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_load("k", loader))) for _ in range(4)]
+    threads[0].start()
+    started.wait(5)
+    for t in threads[1:]:
+        t.start()
+    while cache.stats()["coalesced"] < 3:
+        time.sleep(0.01)
+    release.set()
+    for t in threads:
+        t.join(5)
+    assert results == ["value"] * 4
+    assert len(loads) == 1
+
+
+def test_failed_loads_are_not_cached():
+    cache = TTLCache()
+
+    def boom():
+        raise RuntimeError("upstream down")
+
+    try:
+        cache.get_or_load("k", boom)
+    except RuntimeError:
+        pass
+    assert cache.get_or_load("k", lambda: 2) == 2
+
+
+def _serpapi_items(keyword, num):
+    return [{"position": i + 1, "href": f"https://site{i}.com/", "title": keyword} for i in range(num)]
+
+
+def test_deeper_cached_serp_answers_a_shallower_lookup_as_one_hit():
+    cache = scraper_google.serp_cache
+    cache.clear()
+    cache.hits = cache.misses = 0
+    deep = scraper_google.SERPAPI_DEPTHS[-1]
+    cache.set(scraper_google._serpapi_key(scraper_google._serpapi_params("shoes", deep)), _serpapi_items("shoes", 3))
+
+    assert scraper_google.serp_cached("serpapi", "shoes")
+    assert not scraper_google.serp_cached("serpapi", "boots")
+    assert (cache.hits, cache.misses) == (0, 0)
+
+    assert scraper_google._serpapi_cached("shoes", scraper_google.SERPAPI_DEPTHS[0]) is not None
+    assert scraper_google._serpapi_cached("boots", scraper_google.SERPAPI_DEPTHS[0]) is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_domains_sharing_a_keyword_share_one_serpapi_call(monkeypatch):
+    calls = []
+
+    class Response:
+        status_code = 200
+
+        def __init__(self, num):
+            self.num = num
+
+        def json(self):
+            return {"organic_results": [{"position": i + 1, "link": f"https://site{i}.com/"} for i in range(self.num)]}
+
+    class Client:
+        def get(self, url, params=None, **kwargs):
+            calls.append(params["q"])
+            return Response(params["num"])
+
+    monkeypatch.setenv("SERP_API_KEY", "test")
+    monkeypatch.setattr(scraper_google, "get_http_client", lambda: Client())
+    scraper_google.serp_cache.clear()
+
+    assert scraper_google.get_serpapi_positions("shoes", "site3.com")["position"] == 4
+    assert scraper_google.get_serpapi_positions("Shoes ", "site7.com")["position"] == 8
+    assert calls == ["shoes"]
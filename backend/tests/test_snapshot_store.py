@@ -0,0 +1,52 @@
+import json
+from array import array
+from datetime import timedelta
+
+from app.core.rank import utcnow
+from app.data import models
+from app.infrastructure import snapshot_store
+from app.infrastructure.database_repository import Repository
+
+
+def _items(prefix, n, start=1):
+    return [{"position": start + i, "title": f"{prefix} {i}", "href": f"https://{prefix}{i}.com/", "snippet": f"about {i}"}
+            for i in range(n)]
+
+
+def test_pack_unpack_round_trip_and_legacy_blobs():
+    pairs = [(1, 10), (2, 2 ** 32 - 1), (0, 7)]
+    blob = snapshot_store.pack_refs(pairs)
+    assert len(blob) == 8 * len(pairs)
+    assert snapshot_store.unpack_refs(blob) == pairs
+    # Blobs written with array("I") before the fixed format still read back
+    assert snapshot_store.unpack_refs(array("I", [1, 10, 2, 20]).tobytes()) == [(1, 10), (2, 20)]
+
+
+def test_intern_round_trip_dedupes_results(repo):
+    first, second = _items("a", 3), _items("a", 2) + _items("b", 1, start=3)
+    session = repo._session
+    blobs = snapshot_store.intern_items(session, [first, second])
+    session.commit()
+    assert session.query(models.SerpResult).count() == 4
+
+    results = snapshot_store.load_results(session, blobs)
+    assert json.loads(snapshot_store.snapshot_json(blobs[0], None, results)) == first
+    assert json.loads(snapshot_store.snapshot_json(blobs[1], None, results)) == second
+    # Error payloads are kept as text
+    assert snapshot_store.snapshot_json(None, '{"error": "quota"}', results) == '{"error": "quota"}'
+
+
+def test_history_rows_read_back_their_own_snapshot(repo):
+    tk = repo.add_tracking_keyword("example.com", "shoes")
+    batches = [_items("a", 3), None, _items("c", 2), []]
+    now = utcnow()
+    rows = [{"tracking_id": tk.id, "position": 1, "checked_at": now + timedelta(seconds=i), "next_due_at": now,
+             "serp_snapshot": None if items is not None else '{"error": "x"}', "items": items}
+            for i, items in enumerate(batches)]
+    repo.bulk_add_rank_history(rows)
+
+    with Repository() as r:
+        histories = sorted(r.get_rank_history_for(tk.id), key=lambda h: h.id)
+        snapshots = r.get_snapshots(histories)
+    assert [json.loads(snapshots[h.id]) for h in histories] == [batches[0], {"error": "x"}, batches[2], []]
+
@@ -0,0 +1,76 @@
+from datetime import timedelta
+
+from app.core.rank import utcnow
+from app.data import models
+
+
+def _queue(repo, n=3):
+    trackings = [repo.add_tracking_keyword(f"site{i}.com", f"keyword {i}") for i in range(n)]
+    repo.enqueue_checks(trackings)
+    return [t.id for t in trackings]
+
+
+def _result(tracking_id, position=1):
+    now = utcnow()
+    return {"tracking_id": tracking_id, "position": position, "serp_snapshot": None, "checked_at": now,
+            "next_due_at": now + timedelta(days=1), "items": [{"position": 1, "href": "https://a.com/", "title": "a"}]}
+
+
+def test_claimed_jobs_are_invisible_until_the_lease_expires(repo):
+    ids = _queue(repo)
+    now = utcnow()
+    token, claimed = repo.claim_checks("a", 10, lease_seconds=60, now=now)
+    assert sorted(t.id for t, _ in claimed) == sorted(ids)
+    assert all(attempts == 1 for _, attempts in claimed)
+
+    assert repo.claim_checks("b", 10, lease_seconds=60, now=now + timedelta(seconds=30))[1] == []
+
+    token_b, reclaimed = repo.claim_checks("b", 10, lease_seconds=60, now=now + timedelta(seconds=61))
+    assert token_b != token
+    assert sorted(t.id for t, _ in reclaimed) == sorted(ids)
+    assert all(attempts == 2 for _, attempts in reclaimed)
+
+
+def test_claim_respects_the_limit(repo):
+    _queue(repo, 5)
+    now = utcnow()
+    first = repo.claim_checks("a", 2, lease_seconds=60, now=now)[1]
+    second = repo.claim_checks("b", 10, lease_seconds=60, now=now)[1]
+    assert len(first) == 2
+    assert len(second) == 3
+    assert not {t.id for t, _ in first} & {t.id for t, _ in second}
+
+
+def test_results_of_a_lost_lease_are_dropped(repo):
+    ids = _queue(repo)
+    now = utcnow()
+    stale_token, _ = repo.claim_checks("a", 10, lease_seconds=60, now=now)
+    token, _ = repo.claim_checks("b", 10, lease_seconds=60, now=now + timedelta(seconds=61))
+
+    assert repo.complete_checks(stale_token, [_result(tid) for tid in ids]) == 0
+    assert repo.complete_checks(token, [_result(tid) for tid in ids]) == len(ids)
+    assert repo._session.query(models.RankHistory).count() == len(ids)
+    assert repo._session.query(models.RankCheckJob).count() == 0
+
+
+def test_double_completion_records_once(repo):
+    ids = _queue(repo)
+    token, _ = repo.claim_checks("a", 10, lease_seconds=60)
+
+    assert repo.complete_checks(token, [_result(tid) for tid in ids]) == len(ids)
+    assert repo.complete_checks(token, [_result(tid) for tid in ids]) == 0
+    assert repo._session.query(models.RankHistory).count() == len(ids)
+
+
+def test_enqueue_skips_already_queued_trackings(repo):
+    ids = _queue(repo)
+    repo.enqueue_checks([repo.get_tracking_by_id(tid) for tid in ids])
+    assert repo._session.query(models.RankCheckJob).count() == len(ids)
+
+
+def test_producer_lease_has_one_holder(repo):
+    now = utcnow()
+    assert repo.acquire_lease("producer", "a", 30, now=now)
+    assert not repo.acquire_lease("producer", "b", 30, now=now + timedelta(seconds=10))
+    assert repo.acquire_lease("producer", "a", 30, now=now + timedelta(seconds=10))
+    assert repo.acquire_lease("producer", "b", 30, now=now + timedelta(seconds=41))
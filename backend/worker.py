@@ -0,0 +1,95 @@
+"""
+Rank check worker. Consumes the queue that the API fills when started with
+RANK_CHECK_MODE=queue (see app/infrastructure/work_queue.py). Start as many as
+needed, on any machine that shares DATABASE_URL:
+
+    python worker.py --processes 4 --concurrency 8 --metrics-port 9100
+
+With --metrics-port, process i serves Prometheus metrics on port + i.
+
+With --scheduler this process also runs the scheduler (maintenance jobs, plus
+the queue producer or, in inline mode, the rank checks themselves), for
+deployments whose API runs with APP_ROLE=api. Run exactly one of those:
+
+    python worker.py --scheduler
+"""
+import argparse
+import multiprocessing
+import signal
+import threading
+
+from app.data.db import AUTO_MIGRATE, get_engine, init_db
+from app.infrastructure.log_config import configure_logging
+from app.infrastructure.metrics import serve_metrics
+from app.infrastructure.work_queue import RANK_CHECK_MODE, run_worker
+
+
+def _serve(concurrency: int, metrics_port: int = None):
+    # Connections pooled before a fork must not be shared with the parent
+    get_engine().dispose(close=False)
+    if metrics_port:
+        serve_metrics(metrics_port)
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+    run_worker(stop, concurrency=concurrency)
+
+
+def _run_scheduler(metrics_port: int = None):
+    # Inline mode: the scheduler runs the checks itself, there is no queue to consume
+    from app.infrastructure.history_writer import flush_history_writer
+    from app.infrastructure.scheduler import start_scheduler, stop_scheduler
+
+    if metrics_port:
+        serve_metrics(metrics_port)
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+    start_scheduler()
+    stop.wait()
+    stop_scheduler()
+    flush_history_writer()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Consume queued rank checks")
+    parser.add_argument("--processes", type=int, default=1, help="worker processes to start")
+    parser.add_argument("--concurrency", type=int, default=None, help="checks in flight per process (TRACKING_CONCURRENCY)")
+    parser.add_argument("--metrics-port", type=int, default=None, help="serve /metrics on this port (+1 per process)")
+    parser.add_argument("--scheduler", action="store_true", help="also run the scheduler (for APP_ROLE=api deployments)")
+    args = parser.parse_args()
+
+    configure_logging("%(asctime)s %(processName)s %(levelname)s %(message)s")
+    if AUTO_MIGRATE:
+        init_db()
+    if args.scheduler and RANK_CHECK_MODE != "queue":
+        _run_scheduler(args.metrics_port)
+        return
+
+    from app.infrastructure.scheduler import start_scheduler, stop_scheduler
+
+    if args.processes <= 1:
+        if args.scheduler:
+            start_scheduler()
+        _serve(args.concurrency, args.metrics_port)
+        stop_scheduler()
+        return
+
+    procs = [multiprocessing.Process(target=_serve, name=f"worker-{i}",
+                                     args=(args.concurrency, args.metrics_port + i if args.metrics_port else None))
+             for i in range(args.processes)]
+    for p in procs:
+        p.start()
+    if args.scheduler:
+        # After the fork, so the children don't inherit the scheduler's threads
+        start_scheduler()
+    # Ctrl-C reaches the whole process group; SIGTERM to the parent is passed on
+    signal.signal(signal.SIGTERM, lambda *_: [p.terminate() for p in procs])
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    for p in procs:
+        p.join()
+    stop_scheduler()
+
+
+if __name__ == "__main__":
+    main()